@@ -0,0 +1,158 @@
+"""Admission control for new jobs: per-author rate limits and queue backlog limits.
+
+Each author may submit RATE_LIMIT_REQUESTS videos per RATE_LIMIT_WINDOW_SECONDS, counted
+in a Redis sorted-set sliding window (one member per video). Before a new job is
+enqueued, the wait it would have is estimated from the broker queues: the jobs waiting
+in its lane and the lanes ahead of it on the subs and whisper queues, times the recent
+mean run time of a job on each queue (recorded by the workers), divided by the workers
+serving it. Past ADMISSION_MAX_BACKLOG_SECONDS or ADMISSION_MAX_QUEUED_JOBS the request
+is refused with a Retry-After. Playlists and channels are admitted video by video as
+expand_collection enqueues them. Both checks let requests through if Redis cannot be read.
+"""
+
+import math
+import time
+from uuid import uuid4
+
+import redis
+import structlog
+
+from app.config import settings
+from app.lanes import LANE_PRIORITIES, lane_priority, lane_queue
+from app.metrics import ADMISSION_REJECTIONS
+from app.redis_client import get_redis
+
+logger = structlog.get_logger()
+
+_RATE_PREFIX = "aqua:ratelimit:"
+_DURATIONS_PREFIX = "aqua:jobseconds:"
+# Run times kept per queue for the mean.
+_DURATION_SAMPLES = 100
+_QUEUES = ("subs", "whisper")
+
+# KEYS: window. ARGV: now ms, window ms, limit, cost, member prefix.
+# Adds cost members and returns 0 if they fit in the window, else the ms until they would.
+_RATE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+local count = redis.call('ZCARD', KEYS[1])
+if count + cost > limit then
+  if cost > limit then
+    return window
+  end
+  local oldest = redis.call('ZRANGE', KEYS[1], count + cost - limit - 1, count + cost - limit - 1, 'WITHSCORES')
+  return math.max(tonumber(oldest[2]) + window - now, 1)
+end
+for i = 1, cost do
+  redis.call('ZADD', KEYS[1], now, ARGV[5] .. i)
+end
+redis.call('PEXPIRE', KEYS[1], window)
+return 0
+"""
+
+
+class Rejected(Exception):
+    """The request is refused; status is 429 or 503 and retry_after is in seconds."""
+
+    def __init__(self, status: int, detail: str, retry_after: float) -> None:
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+        self.retry_after = max(math.ceil(retry_after), 1)
+
+
+def check_rate(author: str, cost: int = 1) -> None:
+    """Count cost videos against the author's window. Raises Rejected (429) if over."""
+    if settings.RATE_LIMIT_REQUESTS <= 0 or cost <= 0:
+        return
+    try:
+        wait_ms = get_redis().eval(
+            _RATE_SCRIPT,
+            1,
+            _RATE_PREFIX + author,
+            int(time.time() * 1000),
+            int(settings.RATE_LIMIT_WINDOW_SECONDS * 1000),
+            settings.RATE_LIMIT_REQUESTS,
+            cost,
+            uuid4().hex,
+        )
+    except redis.RedisError as e:
+        logger.warning("admission.rate_limit_failed", error=str(e))
+        return
+    if wait_ms:
+        ADMISSION_REJECTIONS.labels(reason="rate_limit").inc()
+        logger.info("admission.rate_limited", author=author, cost=cost)
+        raise Rejected(429, "Rate limit exceeded", wait_ms / 1000)
+
+
+def record_job_seconds(queue: str, seconds: float) -> None:
+    """Remember how long a job on queue ran (called by the workers after each job)."""
+    if queue not in _QUEUES:
+        return
+    try:
+        with get_redis().pipeline(transaction=False) as pipe:
+            pipe.lpush(_DURATIONS_PREFIX + queue, round(seconds, 3))
+            pipe.ltrim(_DURATIONS_PREFIX + queue, 0, _DURATION_SAMPLES - 1)
+            pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("admission.record_failed", queue=queue, error=str(e))
+
+
+def _workers(queue: str) -> int:
+    workers = {
+        "subs": settings.ADMISSION_SUBS_WORKERS,
+        "whisper": settings.ADMISSION_WHISPER_WORKERS,
+    }
+    return max(workers[queue], 1)
+
+
+def _queue_state() -> tuple[dict[str, dict[str, int]], dict[str, float]]:
+    """Waiting jobs per queue and lane, and mean recent job seconds per queue (one round-trip)."""
+    with get_redis().pipeline(transaction=False) as pipe:
+        for queue in _QUEUES:
+            for lane in LANE_PRIORITIES:
+                pipe.llen(lane_queue(queue, lane))
+            pipe.lrange(_DURATIONS_PREFIX + queue, 0, -1)
+        replies = iter(pipe.execute())
+    depths, means = {}, {}
+    for queue in _QUEUES:
+        depths[queue] = {lane: next(replies) for lane in LANE_PRIORITIES}
+        samples = [float(s) for s in next(replies)]
+        means[queue] = sum(samples) / len(samples) if samples else 0.0
+    return depths, means
+
+
+def check_backlog(lane: str | None, jobs: int = 1) -> float | None:
+    """Estimate seconds until jobs new jobs in lane would be through their subtitle stage.
+
+    The estimate is the work queued ahead of them (their lane and higher) on both the subs
+    and the whisper queue, plus their own subtitle stage. Their own Whisper transcription,
+    if a video needs it, is not included. Raises Rejected (503) past the backlog limits;
+    returns None if the queues cannot be read.
+    """
+    try:
+        depths, means = _queue_state()
+    except redis.RedisError as e:
+        logger.warning("admission.backlog_failed", error=str(e))
+        return None
+    priority = lane_priority(lane)
+    wait = 0.0
+    for queue in _QUEUES:
+        ahead = sum(n for name, n in depths[queue].items() if LANE_PRIORITIES[name] <= priority)
+        wait += ahead * means[queue] / _workers(queue)
+    queued = sum(sum(lanes.values()) for lanes in depths.values())
+    max_wait = settings.ADMISSION_MAX_BACKLOG_SECONDS
+    if max_wait > 0 and wait > max_wait:
+        ADMISSION_REJECTIONS.labels(reason="backlog").inc()
+        logger.warning("admission.backlog_full", lane=lane, wait_seconds=round(wait))
+        raise Rejected(503, "Queue backlog too deep, retry later", wait - max_wait)
+    max_jobs = settings.ADMISSION_MAX_QUEUED_JOBS
+    if max_jobs > 0 and queued + jobs > max_jobs:
+        ADMISSION_REJECTIONS.labels(reason="queue_full").inc()
+        logger.warning("admission.queue_full", lane=lane, queued=queued)
+        per_job = sum(means[queue] / _workers(queue) for queue in _QUEUES)
+        raise Rejected(503, "Queue full, retry later", (queued + jobs - max_jobs) * per_job)
+    return wait + jobs * means["subs"] / _workers("subs")
@@ -0,0 +1,101 @@
+"""Optional on-disk cache of downloaded audio, shared by the Whisper jobs on one host.
+
+With AUDIO_CACHE_DIR set, the Whisper stage downloads the video's native audio stream
+(bestaudio, no re-encode) into the cache instead of its per-job temp dir. A retry after a
+late failure, or a re-transcription at another quality tier, then reuses the file; a
+download that was cut off resumes from yt-dlp's .part file. Files are keyed by video ID
+and format selector, read in least-recently-used order (mtime is bumped on each hit) and
+evicted past AUDIO_CACHE_MAX_AGE_SECONDS or when the cache exceeds AUDIO_CACHE_MAX_BYTES.
+"""
+
+import fcntl
+import os
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+import structlog
+
+from app.config import settings
+from app.metrics import AUDIO_CACHE_LOOKUPS
+
+logger = structlog.get_logger()
+
+AUDIO_FORMAT = "bestaudio"
+# yt-dlp's in-progress files (.part, .part-FragN, .ytdl) and our per-video locks are never
+# cache entries.
+_INCOMPLETE_SUFFIXES = (".part", ".ytdl", ".lock")
+
+
+def _cache_dir() -> Path:
+    return Path(settings.AUDIO_CACHE_DIR)
+
+
+def output_template(video_id: str) -> str:
+    """yt-dlp --output template for the video's cached audio."""
+    return str(_cache_dir() / f"{video_id}.{AUDIO_FORMAT}.%(ext)s")
+
+
+def lookup(video_id: str, record: bool = True) -> Path | None:
+    """Return the cached audio file for video_id, or None if it is missing or expired.
+
+    record=False skips the hit/miss metric, for the check after a download.
+    """
+    now = time.time()
+    for path in _cache_dir().glob(f"{video_id}.{AUDIO_FORMAT}.*"):
+        if path.suffix.startswith(_INCOMPLETE_SUFFIXES):
+            continue
+        try:
+            if now - path.stat().st_mtime > settings.AUDIO_CACHE_MAX_AGE_SECONDS:
+                path.unlink(missing_ok=True)
+                continue
+            os.utime(path)
+        except OSError:
+            continue
+        if record:
+            AUDIO_CACHE_LOOKUPS.labels(result="hit").inc()
+        return path
+    if record:
+        AUDIO_CACHE_LOOKUPS.labels(result="miss").inc()
+    return None
+
+
+@contextmanager
+def locked(video_id: str) -> Iterator[None]:
+    """Hold an exclusive per-video lock so concurrent jobs do not download the same audio."""
+    _cache_dir().mkdir(parents=True, exist_ok=True)
+    with open(_cache_dir() / f"{video_id}.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def evict(keep: Path | None = None) -> None:
+    """Drop expired files, then least recently used ones until the cache fits its budget.
+
+    Abandoned .part files and old locks expire like entries but do not count to the budget.
+    """
+    now = time.time()
+    entries = []
+    for path in _cache_dir().iterdir():
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        if path != keep and now - stat.st_mtime > settings.AUDIO_CACHE_MAX_AGE_SECONDS:
+            path.unlink(missing_ok=True)
+            continue
+        if not path.suffix.startswith(_INCOMPLETE_SUFFIXES):
+            entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= settings.AUDIO_CACHE_MAX_BYTES:
+            break
+        if path == keep:
+            continue
+        path.unlink(missing_ok=True)
+        total -= size
+        logger.info("audio_cache.evicted", path=path.name, size=size)
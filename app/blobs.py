@@ -0,0 +1,48 @@
+"""Short-lived transcript blobs in Redis, served by the API in byte ranges.
+
+Transcripts too large to send inline are stored here under the recipient's task_id and
+the webhook carries a URL to GET /transcript/{task_id}/content instead. Reads use
+GETRANGE, so a ranged request never loads the whole blob.
+"""
+
+import redis
+import structlog
+
+from app.config import settings
+from app.redis_client import get_redis
+
+logger = structlog.get_logger()
+
+_BLOB_PREFIX = "aqua:blob:"
+_TYPE_SUFFIX = ":type"
+
+
+def store_blob(task_id: str, content: bytes, content_type: str) -> bool:
+    """Store content for TRANSCRIPT_BLOB_TTL_SECONDS; False if Redis is unavailable."""
+    key = _BLOB_PREFIX + task_id
+    try:
+        with get_redis().pipeline() as pipe:
+            pipe.set(key, content, ex=settings.TRANSCRIPT_BLOB_TTL_SECONDS)
+            pipe.set(key + _TYPE_SUFFIX, content_type, ex=settings.TRANSCRIPT_BLOB_TTL_SECONDS)
+            pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("blobs.store_failed", task_id=task_id, error=str(e))
+        return False
+    return True
+
+
+def blob_info(task_id: str) -> tuple[int, str] | None:
+    """Return (size in bytes, content type) of a stored blob, or None if it has expired."""
+    key = _BLOB_PREFIX + task_id
+    with get_redis().pipeline() as pipe:
+        pipe.strlen(key)
+        pipe.get(key + _TYPE_SUFFIX)
+        size, content_type = pipe.execute()
+    if content_type is None:
+        return None
+    return size, content_type.decode()
+
+
+def read_blob(task_id: str, start: int, end: int) -> bytes:
+    """Return bytes start..end (inclusive) of a stored blob."""
+    return get_redis().getrange(_BLOB_PREFIX + task_id, start, end)
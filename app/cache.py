@@ -0,0 +1,186 @@
+"""Transcript result cache keyed by YouTube video ID and Whisper model.
+
+Entries live in Redis with a TTL; a sorted set of last-access times bounds the number of
+entries (least recently used are evicted first). An optional on-disk tier in
+TRANSCRIPT_CACHE_DIR serves repeat hits on the same host without a Redis round-trip; it is
+trimmed to the same bound at most once a minute, not on every write.
+Cache failures are logged and treated as misses; they never fail a request.
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import redis
+import structlog
+
+from app.config import settings
+from app.quality import cache_variant
+from app.redis_client import get_redis
+from app.youtube import extract_video_id
+
+logger = structlog.get_logger()
+
+_KEY_PREFIX = "aqua:transcript:"
+_LRU_KEY = "aqua:transcript-lru"
+# The disk tier may run this far over TRANSCRIPT_CACHE_MAX_ENTRIES between evictions.
+_DISK_EVICT_INTERVAL_SECONDS = 60.0
+_disk_evicted_at = float("-inf")
+
+
+def transcript_cache_key(
+    video_url: str, quality: str | None = None, whisper: dict | None = None
+) -> str | None:
+    """Return the cache key for video_url at a quality tier, or None if it is not a video.
+
+    Results of different tiers (and of the "auto" policy) or decoding overrides are cached
+    and coalesced apart.
+    """
+    if settings.TRANSCRIPT_CACHE_TTL_SECONDS <= 0:
+        return None
+    video_id = extract_video_id(video_url)
+    if video_id is None:
+        return None
+    key = f"{video_id}:{cache_variant(quality)}"
+    if whisper:
+        overrides = json.dumps(whisper, sort_keys=True).encode()
+        key += ":" + hashlib.sha256(overrides).hexdigest()[:12]
+    return key
+
+
+def _disk_path(key: str) -> Path | None:
+    if not settings.TRANSCRIPT_CACHE_DIR:
+        return None
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return Path(settings.TRANSCRIPT_CACHE_DIR) / f"{digest}.json"
+
+
+def _read_disk(key: str) -> dict | None:
+    path = _disk_path(key)
+    if path is None:
+        return None
+    try:
+        if time.time() - path.stat().st_mtime > settings.TRANSCRIPT_CACHE_TTL_SECONDS:
+            path.unlink(missing_ok=True)
+            return None
+        entry = json.loads(path.read_text())
+        # Bump mtime so disk eviction is least-recently-used.
+        os.utime(path)
+        return entry
+    except (OSError, ValueError):
+        return None
+
+
+def _evict_disk(cache_dir: Path) -> None:
+    """Trim the disk tier to TRANSCRIPT_CACHE_MAX_ENTRIES, least recently used first."""
+    global _disk_evicted_at
+    _disk_evicted_at = time.monotonic()
+    entries = []
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            if entry.name.endswith(".json"):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    continue
+    excess = len(entries) - settings.TRANSCRIPT_CACHE_MAX_ENTRIES
+    if excess > 0:
+        for _mtime, stale in sorted(entries)[:excess]:
+            Path(stale).unlink(missing_ok=True)
+        logger.info("transcript_cache.disk_evicted", count=excess)
+
+
+def _write_disk(key: str, entry: dict) -> None:
+    path = _disk_path(key)
+    if path is None:
+        return
+    try:
+        if path.exists():
+            # Same key, same result: just mark it recently used.
+            os.utime(path)
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(entry))
+        tmp_path.replace(path)
+        # Scanning the directory is O(entries): bound it at most once per interval.
+        if time.monotonic() - _disk_evicted_at >= _DISK_EVICT_INTERVAL_SECONDS:
+            _evict_disk(path.parent)
+    except OSError as e:
+        logger.warning("transcript_cache.disk_write_failed", key=key, error=str(e))
+
+
+def get_cached_transcript(key: str) -> dict | None:
+    """Return {"source", "transcript", "video"?} for key, or None on a miss."""
+    entry = _read_disk(key)
+    if entry is not None:
+        logger.info("transcript_cache.hit", key=key, tier="disk")
+        return entry
+    client = get_redis()
+    try:
+        raw = client.get(_KEY_PREFIX + key)
+        if raw is None:
+            return None
+        client.zadd(_LRU_KEY, {key: time.time()})
+    except redis.RedisError as e:
+        logger.warning("transcript_cache.read_failed", key=key, error=str(e))
+        return None
+    entry = json.loads(raw)
+    _write_disk(key, entry)
+    logger.info("transcript_cache.hit", key=key, tier="redis")
+    return entry
+
+
+def get_cached_transcripts(keys: list[str]) -> dict[str, dict]:
+    """Batch lookup: return {key: entry} for every hit, with one Redis round-trip for misses."""
+    hits: dict[str, dict] = {}
+    for key in keys:
+        entry = _read_disk(key)
+        if entry is not None:
+            hits[key] = entry
+    remaining = list(dict.fromkeys(key for key in keys if key not in hits))
+    if not remaining:
+        return hits
+    client = get_redis()
+    try:
+        raws = client.mget([_KEY_PREFIX + key for key in remaining])
+        redis_hits = {key: raw for key, raw in zip(remaining, raws, strict=True) if raw is not None}
+        if redis_hits:
+            now = time.time()
+            client.zadd(_LRU_KEY, {key: now for key in redis_hits})
+    except redis.RedisError as e:
+        logger.warning("transcript_cache.read_failed", keys=len(remaining), error=str(e))
+        return hits
+    for key, raw in redis_hits.items():
+        entry = json.loads(raw)
+        _write_disk(key, entry)
+        hits[key] = entry
+    logger.info("transcript_cache.batch_lookup", keys=len(keys), hits=len(hits))
+    return hits
+
+
+def store_transcript(key: str, source: str, transcript: str, video: dict | None = None) -> None:
+    """Cache a successful result and evict least recently used entries past the bound.
+
+    video (app.video_policy.policy_info) lets later hits be checked against their policy.
+    """
+    entry = {"source": source, "transcript": transcript}
+    if video:
+        entry["video"] = video
+    _write_disk(key, entry)
+    client = get_redis()
+    try:
+        with client.pipeline() as pipe:
+            pipe.set(_KEY_PREFIX + key, json.dumps(entry), ex=settings.TRANSCRIPT_CACHE_TTL_SECONDS)
+            pipe.zadd(_LRU_KEY, {key: time.time()})
+            pipe.zcard(_LRU_KEY)
+            size = pipe.execute()[-1]
+        excess = size - settings.TRANSCRIPT_CACHE_MAX_ENTRIES
+        if excess > 0:
+            evicted = [k.decode() for k, _score in client.zpopmin(_LRU_KEY, excess)]
+            client.delete(*(_KEY_PREFIX + k for k in evicted))
+            logger.info("transcript_cache.evicted", count=len(evicted))
+    except redis.RedisError as e:
+        logger.warning("transcript_cache.write_failed", key=key, error=str(e))
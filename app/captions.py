@@ -0,0 +1,187 @@
+"""Caption parsing and rendering: VTT/SRT in, plain text, VTT, SRT or JSON segments out.
+
+YouTube auto captions are "rolling": every cue repeats the line before it, carries inline
+word timings (<00:00:01.520><c> word</c>) and is followed by a ~10 ms cue that repeats it
+again. parse_captions strips the tags and keeps only the new text of each cue, so a
+transcript shrinks to the words actually spoken. The parser walks the input one line at
+a time (a str or any iterable of lines, e.g. an open file) without splitting it up front.
+"""
+
+import html
+import re
+from collections.abc import Iterable, Iterator
+from typing import Literal
+
+OutputFormat = Literal["text", "vtt", "srt", "json"]
+
+_TAG_PATTERN = re.compile(r"<[^>]*>")
+_TIMING_ARROW = "-->"
+
+
+class Cue:
+    """One caption: start/end in seconds and its text (lines joined by newlines)."""
+
+    __slots__ = ("end", "start", "text")
+
+    def __init__(self, start: float, end: float, text: str) -> None:
+        self.start = start
+        self.end = end
+        self.text = text
+
+    def __repr__(self) -> str:
+        return f"Cue({self.start!r}, {self.end!r}, {self.text!r})"
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Cue):
+            return NotImplemented
+        return (self.start, self.end, self.text) == (other.start, other.end, other.text)
+
+
+def _iter_lines(text: str) -> Iterator[str]:
+    """Yield lines of text without building the whole list first."""
+    start = 0
+    length = len(text)
+    while start < length:
+        end = text.find("\n", start)
+        if end == -1:
+            end = length
+        yield text[start:end].rstrip("\r")
+        start = end + 1
+
+
+def parse_timestamp(value: str) -> float:
+    """Parse HH:MM:SS.mmm, MM:SS.mmm or the SRT form HH:MM:SS,mmm into seconds."""
+    parts = value.replace(",", ".").split(":")
+    seconds = float(parts[-1])
+    if len(parts) >= 2:
+        seconds += int(parts[-2]) * 60
+    if len(parts) >= 3:
+        seconds += int(parts[-3]) * 3600
+    return seconds
+
+
+def _parse_timing(line: str) -> tuple[float, float] | None:
+    start, _, rest = line.partition(_TIMING_ARROW)
+    end = rest.split(None, 1)[0] if rest.strip() else ""
+    try:
+        return parse_timestamp(start.strip()), parse_timestamp(end)
+    except ValueError:
+        return None
+
+
+def _clean(line: str) -> str:
+    if "<" in line:
+        line = _TAG_PATTERN.sub("", line)
+    if "&" in line:
+        line = html.unescape(line)
+    return line.strip()
+
+
+def parse_captions(source: str | Iterable[str]) -> list[Cue]:
+    """Parse VTT or SRT into cues, dropping inline tags and rolling-caption repeats.
+
+    Lines a cue shares with the end of the previous cue are dropped; a cue with nothing
+    new only extends the previous cue's end time.
+    """
+    lines = _iter_lines(source) if isinstance(source, str) else source
+    cues: list[Cue] = []
+    previous: list[str] = []
+    timing: tuple[float, float] | None = None
+    text_lines: list[str] = []
+
+    def flush() -> None:
+        nonlocal previous
+        if timing is None:
+            return
+        current = [line for line in text_lines if line]
+        new = current
+        for overlap in range(min(len(previous), len(current)), 0, -1):
+            if previous[-overlap:] == current[:overlap]:
+                new = current[overlap:]
+                break
+        if new:
+            cues.append(Cue(timing[0], timing[1], "\n".join(new)))
+        elif cues and current:
+            cues[-1].end = max(cues[-1].end, timing[1])
+        if current:
+            previous = current
+
+    for raw in lines:
+        line = raw.rstrip("\r\n")
+        if _TIMING_ARROW in line:
+            flush()
+            timing = _parse_timing(line)
+            text_lines = []
+        elif not line:
+            # Only a truly empty line ends a cue: YouTube puts " " lines inside cues.
+            flush()
+            timing = None
+            text_lines = []
+        elif timing is not None:
+            text_lines.append(_clean(line))
+    flush()
+    return cues
+
+
+def format_timestamp(seconds: float, separator: str = ".") -> str:
+    """Format seconds as HH:MM:SS.mmm (separator "," for SRT)."""
+    millis = round(seconds * 1000)
+    h, millis = divmod(millis, 3_600_000)
+    m, millis = divmod(millis, 60_000)
+    s, millis = divmod(millis, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d}{separator}{millis:03d}"
+
+
+def to_vtt(cues: Iterable[Cue]) -> str:
+    """Render cues as WebVTT."""
+    blocks = ["WEBVTT"]
+    for cue in cues:
+        blocks.append(f"{format_timestamp(cue.start)} --> {format_timestamp(cue.end)}\n{cue.text}")
+    return "\n\n".join(blocks)
+
+
+def to_srt(cues: Iterable[Cue]) -> str:
+    """Render cues as SubRip."""
+    blocks = []
+    for index, cue in enumerate(cues, 1):
+        start = format_timestamp(cue.start, ",")
+        end = format_timestamp(cue.end, ",")
+        blocks.append(f"{index}\n{start} --> {end}\n{cue.text}")
+    return "\n\n".join(blocks)
+
+
+def to_text(cues: Iterable[Cue]) -> str:
+    """Render cues as plain text, one cue per line."""
+    return "\n".join(cue.text.replace("\n", " ") for cue in cues)
+
+
+def to_segments(cues: Iterable[Cue]) -> list[dict]:
+    """Render cues as JSON-serialisable {"start", "end", "text"} segments."""
+    return [{"start": cue.start, "end": cue.end, "text": cue.text} for cue in cues]
+
+
+def render_cues(cues: list[Cue], output_format: OutputFormat) -> str | list[dict]:
+    """Render cues in output_format."""
+    if output_format == "text":
+        return to_text(cues)
+    if output_format == "srt":
+        return to_srt(cues)
+    if output_format == "json":
+        return to_segments(cues)
+    return to_vtt(cues)
+
+
+def render_transcript(raw: str, output_format: OutputFormat) -> str | list[dict]:
+    """Re-render a pipeline transcript (VTT text) in output_format."""
+    return render_cues(parse_captions(raw), output_format)
+
+
+def format_payload(payload: dict, output_format: OutputFormat | None) -> dict:
+    """Render a success payload's transcript in output_format; None keeps the source VTT."""
+    if output_format is None or payload.get("status") != "success":
+        return payload
+    return {
+        **payload,
+        "transcript": render_transcript(payload["transcript"], output_format),
+        "format": output_format,
+    }
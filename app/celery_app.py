@@ -1,17 +1,48 @@
 """Celery app configuration."""
 
-from celery import Celery
+import os
+import time
 
+import structlog
+from celery import Celery, Task
+from celery.concurrency import get_implementation
+from celery.signals import (
+    before_task_publish,
+    task_postrun,
+    task_prerun,
+    worker_init,
+    worker_process_init,
+    worker_process_shutdown,
+)
+from prometheus_client import multiprocess, start_http_server
+
+from app.admission import record_job_seconds
 from app.config import settings
+from app.lanes import DEFAULT_LANE, LANE_PRIORITIES, PRIORITY_LANES
 from app.logging_config import setup_logging
+from app.metrics import QUEUE_WAIT_SECONDS, metrics_registry
 from app.tracing import setup_tracing
 
+logger = structlog.get_logger()
+
 celery_app = Celery(
     "aqua_whisper",
     broker=settings.REDIS_URL,
-    # No result_backend: webhook-only design, no GET /tasks.
+    # No result_backend: status and results live in app.task_status (GET /transcript/{id}).
     broker_connection_retry_on_startup=True,
     broker_connection_retry=True,
+    broker_transport_options={
+        "visibility_timeout": settings.CELERY_VISIBILITY_TIMEOUT_SECONDS,
+        # One Redis list per lane (subs, subs:3, subs:6, subs:9); workers drain lower first.
+        "priority_steps": sorted(LANE_PRIORITIES.values()),
+        "sep": ":",
+        "queue_order_strategy": "priority",
+    },
+    # Unprioritised messages would otherwise land in the interactive lane.
+    task_default_priority=LANE_PRIORITIES[DEFAULT_LANE],
+    # A worker holding a prefetched bulk job cannot start an interactive one that arrives
+    # after it; keep prefetch to one message per process so lanes stay ordered.
+    worker_prefetch_multiplier=1,
 )
 
 
@@ -21,6 +52,92 @@ def _configure_worker_observability() -> None:
     setup_tracing(service_name="aqua-whisper-worker", environment=env)
 
 
+# Subtitle jobs (seconds, network-bound), Whisper jobs (minutes, CPU/GPU-bound) and webhook
+# POSTs each get their own queue so each worker pool can be sized for its workload.
+celery_app.conf.task_routes = {
+    "app.tasks.run_transcript_pipeline": {"queue": "subs"},
+    "app.tasks.expand_collection": {"queue": "subs"},
+    "app.tasks.run_whisper_transcription": {"queue": "whisper"},
+    "app.tasks.deliver_webhook": {"queue": "webhooks"},
+}
+
 _configure_worker_observability()
 
+# Start times of the jobs running in this process, by task id.
+_job_started: dict[str, float] = {}
+
+
+@before_task_publish.connect
+def _stamp_enqueued_at(headers: dict | None = None, **_kwargs: object) -> None:
+    """Record the publish time so the worker can measure how long the job queued."""
+    if headers is not None:
+        headers.setdefault("enqueued_at", time.time())
+
+
+@task_prerun.connect
+def _observe_queue_wait(task: Task | None = None, **_kwargs: object) -> None:
+    """Export the time a job spent in its queue, by queue and lane."""
+    request = getattr(task, "request", None)
+    enqueued_at = getattr(request, "enqueued_at", None)
+    if enqueued_at is None:
+        return
+    delivery_info = request.delivery_info or {}
+    lane = PRIORITY_LANES.get(delivery_info.get("priority"), DEFAULT_LANE)
+    QUEUE_WAIT_SECONDS.labels(queue=delivery_info.get("routing_key", ""), lane=lane).observe(
+        max(time.time() - float(enqueued_at), 0)
+    )
+
+
+@task_prerun.connect
+def _mark_job_start(task_id: str | None = None, **_kwargs: object) -> None:
+    if task_id is not None:
+        _job_started[task_id] = time.monotonic()
+
+
+@task_postrun.connect
+def _record_job_duration(
+    task_id: str | None = None, task: Task | None = None, **_kwargs: object
+) -> None:
+    """Feed the job's run time to the admission backlog estimate for its queue."""
+    started = _job_started.pop(task_id, None)
+    delivery_info = getattr(getattr(task, "request", None), "delivery_info", None) or {}
+    if started is not None and delivery_info.get("routing_key"):
+        record_job_seconds(delivery_info["routing_key"], time.monotonic() - started)
+
+
+@worker_init.connect
+def _start_metrics_exporter(sender: object = None, **_kwargs: object) -> None:
+    """Serve this worker's metrics (all pool processes in multiprocess mode) over HTTP."""
+    if settings.WORKER_METRICS_PORT <= 0:
+        return
+    pool = getattr(sender, "pool_cls", None)
+    pool_module = get_implementation(pool).__module__ if pool is not None else ""
+    if pool_module.endswith(".prefork") and "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        # Prefork jobs run in child processes: this process's registry would stay empty.
+        logger.warning(
+            "celery.metrics_exporter_disabled",
+            reason="prefork pool needs PROMETHEUS_MULTIPROC_DIR",
+        )
+        return
+    start_http_server(settings.WORKER_METRICS_PORT, registry=metrics_registry())
+    logger.info("celery.metrics_exporter_started", port=settings.WORKER_METRICS_PORT)
+
+
+@worker_process_shutdown.connect
+def _mark_metrics_process_dead(pid: int | None = None, **_kwargs: object) -> None:
+    """Drop a dead pool process's live gauges from the multiprocess aggregate."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+
+@worker_process_init.connect
+def _warm_whisper_model(**_kwargs: object) -> None:
+    """Load the default Whisper model in each pool process when WHISPER_PRELOAD is set."""
+    if not settings.WHISPER_PRELOAD:
+        return
+    from app.whisper_models import warm_models
+
+    warm_models()
+
+
 celery_app.autodiscover_tasks(["app"])
@@ -1,5 +1,7 @@
 """Application config from environment."""
 
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -16,6 +18,130 @@ class Settings(BaseSettings):
     WHISPER_DOWNLOAD_ROOT: str | None = None
     # CTranslate2 compute type: "int8", "float16", "float32", or "auto" (default)
     WHISPER_COMPUTE_TYPE: str = "auto"
+    # CTranslate2 device: "cpu", "cuda", or "auto" (default)
+    WHISPER_DEVICE: str = "auto"
+    # The Whisper stage reuses the subtitle stage's probe unless it is older than this
+    # (format URLs in it expire); then it probes again
+    PROBE_MAX_AGE_SECONDS: int = 3600
+    # Whisper audio input: "stream" pipes the native audio through ffmpeg into memory as
+    # 16 kHz PCM; "file" downloads an mp3 with yt-dlp -x first
+    WHISPER_AUDIO_MODE: Literal["stream", "file"] = "stream"
+    # Long-audio mode: at or past this many seconds, VAD splits the audio at silences into
+    # chunks of at most WHISPER_CHUNK_LENGTH seconds and WHISPER_BATCH_SIZE chunks are
+    # transcribed in parallel (faster-whisper batched inference); 0 disables it
+    WHISPER_LONG_AUDIO_SECONDS: float = 1800
+    WHISPER_CHUNK_LENGTH: int = 30
+    WHISPER_BATCH_SIZE: int = 8
+    # Decoding defaults; a request's "whisper" object may override all but the last two
+    WHISPER_BEAM_SIZE: int = 5
+    WHISPER_BEST_OF: int = 5
+    WHISPER_CONDITION_ON_PREVIOUS_TEXT: bool = True
+    # Language code (e.g. "en") that skips language detection; None detects it per video
+    WHISPER_LANGUAGE: str | None = None
+    # Silero VAD drops silences before decoding (always on in long-audio mode, where it
+    # does the chunking; the parameters apply there too)
+    WHISPER_VAD_FILTER: bool = False
+    WHISPER_VAD_THRESHOLD: float = 0.5
+    WHISPER_VAD_MIN_SILENCE_MS: int = 2000
+    WHISPER_VAD_SPEECH_PAD_MS: int = 400
+    # CTranslate2 threads per model (0 = its default) and concurrent transcriptions a
+    # loaded model serves; fixed per worker process
+    WHISPER_CPU_THREADS: int = 0
+    WHISPER_NUM_WORKERS: int = 1
+    # Load the default model in each worker process at startup instead of on the first job
+    WHISPER_PRELOAD: bool = False
+    # Quality tiers a request can ask for ("quality"), lowest first: name -> "model" or
+    # "model:compute_type". Requests without one use WHISPER_MODEL / WHISPER_COMPUTE_TYPE
+    WHISPER_QUALITY_TIERS: dict[str, str] = {
+        "draft": "tiny:int8",
+        "standard": "base:int8",
+        "high": "small:int8",
+    }
+    # "quality": "auto" starts at the highest tier and drops one tier for audio at least
+    # WHISPER_AUTO_LONG_AUDIO_SECONDS long and one per WHISPER_AUTO_QUEUE_STEP jobs waiting
+    # on the whisper queue (0 disables either rule)
+    WHISPER_AUTO_LONG_AUDIO_SECONDS: float = 3600
+    WHISPER_AUTO_QUEUE_STEP: int = 10
+    # Models kept loaded per worker process; the least recently used one is dropped first
+    WHISPER_MAX_LOADED_MODELS: int = 2
+    # Progressive mode ("progressive": true in a request): a "partial" webhook is sent every
+    # this many new segments or seconds of transcribed audio, whichever comes first; 0
+    # disables a trigger
+    PARTIAL_FLUSH_SEGMENTS: int = 50
+    PARTIAL_FLUSH_AUDIO_SECONDS: float = 60
+    # Optional on-disk cache of downloaded audio (native stream, keyed by video ID) so
+    # retries and other quality tiers reuse it; evicted by age and total size
+    AUDIO_CACHE_DIR: str | None = None
+    AUDIO_CACHE_MAX_BYTES: int = 20 * 1024**3
+    AUDIO_CACHE_MAX_AGE_SECONDS: int = 7 * 24 * 3600
+    # Transcript result cache (Redis, keyed by video ID + model); TTL 0 disables it
+    TRANSCRIPT_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    TRANSCRIPT_CACHE_MAX_ENTRIES: int = 10_000
+    # Optional local on-disk tier in front of Redis (same TTL and entry bound)
+    TRANSCRIPT_CACHE_DIR: str | None = None
+    # Single-flight coalescing of duplicate in-flight videos: owner lease; 0 disables it
+    INFLIGHT_LEASE_SECONDS: int = 600
+    # Redis broker: unacked (running) tasks are redelivered after this long; keep above
+    # the longest expected job since tasks ack late
+    CELERY_VISIBILITY_TIMEOUT_SECONDS: int = 6 * 3600
+    # Running time a job may use across its subtitle and Whisper stages (queue waits not
+    # counted) before it is stopped with a "timeout" webhook; keep it below the visibility
+    # timeout. Requests may ask for less with timeout_seconds (0 disables)
+    JOB_TIMEOUT_SECONDS: float = 5 * 3600
+    # Task status and final result behind GET /transcript/{task_id}, kept this long after
+    # the task's last update (0 disables)
+    TASK_STATUS_TTL_SECONDS: int = 7 * 24 * 3600
+    # Duration policy, checked against the probe before anything is downloaded: videos
+    # shorter than MIN_VIDEO_SECONDS or longer than MAX_VIDEO_SECONDS fail with a "failed"
+    # webhook (0 disables either). Requests may set their own min_duration_seconds and
+    # max_duration_seconds (the max is capped by MAX_VIDEO_SECONDS)
+    MIN_VIDEO_SECONDS: float = 60
+    MAX_VIDEO_SECONDS: float = 12 * 3600
+    # Streams that are live or upcoming are always rejected; "reject" also refuses
+    # recordings of finished live streams, "recordings" accepts them like any video
+    LIVE_VIDEO_POLICY: Literal["recordings", "reject"] = "recordings"
+    # Fair share per author: jobs beyond a bucket of FAIR_SHARE_BURST, refilled at
+    # FAIR_SHARE_RATE_PER_MINUTE, are queued one priority lane lower (0 disables)
+    FAIR_SHARE_RATE_PER_MINUTE: float = 30
+    FAIR_SHARE_BURST: int = 50
+    # Admission control: videos an author may submit per sliding window (0 disables)
+    RATE_LIMIT_REQUESTS: int = 0
+    RATE_LIMIT_WINDOW_SECONDS: float = 60
+    # New jobs are refused (503 + Retry-After) when the estimated wait in their lane exceeds
+    # ADMISSION_MAX_BACKLOG_SECONDS or the broker holds ADMISSION_MAX_QUEUED_JOBS (0 disables
+    # either); the estimate divides by the worker processes serving each queue
+    ADMISSION_MAX_BACKLOG_SECONDS: float = 4 * 3600
+    ADMISSION_MAX_QUEUED_JOBS: int = 100_000
+    ADMISSION_SUBS_WORKERS: int = 4
+    ADMISSION_WHISPER_WORKERS: int = 1
+    # Webhook delivery (deliver_webhook task on the "webhooks" queue)
+    WEBHOOK_TIMEOUT_SECONDS: float = 10.0
+    WEBHOOK_POOL_SIZE: int = 20
+    WEBHOOK_MAX_RETRIES: int = 5
+    # Retry n waits WEBHOOK_RETRY_BACKOFF_SECONDS * 2**n, capped at the max
+    WEBHOOK_RETRY_BACKOFF_SECONDS: float = 10.0
+    WEBHOOK_RETRY_BACKOFF_MAX_SECONDS: float = 600.0
+    # Undeliverable payloads kept in the Redis dead-letter list
+    WEBHOOK_DEAD_LETTER_MAX: int = 10_000
+    # Larger transcripts are stored for TRANSCRIPT_BLOB_TTL_SECONDS and sent as a URL on
+    # PUBLIC_BASE_URL (the API as receivers reach it) instead of inline; 0 or no URL disables
+    WEBHOOK_INLINE_MAX_BYTES: int = 1_000_000
+    TRANSCRIPT_BLOB_TTL_SECONDS: int = 24 * 3600
+    PUBLIC_BASE_URL: str | None = None
+    # Per-task event streams behind GET /transcript/{task_id}/stream: kept this long after
+    # the last event; one connection lasts at most TRANSCRIPT_STREAM_MAX_SECONDS (clients
+    # resume with Last-Event-ID) and sends a keep-alive comment when idle
+    TRANSCRIPT_STREAM_TTL_SECONDS: int = 24 * 3600
+    TRANSCRIPT_STREAM_MAX_SECONDS: int = 3600
+    TRANSCRIPT_STREAM_KEEPALIVE_SECONDS: float = 15
+    # Port for each worker's Prometheus exporter (0 disables); the API serves GET /metrics
+    WORKER_METRICS_PORT: int = 9100
+    # Max items accepted by POST /transcripts/batch
+    TRANSCRIPT_BATCH_MAX_ITEMS: int = 1000
+    # Playlist/channel submissions: videos enqueued per collection, and how long the
+    # expansion's progress (for the aggregate webhook) is kept in Redis
+    COLLECTION_MAX_VIDEOS: int = 5000
+    COLLECTION_STATE_TTL_SECONDS: int = 7 * 24 * 3600
     # Observability
     ENV: str | None = None
     OTEL_EXPORTER_OTLP_ENDPOINT: str | None = None
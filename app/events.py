@@ -0,0 +1,145 @@
+"""Per-task event streams in Redis, tailed by GET /transcript/{task_id}/stream.
+
+Workers append a "partial" event for each batch of Whisper segments and a final "result"
+event (the recipient's webhook payload) to the Redis stream aqua:events:{task_id}. A new
+connection first reads what is already there, then waits on one shared reader per API
+process: a single blocking multi-stream XREAD on the asyncio client that fans new events
+out to per-connection queues. Idle streams thus hold neither a thread nor a Redis
+connection, and a client that reconnects with Last-Event-ID resumes right after the last
+event it saw.
+"""
+
+import asyncio
+import json
+from collections.abc import AsyncIterator
+
+import redis
+import structlog
+
+from app.config import settings
+from app.redis_client import get_async_redis, get_redis
+
+logger = structlog.get_logger()
+
+_EVENTS_PREFIX = "aqua:events:"
+# Events are appended in order; only the final one ends a stream.
+RESULT_EVENT = "result"
+# Longest a stream subscribed while the shared reader is blocked waits to be included.
+_HUB_BLOCK_MS = 1000
+
+
+def _events_key(task_id: str) -> str:
+    return _EVENTS_PREFIX + task_id
+
+
+def publish_event(task_id: str, event: str, data: dict) -> None:
+    """Append an event to the task's stream (kept TRANSCRIPT_STREAM_TTL_SECONDS); fails open."""
+    key = _events_key(task_id)
+    try:
+        with get_redis().pipeline() as pipe:
+            pipe.xadd(key, {"event": event, "data": json.dumps(data)})
+            pipe.expire(key, settings.TRANSCRIPT_STREAM_TTL_SECONDS)
+            pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("events.publish_failed", task_id=task_id, event=event, error=str(e))
+
+
+def _id_key(entry_id: str) -> tuple[int, ...]:
+    """Sort key of a stream entry ID ("ms-seq", or "0")."""
+    return tuple(int(part) for part in entry_id.split("-"))
+
+
+class _EventHub:
+    """Tails the streams of every open connection with one blocking XREAD per process.
+
+    Each connection has a queue and a cursor (the last entry it was given); the reader
+    asks for each stream from its lowest cursor and hands every queue only the entries past
+    its own. The reader runs while anything is subscribed.
+    """
+
+    def __init__(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.subscribers: dict[str, dict[asyncio.Queue, str]] = {}
+        self.reader: asyncio.Task | None = None
+
+    def subscribe(self, key: str, cursor: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        self.subscribers.setdefault(key, {})[queue] = cursor
+        if self.reader is None or self.reader.done():
+            self.reader = self.loop.create_task(self._read())
+        return queue
+
+    def unsubscribe(self, key: str, queue: asyncio.Queue) -> None:
+        cursors = self.subscribers.get(key, {})
+        cursors.pop(queue, None)
+        if not cursors:
+            self.subscribers.pop(key, None)
+        if not self.subscribers and self.reader is not None:
+            self.reader.cancel()
+            self.reader = None
+
+    async def _read(self) -> None:
+        client = get_async_redis()
+        while self.subscribers:
+            streams = {
+                key: min(cursors.values(), key=_id_key) for key, cursors in self.subscribers.items()
+            }
+            try:
+                # Streams subscribed meanwhile are picked up when this returns.
+                response = await client.xread(streams, count=100, block=_HUB_BLOCK_MS)
+            except redis.RedisError as e:
+                logger.warning("events.read_failed", streams=len(streams), error=str(e))
+                await asyncio.sleep(_HUB_BLOCK_MS / 1000)
+                continue
+            for key, entries in response or []:
+                entries = [
+                    (entry_id.decode(), fields[b"event"].decode(), fields[b"data"].decode())
+                    for entry_id, fields in entries
+                ]
+                cursors = self.subscribers.get(key.decode(), {})
+                for queue, cursor in cursors.items():
+                    fresh = [entry for entry in entries if _id_key(entry[0]) > _id_key(cursor)]
+                    if fresh:
+                        cursors[queue] = fresh[-1][0]
+                        queue.put_nowait(fresh)
+
+
+_hub: _EventHub | None = None
+
+
+def _get_hub() -> _EventHub:
+    global _hub
+    if _hub is None or _hub.loop is not asyncio.get_running_loop():
+        _hub = _EventHub()
+    return _hub
+
+
+async def read_events(
+    task_id: str, last_event_id: str = "0", block_ms: int = 15_000
+) -> AsyncIterator[tuple[str, str, str] | None]:
+    """Yield (id, event, data) after last_event_id until the result; None after an idle wait."""
+    key = _events_key(task_id)
+    client = get_async_redis()
+    # Catch up with a non-blocking read, then wait on the shared reader.
+    while response := await client.xread({key: last_event_id}, count=100):
+        for entry_id, fields in response[0][1]:
+            last_event_id = entry_id.decode()
+            event = fields[b"event"].decode()
+            yield last_event_id, event, fields[b"data"].decode()
+            if event == RESULT_EVENT:
+                return
+    hub = _get_hub()
+    queue = hub.subscribe(key, last_event_id)
+    try:
+        while True:
+            try:
+                entries = await asyncio.wait_for(queue.get(), block_ms / 1000)
+            except TimeoutError:
+                yield None
+                continue
+            for entry in entries:
+                yield entry
+                if entry[1] == RESULT_EVENT:
+                    return
+    finally:
+        hub.unsubscribe(key, queue)
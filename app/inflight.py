@@ -0,0 +1,208 @@
+"""Single-flight coalescing of concurrent submissions for the same video.
+
+The first submission for a key owns a Redis lock (value = its task_id) with a lease; later
+submissions are appended to a subscriber list instead of starting their own job. The owner
+renews the lease while it works and, when done, atomically releases the lock and drains the
+subscribers so each gets its own webhook. If the owner's worker dies, the lease runs out:
+the redelivered owner task (acks_late) or the next submission for the video claims the lock
+and serves every subscriber still waiting.
+"""
+
+import json
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import redis
+import structlog
+
+from app.config import settings
+from app.redis_client import get_redis
+
+logger = structlog.get_logger()
+
+_LOCK_PREFIX = "aqua:inflight:"
+_SUBSCRIBERS_SUFFIX = ":subscribers"
+# Subscribers outlive the lock so a new owner can serve them after a crash: the broker
+# redelivers a job lost with its worker only after the visibility timeout.
+_SUBSCRIBER_RETENTION_LEASES = 4
+
+# KEYS: lock, subscribers. ARGV: owner task_id, lease ms, subscriber retention ms, subscriber json.
+# Returns 1 if the caller owns the lock (new or already its own), 0 if it was subscribed.
+_CLAIM_SCRIPT = """
+local holder = redis.call('GET', KEYS[1])
+if not holder or holder == ARGV[1] then
+  redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+  return 1
+end
+redis.call('RPUSH', KEYS[2], ARGV[4])
+redis.call('PEXPIRE', KEYS[2], ARGV[3])
+return 0
+"""
+
+# KEYS: lock, subscribers. ARGV: owner task_id, lease ms, subscriber retention ms.
+_RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  redis.call('PEXPIRE', KEYS[1], ARGV[2])
+  if redis.call('EXISTS', KEYS[2]) == 1 then
+    redis.call('PEXPIRE', KEYS[2], ARGV[3])
+  end
+  return 1
+end
+return 0
+"""
+
+# KEYS: lock, subscribers. ARGV: owner task_id. Returns the drained subscriber list.
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  redis.call('DEL', KEYS[1])
+end
+local subscribers = redis.call('LRANGE', KEYS[2], 0, -1)
+redis.call('DEL', KEYS[2])
+return subscribers
+"""
+
+# KEYS: lock. ARGV: owner task_id. Frees the lock but keeps the subscriber list.
+_ABANDON_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _keys(key: str) -> list[str]:
+    lock = _LOCK_PREFIX + key
+    return [lock, lock + _SUBSCRIBERS_SUFFIX]
+
+
+def _lease_args(lease_seconds: int | None = None) -> list[int]:
+    lease_ms = (lease_seconds or settings.INFLIGHT_LEASE_SECONDS) * 1000
+    redelivery_ms = settings.CELERY_VISIBILITY_TIMEOUT_SECONDS * 1000 + lease_ms
+    return [lease_ms, max(lease_ms * _SUBSCRIBER_RETENTION_LEASES, redelivery_ms)]
+
+
+def _subscriber(
+    task_id: str,
+    webhook_url: str,
+    author: str,
+    parent_task_id: str | None = None,
+    options: dict | None = None,
+) -> str:
+    entry: dict = {"task_id": task_id, "webhook_url": webhook_url, "author": author}
+    if parent_task_id:
+        entry["parent_task_id"] = parent_task_id
+    if options:
+        entry["options"] = options
+    return json.dumps(entry)
+
+
+def claim(
+    key: str,
+    task_id: str,
+    webhook_url: str,
+    author: str,
+    parent_task_id: str | None = None,
+    options: dict | None = None,
+) -> bool:
+    """Return True if task_id owns the work for key; otherwise subscribe it and return False.
+
+    A subscriber keeps its own parent_task_id and delivery options. Coalescing is disabled
+    (always True) when INFLIGHT_LEASE_SECONDS is 0 or Redis fails.
+    """
+    if settings.INFLIGHT_LEASE_SECONDS <= 0:
+        return True
+    subscriber = _subscriber(task_id, webhook_url, author, parent_task_id, options)
+    try:
+        owned = get_redis().eval(_CLAIM_SCRIPT, 2, *_keys(key), task_id, *_lease_args(), subscriber)
+    except redis.RedisError as e:
+        logger.warning("inflight.claim_failed", key=key, task_id=task_id, error=str(e))
+        return True
+    if not owned:
+        logger.info("inflight.subscribed", key=key, task_id=task_id)
+    return bool(owned)
+
+
+def claim_many(claims: list[tuple[str, str, str, str, dict | None]]) -> list[bool]:
+    """claim() for many (key, task_id, webhook_url, author, options) in one round-trip.
+
+    Claims run in order, so a later duplicate of a key in the same list is subscribed to
+    the earlier one.
+    """
+    if settings.INFLIGHT_LEASE_SECONDS <= 0 or not claims:
+        return [True] * len(claims)
+    try:
+        with get_redis().pipeline(transaction=False) as pipe:
+            for key, task_id, webhook_url, author, options in claims:
+                subscriber = _subscriber(task_id, webhook_url, author, options=options)
+                pipe.eval(_CLAIM_SCRIPT, 2, *_keys(key), task_id, *_lease_args(), subscriber)
+            owned = pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("inflight.claim_failed", claims=len(claims), error=str(e))
+        return [True] * len(claims)
+    return [bool(result) for result in owned]
+
+
+def renew(key: str | None, task_id: str, lease_seconds: int | None = None) -> bool:
+    """Extend task_id's lease on key (default INFLIGHT_LEASE_SECONDS); False if not owned.
+
+    Call with a longer lease before handing the job to another queue, where nothing
+    renews it while it waits.
+    """
+    if key is None or settings.INFLIGHT_LEASE_SECONDS <= 0:
+        return True
+    try:
+        lease_args = _lease_args(lease_seconds)
+        return bool(get_redis().eval(_RENEW_SCRIPT, 2, *_keys(key), task_id, *lease_args))
+    except redis.RedisError as e:
+        logger.warning("inflight.renew_failed", key=key, task_id=task_id, error=str(e))
+        return True
+
+
+@contextmanager
+def keep_alive(key: str | None, task_id: str) -> Iterator[None]:
+    """Renew task_id's lease on key in a background thread for the duration of the block."""
+    if key is None or settings.INFLIGHT_LEASE_SECONDS <= 0:
+        yield
+        return
+    stop = threading.Event()
+
+    def _renew_loop() -> None:
+        while not stop.wait(settings.INFLIGHT_LEASE_SECONDS / 3):
+            if not renew(key, task_id):
+                logger.warning("inflight.lease_lost", key=key, task_id=task_id)
+                return
+
+    renewer = threading.Thread(target=_renew_loop, name=f"inflight-{task_id}", daemon=True)
+    renewer.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        renewer.join()
+
+
+def release(key: str | None, task_id: str) -> list[dict]:
+    """Release task_id's lock on key and return the subscribers waiting for its result."""
+    if key is None or settings.INFLIGHT_LEASE_SECONDS <= 0:
+        return []
+    try:
+        raw = get_redis().eval(_RELEASE_SCRIPT, 2, *_keys(key), task_id)
+    except redis.RedisError as e:
+        logger.warning("inflight.release_failed", key=key, task_id=task_id, error=str(e))
+        return []
+    return [json.loads(item) for item in raw]
+
+
+def abandon(key: str | None, task_id: str) -> None:
+    """Give up task_id's lock on key without draining its subscribers.
+
+    For an owner whose job never started: the waiters stay queued for the next claimant
+    of key, which then owns the work and serves them on release.
+    """
+    if key is None or settings.INFLIGHT_LEASE_SECONDS <= 0:
+        return
+    try:
+        get_redis().eval(_ABANDON_SCRIPT, 1, _LOCK_PREFIX + key, task_id)
+    except redis.RedisError as e:
+        logger.warning("inflight.abandon_failed", key=key, task_id=task_id, error=str(e))
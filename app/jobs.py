@@ -0,0 +1,161 @@
+"""Cooperative cancellation and time budgets for running jobs.
+
+A task stage runs inside job_scope(task_id, budget). Code under it calls check() at safe
+points (between Whisper segments) and starts yt-dlp and ffmpeg through run_process() or
+under kill_on_stop(), which kill the child processes as soon as the job is cancelled
+(DELETE /transcript/{task_id} sets a flag in Redis, polled about once a second) or runs
+out of its time budget. The stage then unwinds with JobCancelled or JobTimedOut, its temp
+dir is removed on the way out, and the task sends a "cancelled" or "timeout" webhook.
+"""
+
+import os
+import signal
+import subprocess
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import redis
+import structlog
+
+from app.config import settings
+from app.redis_client import get_redis
+
+logger = structlog.get_logger()
+
+_CANCEL_PREFIX = "aqua:cancel:"
+_POLL_SECONDS = 1.0
+
+
+class JobStopped(Exception):
+    """The job was stopped before it finished; status is the webhook status."""
+
+    status = "stopped"
+
+
+class JobCancelled(JobStopped):
+    status = "cancelled"
+
+
+class JobTimedOut(JobStopped):
+    status = "timeout"
+
+
+def request_cancel(task_id: str) -> None:
+    """Flag task_id for cancellation; its worker stops at the next check."""
+    ttl = settings.TASK_STATUS_TTL_SECONDS or settings.CELERY_VISIBILITY_TIMEOUT_SECONDS
+    get_redis().set(_CANCEL_PREFIX + task_id, 1, ex=ttl)
+    logger.info("jobs.cancel_requested", task_id=task_id)
+
+
+def is_cancelled(task_id: str) -> bool:
+    """True if cancellation was requested for task_id (False if Redis cannot be read)."""
+    try:
+        return bool(get_redis().exists(_CANCEL_PREFIX + task_id))
+    except redis.RedisError as e:
+        logger.warning("jobs.cancel_check_failed", task_id=task_id, error=str(e))
+        return False
+
+
+class _JobControl:
+    def __init__(self, task_id: str, budget: float | None) -> None:
+        self.task_id = task_id
+        self.budget = budget
+        self.deadline = time.monotonic() + budget if budget else None
+        self.polled_at = float("-inf")
+        self.stop: JobStopped | None = None
+
+    def stopped(self) -> JobStopped | None:
+        """The reason to stop, if any; Redis is polled at most once per _POLL_SECONDS."""
+        if self.stop is None and self.deadline is not None and time.monotonic() > self.deadline:
+            self.stop = JobTimedOut(f"Time budget of {self.budget:g} s exceeded")
+        if self.stop is None and time.monotonic() - self.polled_at >= _POLL_SECONDS:
+            self.polled_at = time.monotonic()
+            if is_cancelled(self.task_id):
+                self.stop = JobCancelled("Cancelled by request")
+        return self.stop
+
+
+_current: ContextVar[_JobControl | None] = ContextVar("aqua_job_control", default=None)
+
+
+@contextmanager
+def job_scope(task_id: str, budget: float | None) -> Iterator[None]:
+    """Run the block as task_id's job with budget seconds (None: no limit)."""
+    control = _JobControl(task_id, budget)
+    token = _current.set(control)
+    try:
+        check()
+        yield
+    finally:
+        _current.reset(token)
+
+
+def check() -> None:
+    """Raise JobCancelled or JobTimedOut if the current job should stop."""
+    control = _current.get()
+    if control is not None and (stop := control.stopped()) is not None:
+        raise stop
+
+
+def remaining() -> float | None:
+    """Seconds left in the current job's budget, or None if it has none."""
+    control = _current.get()
+    if control is None or control.deadline is None:
+        return None
+    return max(control.deadline - time.monotonic(), 0.0)
+
+
+def _kill_group(proc: subprocess.Popen) -> None:
+    """Kill proc and whatever it spawned, which may still hold its pipes open."""
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except OSError:
+        # Not a group leader (started without start_new_session) or already gone.
+        proc.kill()
+
+
+@contextmanager
+def kill_on_stop(*procs: subprocess.Popen) -> Iterator[None]:
+    """Kill procs if the current job is stopped while the block runs, then raise why.
+
+    Start procs with start_new_session=True so their own children are killed with them.
+    """
+    control = _current.get()
+    if control is None:
+        yield
+        return
+    done = threading.Event()
+
+    def watch() -> None:
+        while not done.wait(_POLL_SECONDS / 4):
+            if control.stopped() is not None:
+                for proc in procs:
+                    _kill_group(proc)
+                logger.info("jobs.processes_killed", task_id=control.task_id, processes=len(procs))
+                return
+
+    watcher = threading.Thread(target=watch, name="aqua-job-watch", daemon=True)
+    watcher.start()
+    try:
+        yield
+    except Exception:
+        # A killed child usually surfaces as a broken pipe or decode error: report why.
+        if control.stop is not None:
+            raise control.stop from None
+        raise
+    finally:
+        done.set()
+        watcher.join()
+    check()
+
+
+def run_process(cmd: list[str], **kwargs: object) -> subprocess.CompletedProcess:
+    """subprocess.run() whose child (and its children) is killed when the job is stopped."""
+    if kwargs.pop("capture_output", False):
+        kwargs["stdout"] = kwargs["stderr"] = subprocess.PIPE
+    with subprocess.Popen(cmd, start_new_session=True, **kwargs) as proc, kill_on_stop(proc):
+        stdout, stderr = proc.communicate()
+    return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
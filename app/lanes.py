@@ -0,0 +1,138 @@
+"""Priority lanes and per-author fair share for the pipeline queues.
+
+A request's priority picks a lane, which is a Celery message priority on the Redis broker
+(lower is served first; workers prefetch one message so the order holds). Every job an
+author submits takes a token from that author's bucket in Redis (FAIR_SHARE_BURST tokens,
+refilled at FAIR_SHARE_RATE_PER_MINUTE). Once the bucket is empty the author's jobs go one
+lane down, so a backfill of thousands of videos queues behind other users' interactive
+and normal jobs instead of in front of them. A job keeps its lane through the Whisper
+stage.
+"""
+
+import time
+from collections.abc import Iterator
+
+import redis
+import structlog
+from prometheus_client import CollectorRegistry
+from prometheus_client.core import GaugeMetricFamily
+
+from app.config import settings
+from app.redis_client import get_redis
+
+logger = structlog.get_logger()
+
+# Must match the broker's priority_steps (app.celery_app).
+LANE_PRIORITIES = {"interactive": 0, "normal": 3, "bulk": 6, "overflow": 9}
+PRIORITY_LANES = {priority: lane for lane, priority in LANE_PRIORITIES.items()}
+DEFAULT_LANE = "normal"
+_LANE_ORDER = list(LANE_PRIORITIES)
+
+_BUCKET_PREFIX = "aqua:fairshare:"
+# Queues whose per-lane depth is exported on the API's /metrics.
+_QUEUES = ("subs", "whisper", "webhooks")
+
+# KEYS: bucket. ARGV: now, tokens per second, burst. Returns 1 if a token was taken.
+_TAKE_TOKEN_SCRIPT = """
+local now = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local burst = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(now - ts, 0) * rate)
+local taken = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  taken = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 60)
+return taken
+"""
+
+
+def lane_priority(lane: str | None) -> int:
+    """Celery priority of a lane (None is the default lane)."""
+    return LANE_PRIORITIES[lane or DEFAULT_LANE]
+
+
+def _demoted(lane: str) -> str:
+    return _LANE_ORDER[min(_LANE_ORDER.index(lane) + 1, len(_LANE_ORDER) - 1)]
+
+
+def fair_lanes(jobs: list[tuple[str, str | None]]) -> list[str]:
+    """Charge each (author, requested lane) job to its author's bucket; return the lanes.
+
+    Jobs over the author's fair share are demoted one lane. One Redis round-trip for the
+    whole list; if Redis is unavailable every job keeps its requested lane.
+    """
+    lanes = [lane or DEFAULT_LANE for _, lane in jobs]
+    rate = settings.FAIR_SHARE_RATE_PER_MINUTE / 60
+    if rate <= 0 or not jobs:
+        return lanes
+    now = time.time()
+    try:
+        with get_redis().pipeline(transaction=False) as pipe:
+            for author, _ in jobs:
+                pipe.eval(
+                    _TAKE_TOKEN_SCRIPT,
+                    1,
+                    _BUCKET_PREFIX + author,
+                    now,
+                    rate,
+                    settings.FAIR_SHARE_BURST,
+                )
+            taken = pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("lanes.fair_share_failed", error=str(e))
+        return lanes
+    result = [lane if ok else _demoted(lane) for lane, ok in zip(lanes, taken, strict=True)]
+    demoted = sum(1 for ok in taken if not ok)
+    if demoted:
+        logger.info("lanes.demoted", jobs=len(jobs), demoted=demoted)
+    return result
+
+
+def fair_lane(author: str, lane: str | None) -> str:
+    """fair_lanes for a single job."""
+    return fair_lanes([(author, lane)])[0]
+
+
+def lane_queue(queue: str, lane: str) -> str:
+    """Redis list holding a queue's messages of one lane (kombu's priority naming)."""
+    priority = LANE_PRIORITIES[lane]
+    return f"{queue}:{priority}" if priority else queue
+
+
+def queue_depths(queue: str) -> dict[str, int]:
+    """Messages waiting on a queue, by lane. Raises redis.RedisError."""
+    with get_redis().pipeline(transaction=False) as pipe:
+        for lane in LANE_PRIORITIES:
+            pipe.llen(lane_queue(queue, lane))
+        return dict(zip(LANE_PRIORITIES, pipe.execute(), strict=True))
+
+
+class QueueDepthCollector:
+    """Reads the per-lane broker queue lengths from Redis at scrape time."""
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        family = GaugeMetricFamily(
+            "aqua_whisper_queue_depth",
+            "Messages waiting on each Celery queue, by lane.",
+            labels=["queue", "lane"],
+        )
+        for queue in _QUEUES:
+            try:
+                depths = queue_depths(queue)
+            except redis.RedisError as e:
+                logger.warning("lanes.queue_depth_failed", queue=queue, error=str(e))
+                continue
+            for lane, depth in depths.items():
+                family.add_metric([queue, lane], depth)
+        yield family
+
+
+# Kept apart from the process metrics: the depths are broker-wide, not per process.
+queue_depth_registry = CollectorRegistry(auto_describe=False)
+queue_depth_registry.register(QueueDepthCollector())
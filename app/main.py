@@ -1,19 +1,39 @@
 """FastAPI app with API key–protected routes."""
 
+import re
+import time
+from collections import Counter
+from collections.abc import AsyncIterator
+from contextlib import aclosing
+from datetime import UTC, datetime, timedelta
 from uuid import uuid4
 
 import structlog
 from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from starlette.concurrency import run_in_threadpool
 
+from app.admission import Rejected, check_backlog, check_rate
 from app.auth import require_api_key
+from app.blobs import blob_info, read_blob
+from app.cache import get_cached_transcript, get_cached_transcripts, transcript_cache_key
+from app.captions import format_payload
+from app.celery_app import celery_app
 from app.config import settings
+from app.events import RESULT_EVENT, publish_event, read_events
+from app.inflight import abandon, claim, claim_many
+from app.jobs import request_cancel
+from app.lanes import DEFAULT_LANE, fair_lane, fair_lanes, lane_priority, queue_depth_registry
 from app.logging_config import setup_logging
-from app.schemas import TranscriptRequest
-from app.tasks import run_transcript_pipeline
+from app.metrics import metrics_registry
+from app.schemas import TranscriptBatchRequest, TranscriptRequest
+from app.task_status import FINISHED, get_status, mark_queued, store_result
 from app.tracing import setup_tracing
-from app.youtube import is_youtube_url
+from app.video_policy import VideoRejectedError, check_video_policy
+from app.webhooks import offload_transcript
+from app.youtube import is_collection_url, is_youtube_url
 
 setup_logging(service_name="aqua-whisper-api", environment=settings.ENV)
 setup_tracing(service_name="aqua-whisper-api", environment=settings.ENV)
@@ -21,6 +41,89 @@ setup_tracing(service_name="aqua-whisper-api", environment=settings.ENV)
 app = FastAPI()
 logger = structlog.get_logger()
 
+# Tasks are sent by name: importing app.tasks would pull the transcription stack
+# (faster-whisper, CTranslate2, numpy) into the API process, which never runs it.
+PIPELINE_TASK = "app.tasks.run_transcript_pipeline"
+WEBHOOK_TASK = "app.tasks.deliver_webhook"
+EXPAND_TASK = "app.tasks.expand_collection"
+_NOT_YOUTUBE = "video_url must be a YouTube URL"
+_STREAM_ID_PATTERN = re.compile(r"^\d+(-\d+)?$")
+
+
+def _task_options(item: TranscriptRequest) -> dict:
+    """Per-request delivery options carried by the pipeline tasks and coalesced subscribers."""
+    return item.model_dump(
+        include={
+            "output_format",
+            "webhook_encoding",
+            "progressive",
+            "quality",
+            "whisper",
+            "priority",
+            "timeout_seconds",
+            "min_duration_seconds",
+            "max_duration_seconds",
+            "live_policy",
+        },
+        exclude_defaults=True,
+    )
+
+
+def _with_lane(options: dict, lane: str) -> dict:
+    """Options for the enqueued job, carrying the lane it was scheduled in."""
+    options = {k: v for k, v in options.items() if k != "priority"}
+    return options if lane == DEFAULT_LANE else {**options, "priority": lane}
+
+
+def _estimated_completion(wait: float | None) -> dict[str, str]:
+    """202 body field with the estimated completion time, if the backlog could be read."""
+    if wait is None:
+        return {}
+    eta = datetime.now(UTC) + timedelta(seconds=wait)
+    return {"estimated_completion": eta.isoformat(timespec="seconds")}
+
+
+def _send_cached(task_id: str, item: TranscriptRequest, cached: dict) -> None:
+    """Enqueue only the webhook for a transcript served from the cache.
+
+    A cached video outside the request's duration policy is sent as a rejection instead.
+    """
+    payload = {
+        "task_id": task_id,
+        "status": "success",
+        "source": cached["source"],
+        "transcript": cached["transcript"],
+        "author": item.author,
+        "cached": True,
+    }
+    try:
+        if cached.get("video"):
+            check_video_policy(cached["video"], _task_options(item))
+    except VideoRejectedError as e:
+        payload = {
+            "task_id": task_id,
+            "status": "failed",
+            "error": str(e),
+            "author": item.author,
+            "rejected": e.reason,
+        }
+    payload = format_payload(payload, item.output_format)
+    store_result(payload)
+    payload = offload_transcript(payload)
+    celery_app.send_task(WEBHOOK_TASK, args=[item.webhook_url, payload, item.webhook_encoding])
+    publish_event(task_id, RESULT_EVENT, payload)
+
+
+def _send_expansion(task_id: str, item: TranscriptRequest) -> None:
+    """Enqueue the expansion of a playlist or channel URL."""
+    logger.info("transcript.collection", task_id=task_id, video_url=item.video_url)
+    celery_app.send_task(
+        EXPAND_TASK,
+        args=[task_id, item.video_url, item.webhook_url, item.author],
+        kwargs={"options": _task_options(item)},
+        priority=lane_priority(item.priority),
+    )
+
 
 @app.middleware("http")
 async def logging_middleware(request: Request, call_next):
@@ -42,12 +145,29 @@ def validation_exception_handler(_request: Request, exc: RequestValidationError)
     return JSONResponse(status_code=400, content={"detail": "Invalid request body"})
 
 
+@app.exception_handler(Rejected)
+def admission_exception_handler(_request: Request, exc: Rejected) -> JSONResponse:
+    """Return the admission decision (429 or 503) with a Retry-After header."""
+    return JSONResponse(
+        status_code=exc.status,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 @app.get("/health")
 def health() -> dict[str, str]:
     """Health check: returns 200 when API is up. No auth required."""
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+def metrics() -> Response:
+    """Prometheus scrape endpoint: API process metrics and queue depths. No auth required."""
+    body = generate_latest(metrics_registry()) + generate_latest(queue_depth_registry)
+    return Response(body, media_type=CONTENT_TYPE_LATEST)
+
+
 @app.get("/protected")
 def protected(_: None = Depends(require_api_key)) -> dict[str, bool]:
     """Stub protected route for auth tests. Returns 200 with ok: true when auth passes."""
@@ -58,12 +178,285 @@ def protected(_: None = Depends(require_api_key)) -> dict[str, bool]:
 def transcript(
     body: TranscriptRequest,
     _: None = Depends(require_api_key),
-) -> dict[str, str]:
-    """Accept video_url and webhook_url, enqueue transcript task, return 202 with task_id."""
+) -> dict[str, str | bool]:
+    """Accept video_url and webhook_url, enqueue transcript task, return 202 with task_id.
+
+    The job is queued in the request's priority lane, one lane lower once the author has
+    used up their fair share (app.lanes).
+
+    If the transcript is already cached, only the webhook delivery is enqueued and the body
+    carries cached: true. If the same video is already in flight, the request subscribes
+    to that job (coalesced: true) and receives its own webhook when it finishes. A playlist
+    or channel URL is expanded into one job per video (collection: true).
+
+    Authors over their rate limit get 429, and new jobs are refused with 503 while the
+    queue backlog is too deep (app.admission); both carry Retry-After. Otherwise the body
+    of a new job carries estimated_completion.
+    """
     if not is_youtube_url(body.video_url):
-        raise HTTPException(status_code=400, detail="video_url must be a YouTube URL")
+        raise HTTPException(status_code=400, detail=_NOT_YOUTUBE)
     task_id = str(uuid4())
-    run_transcript_pipeline.apply_async(
-        args=[task_id, body.video_url, body.webhook_url, body.author]
+    if is_collection_url(body.video_url):
+        # The videos are charged one by one as the expansion enqueues them.
+        check_backlog(body.priority)
+        mark_queued([task_id])
+        _send_expansion(task_id, body)
+        return {"task_id": task_id, "collection": True}
+    cache_key = transcript_cache_key(
+        body.video_url, body.quality, _task_options(body).get("whisper")
+    )
+    cached = get_cached_transcript(cache_key) if cache_key else None
+    wait = check_backlog(body.priority) if cached is None else None
+    # Charged last, so a request refused for the backlog does not use up the author's quota.
+    check_rate(body.author)
+    if cached is not None:
+        logger.info("transcript.cache_hit", task_id=task_id, video_url=body.video_url)
+        _send_cached(task_id, body, cached)
+        return {"task_id": task_id, "cached": True}
+    mark_queued([task_id])
+    options = _task_options(body)
+    if cache_key and not claim(cache_key, task_id, body.webhook_url, body.author, options=options):
+        logger.info("transcript.coalesced", task_id=task_id, video_url=body.video_url)
+        return {"task_id": task_id, "coalesced": True}
+    lane = fair_lane(body.author, body.priority)
+    try:
+        celery_app.send_task(
+            PIPELINE_TASK,
+            args=[task_id, body.video_url, body.webhook_url, body.author],
+            kwargs={"options": _with_lane(options, lane)},
+            priority=lane_priority(lane),
+        )
+    except Exception:
+        # Free the key for the next submission, which then serves the waiting subscribers.
+        abandon(cache_key, task_id)
+        raise
+    return {"task_id": task_id, **_estimated_completion(wait)}
+
+
+@app.post("/transcripts/batch", status_code=202)
+def transcripts_batch(
+    body: TranscriptBatchRequest,
+    _: None = Depends(require_api_key),
+) -> dict[str, str | list[dict[str, str | bool | int]]]:
+    """Submit many videos in one call; returns one result per item, in request order.
+
+    Each result is what POST /transcript would return for that item ({"task_id"}, plus
+    cached/coalesced/estimated_completion), or {"error"} for an item that was rejected:
+    a bad URL, or an author over their rate limit (with retry_after). A backlogged queue
+    refuses the whole batch with 503, as for POST /transcript. Cache lookups and
+    in-flight claims for the whole batch take one pipelined Redis round-trip each, and the
+    enqueued pipeline tasks share the returned batch_id as their Celery group id.
+    """
+    batch_id = str(uuid4())
+    results: list[dict[str, str | bool | int]] = [{} for _ in body.items]
+    valid = []
+    for index, item in enumerate(body.items):
+        if is_youtube_url(item.video_url):
+            valid.append((index, item))
+        else:
+            results[index] = {"error": _NOT_YOUTUBE}
+    collections = [(index, item) for index, item in valid if is_collection_url(item.video_url)]
+    videos = [
+        (
+            index,
+            item,
+            transcript_cache_key(item.video_url, item.quality, _task_options(item).get("whisper")),
+        )
+        for index, item in valid
+        if not is_collection_url(item.video_url)
+    ]
+    cached = get_cached_transcripts([key for *_, key in videos if key])
+    # The whole batch is refused (503) if any lane it adds jobs to is backlogged; this runs
+    # before the rate limit is charged, so a refused batch costs no quota.
+    new_jobs = Counter(item.priority for _, item in collections)
+    new_jobs.update(item.priority for _, item, key in videos if key not in cached)
+    waits = {lane: check_backlog(lane, jobs) for lane, jobs in new_jobs.items()}
+    limited = {}
+    for author, count in Counter(item.author for _, item, _ in videos).items():
+        try:
+            check_rate(author, count)
+        except Rejected as e:
+            limited[author] = e
+    accepted: list[tuple[int, TranscriptRequest, str, str | None]] = []
+    for index, item, key in videos:
+        if item.author in limited:
+            rejected = limited[item.author]
+            results[index] = {"error": rejected.detail, "retry_after": rejected.retry_after}
+        else:
+            accepted.append((index, item, str(uuid4()), key))
+    collection_ids = [str(uuid4()) for _ in collections]
+    mark_queued(collection_ids + [task_id for _, _, task_id, key in accepted if key not in cached])
+    for (index, item), task_id in zip(collections, collection_ids, strict=True):
+        _send_expansion(task_id, item)
+        results[index] = {"task_id": task_id, "collection": True}
+    to_claim = [
+        (key, task_id, item.webhook_url, item.author, _task_options(item))
+        for _, item, task_id, key in accepted
+        if key and key not in cached
+    ]
+    owned = dict(zip((task_id for _, task_id, *_ in to_claim), claim_many(to_claim), strict=True))
+    unsent = {task_id: key for key, task_id, *_ in to_claim if owned[task_id]}
+    to_send = [
+        (index, item, task_id)
+        for index, item, task_id, key in accepted
+        if key not in cached and owned.get(task_id, True)
+    ]
+    lanes = dict(
+        zip(
+            (task_id for *_, task_id in to_send),
+            fair_lanes([(item.author, item.priority) for _, item, _ in to_send]),
+            strict=True,
+        )
+    )
+    try:
+        for index, item, task_id, key in accepted:
+            if key in cached:
+                _send_cached(task_id, item, cached[key])
+                results[index] = {"task_id": task_id, "cached": True}
+            elif not owned.get(task_id, True):
+                results[index] = {"task_id": task_id, "coalesced": True}
+            else:
+                celery_app.send_task(
+                    PIPELINE_TASK,
+                    args=[task_id, item.video_url, item.webhook_url, item.author],
+                    kwargs={"options": _with_lane(_task_options(item), lanes[task_id])},
+                    group_id=batch_id,
+                    priority=lane_priority(lanes[task_id]),
+                )
+                results[index] = {
+                    "task_id": task_id,
+                    **_estimated_completion(waits[item.priority]),
+                }
+                unsent.pop(task_id, None)
+    except Exception:
+        # Free the keys for the next submissions, which then serve the waiting subscribers.
+        for task_id, key in unsent.items():
+            abandon(key, task_id)
+        raise
+    logger.info(
+        "transcripts_batch.accepted",
+        batch_id=batch_id,
+        items=len(body.items),
+        rejected=len(body.items) - len(accepted) - len(collections),
+        cached=sum(1 for *_, key in accepted if key in cached),
+    )
+    return {"batch_id": batch_id, "items": results}
+
+
+def _parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """Parse a single "bytes=a-b", "bytes=a-" or "bytes=-n" range into inclusive offsets."""
+    unit, _, spec = header.partition("=")
+    start_text, sep, end_text = spec.strip().partition("-")
+    if unit.strip() != "bytes" or not sep or "," in spec:
+        return None
+    try:
+        if not start_text:
+            length = int(end_text)
+            return (max(size - length, 0), size - 1) if length > 0 and size else None
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        return None
+    return start, min(end, size - 1)
+
+
+@app.get("/transcript/{task_id}")
+def transcript_status(task_id: str, _: None = Depends(require_api_key)) -> dict:
+    """Status of a task, with its final webhook payload as result once done or failed.
+
+    status is queued, probing, downloading, transcribing, done or failed; progress is the
+    transcribed fraction of the audio while Whisper runs. Kept TASK_STATUS_TTL_SECONDS.
+    """
+    status = get_status(task_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Task not found or expired")
+    updated_at = datetime.fromtimestamp(status.pop("updated_at"), UTC)
+    body = {"task_id": task_id, **status, "updated_at": updated_at.isoformat(timespec="seconds")}
+    if body["progress"] is None:
+        del body["progress"]
+    return body
+
+
+@app.delete("/transcript/{task_id}", status_code=202)
+def cancel_transcript(task_id: str, _: None = Depends(require_api_key)) -> dict[str, str]:
+    """Cancel a queued or running task; it ends with a "cancelled" webhook.
+
+    A running job stops within about a second: its yt-dlp/ffmpeg processes are killed and
+    Whisper stops between segments. 409 if the task has already finished.
+    """
+    status = get_status(task_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Task not found or expired")
+    if status["status"] in FINISHED:
+        raise HTTPException(status_code=409, detail=f"Task already {status['status']}")
+    request_cancel(task_id)
+    return {"task_id": task_id, "status": "cancelling"}
+
+
+@app.get("/transcript/{task_id}/content")
+def transcript_content(
+    task_id: str,
+    request: Request,
+    _: None = Depends(require_api_key),
+) -> Response:
+    """Serve a transcript too large for its webhook; supports a single Range request."""
+    info = blob_info(task_id)
+    if info is None:
+        raise HTTPException(status_code=404, detail="Transcript not found or expired")
+    size, content_type = info
+    headers = {"Accept-Ranges": "bytes"}
+    range_header = request.headers.get("range")
+    if range_header is None:
+        content = read_blob(task_id, 0, -1) if size else b""
+        return Response(content, media_type=content_type, headers=headers)
+    byte_range = _parse_range(range_header, size)
+    if byte_range is None:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return Response(
+        read_blob(task_id, start, end), status_code=206, media_type=content_type, headers=headers
+    )
+
+
+async def _sse_events(task_id: str, last_event_id: str) -> AsyncIterator[str]:
+    """Format the task's events as SSE until the result or TRANSCRIPT_STREAM_MAX_SECONDS."""
+    deadline = time.monotonic() + settings.TRANSCRIPT_STREAM_MAX_SECONDS
+    block_ms = max(int(settings.TRANSCRIPT_STREAM_KEEPALIVE_SECONDS * 1000), 1)
+    async with aclosing(read_events(task_id, last_event_id, block_ms)) as events:
+        async for item in events:
+            if item is None:
+                yield ": keep-alive\n\n"
+            else:
+                event_id, event, data = item
+                yield f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+            if time.monotonic() >= deadline:
+                return
+
+
+@app.get("/transcript/{task_id}/stream")
+async def transcript_stream(
+    task_id: str,
+    request: Request,
+    _: None = Depends(require_api_key),
+) -> StreamingResponse:
+    """Server-Sent Events for a task: "partial" batches while transcribing, then "result".
+
+    Reconnecting with Last-Event-ID resumes after that event; without it the stream starts
+    from the task's first event. Unknown (or expired) task IDs are a 404.
+    """
+    last_event_id = request.headers.get("last-event-id", "0").strip() or "0"
+    if not _STREAM_ID_PATTERN.match(last_event_id):
+        raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+    if (
+        settings.TASK_STATUS_TTL_SECONDS > 0
+        and await run_in_threadpool(get_status, task_id) is None
+    ):
+        raise HTTPException(status_code=404, detail="Task not found or expired")
+    return StreamingResponse(
+        _sse_events(task_id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    return {"task_id": task_id}
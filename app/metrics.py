@@ -0,0 +1,100 @@
+"""Prometheus metrics shared by the API and worker processes.
+
+Each process exposes its own metrics: the API on GET /metrics and each worker on
+WORKER_METRICS_PORT. With several processes per host (prefork pool, multiple uvicorn
+workers) set PROMETHEUS_MULTIPROC_DIR to a shared empty directory so every exporter
+reports the aggregate of all of them.
+"""
+
+import os
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from opentelemetry import trace
+from opentelemetry.trace import Span
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, multiprocess
+
+tracer = trace.get_tracer(__name__)
+
+MODEL_LOAD_SECONDS = Histogram(
+    "aqua_whisper_model_load_seconds",
+    "Time spent loading a faster-whisper model into the worker process.",
+    ["model", "compute_type", "device"],
+    buckets=(0.5, 1, 2, 5, 10, 20, 30, 60, 120),
+)
+MODEL_CACHE_LOOKUPS = Counter(
+    "aqua_whisper_model_cache_lookups",
+    "Model registry lookups, labelled hit or miss.",
+    ["result"],
+)
+MODEL_LOAD_SECONDS_SAVED = Counter(
+    "aqua_whisper_model_load_seconds_saved",
+    "Load time avoided by reusing an already-loaded model (sum of its load time per hit).",
+    ["model", "compute_type", "device"],
+)
+AUDIO_CACHE_LOOKUPS = Counter(
+    "aqua_whisper_audio_cache_lookups",
+    "Audio cache lookups by the Whisper stage, labelled hit or miss.",
+    ["result"],
+)
+STAGE_SECONDS = Histogram(
+    "aqua_whisper_stage_seconds",
+    "Wall time per pipeline stage (probe, manual_subs, auto_subs, audio_download, "
+    "model_load, transcribe, vtt_build, webhook).",
+    ["stage"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800),
+)
+TRANSCRIPTS = Counter(
+    "aqua_whisper_transcripts",
+    "Transcripts produced by the pipeline, labelled by source (manual, auto, whisper).",
+    ["source"],
+)
+WHISPER_JOBS = Counter(
+    "aqua_whisper_jobs",
+    "Whisper transcriptions by quality tier (default when the request named none).",
+    ["tier"],
+)
+QUEUE_WAIT_SECONDS = Histogram(
+    "aqua_whisper_queue_wait_seconds",
+    "Time a job waited in its Celery queue before a worker started it, by queue and lane.",
+    ["queue", "lane"],
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600),
+)
+ADMISSION_REJECTIONS = Counter(
+    "aqua_whisper_admission_rejections",
+    "Submissions refused by admission control, by reason (rate_limit, backlog, queue_full).",
+    ["reason"],
+)
+VIDEO_REJECTIONS = Counter(
+    "aqua_whisper_video_rejections",
+    "Videos refused by the duration policy, by reason (too_short, too_long, live); a result "
+    "shared by coalesced requests counts once per reason, not once per request.",
+    ["reason"],
+)
+WHISPER_REAL_TIME_FACTOR = Gauge(
+    "aqua_whisper_real_time_factor",
+    "Transcription time divided by audio duration for the most recent Whisper job.",
+    ["mode"],
+    multiprocess_mode="mostrecent",
+)
+
+
+@contextmanager
+def observe_stage(stage: str) -> Iterator[Span]:
+    """Time the block as a child span and an aqua_whisper_stage_seconds observation."""
+    with tracer.start_as_current_span(f"stage.{stage}") as span:
+        started = time.perf_counter()
+        try:
+            yield span
+        finally:
+            STAGE_SECONDS.labels(stage=stage).observe(time.perf_counter() - started)
+
+
+def metrics_registry() -> CollectorRegistry:
+    """Registry to expose: the multiprocess aggregate if configured, else this process."""
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
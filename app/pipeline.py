@@ -1,128 +1,590 @@
-"""Transcript pipeline: yt-dlp manual/auto subtitles, then Whisper fallback."""
+"""Transcript pipeline: one yt-dlp probe, then manual/auto subtitles or Whisper fallback."""
 
+import json
 import shutil
 import subprocess
+import time
+from collections.abc import Callable, Iterator
+from contextlib import closing, contextmanager
 from pathlib import Path
-from tempfile import mkdtemp
+from tempfile import TemporaryFile, mkdtemp
 
-from faster_whisper import WhisperModel
+import numpy as np
 import structlog
 
+from app import audio_cache
+from app.captions import Cue, to_vtt
 from app.config import settings
+from app.jobs import check, kill_on_stop, run_process
+from app.metrics import WHISPER_REAL_TIME_FACTOR, observe_stage
+from app.task_status import DOWNLOADING, TRANSCRIBING
+from app.video_policy import check_video_policy
+from app.whisper_models import get_batched_pipeline, get_model
 
 logger = structlog.get_logger()
 
+# Pseudo-subtitle tracks yt-dlp lists alongside real captions.
+_IGNORED_SUBTITLE_LANGS = frozenset({"live_chat"})
+# Info dict keys not carried from the subtitle stage to the Whisper stage.
+_PRUNED_INFO_KEYS = frozenset(
+    {"subtitles", "automatic_captions", "requested_subtitles", "thumbnails", "heatmap"}
+)
+# faster-whisper's native input: 16 kHz mono float32 PCM.
+_WHISPER_SAMPLE_RATE = 16000
+
 
 class NoSubtitlesError(Exception):
     """Raised when no manual or auto subtitles are available for the video."""
 
 
-def _seconds_to_vtt_ts(seconds: float) -> str:
-    """Format seconds as VTT timestamp HH:MM:SS.mmm."""
-    h = int(seconds // 3600)
-    m = int((seconds % 3600) // 60)
-    s = seconds % 60
-    return f"{h:02d}:{m:02d}:{s:06.3f}"
+class CollectionListingError(Exception):
+    """Raised when a playlist or channel URL yields no videos because yt-dlp failed."""
 
 
-def get_transcript(video_url: str) -> tuple[str, str]:
-    """Return (source, vtt_content). Raises NoSubtitlesError if no subtitles available."""
-    logger.info("get_transcript.start", video_url=video_url)
-    temp_dir = mkdtemp()
-    try:
-        out_base = str(Path(temp_dir) / "subs")
-        # Try manual subtitles first.
-        logger.info("get_transcript.try_manual_subtitles", video_url=video_url)
-        subprocess.run(
+def probe_video(video_url: str, temp_dir: str) -> dict:
+    """Fetch the video's info dict with a single yt-dlp call and save it as temp_dir/info.json.
+
+    Later yt-dlp calls reuse the saved info via --load-info-json instead of re-extracting.
+    Raises NoSubtitlesError if the video is unavailable.
+    """
+    logger.info("get_transcript.probe", video_url=video_url)
+    with observe_stage("probe"):
+        result = run_process(
             [
                 "yt-dlp",
-                "--match-filter",
-                "duration>60",
-                "--write-sub",
+                "--no-playlist",
+                "--dump-single-json",
                 "--skip-download",
-                "--output",
-                out_base,
                 video_url,
             ],
             capture_output=True,
+            text=True,
         )
-        vtt_files = list(Path(temp_dir).glob("*.vtt"))
-        if vtt_files:
-            logger.info("get_transcript.manual_subtitles_found", video_url=video_url)
-            return ("manual", vtt_files[0].read_text())
-
-        # Try auto-generated subtitles.
-        logger.info("get_transcript.try_auto_subtitles", video_url=video_url)
-        subprocess.run(
+    if result.returncode != 0 or not result.stdout.strip():
+        logger.error(
+            "get_transcript.probe_failed",
+            video_url=video_url,
+            returncode=result.returncode,
+            stderr=(result.stderr or "")[-500:],
+        )
+        raise NoSubtitlesError("No manual or auto subtitles available for this video")
+    info = json.loads(result.stdout)
+    (Path(temp_dir) / "info.json").write_text(result.stdout)
+    return info
+
+
+def iter_collection_videos(
+    collection_url: str, depth: int = 0, limit: int | None = None
+) -> Iterator[str]:
+    """Yield the video IDs of a playlist or channel as yt-dlp lists them.
+
+    Flat extraction reads only the listing pages, one JSON line per entry, so IDs are
+    yielded while later pages are still being fetched and nothing is held in memory.
+    Channel URLs list their tabs (videos, shorts, live), which are expanded one level.
+    At most limit IDs (COLLECTION_MAX_VIDEOS) are yielded across all tabs.
+    Raises CollectionListingError if yt-dlp fails before listing anything.
+    """
+    if limit is None:
+        limit = settings.COLLECTION_MAX_VIDEOS
+    listed = 0
+    if limit <= 0:
+        return
+    # stderr goes to a file: a pipe read only after stdout ends would fill up and block
+    # yt-dlp if it warned a lot.
+    with TemporaryFile("w+") as stderr_file:
+        lister = subprocess.Popen(
+            [
+                "yt-dlp",
+                "--flat-playlist",
+                "--lazy-playlist",
+                "--dump-json",
+                "--playlist-end",
+                str(limit),
+                collection_url,
+            ],
+            stdout=subprocess.PIPE,
+            stderr=stderr_file,
+            text=True,
+        )
+        try:
+            for line in lister.stdout:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if entry.get("ie_key") == "YoutubeTab" and entry.get("url") and depth == 0:
+                    with closing(
+                        iter_collection_videos(entry["url"], depth + 1, limit - listed)
+                    ) as tab_videos:
+                        for video_id in tab_videos:
+                            listed += 1
+                            yield video_id
+                elif entry.get("id"):
+                    listed += 1
+                    yield entry["id"]
+                if listed >= limit:
+                    break
+            else:
+                lister.wait()
+        finally:
+            # Stop listing at the limit or if the consumer bails out early.
+            if lister.poll() is None:
+                lister.kill()
+                lister.wait()
+        stderr_file.seek(0)
+        stderr = stderr_file.read()
+    if lister.returncode != 0 and not listed:
+        logger.error(
+            "get_transcript.collection_listing_failed",
+            collection_url=collection_url,
+            returncode=lister.returncode,
+            stderr=stderr[-500:],
+        )
+        raise CollectionListingError("Could not list the videos of this playlist or channel")
+
+
+def prune_info(info: dict) -> dict:
+    """Drop the bulky parts of an info dict the Whisper stage does not need.
+
+    Subtitle/caption listings and thumbnails make up most of a YouTube info dict; the
+    rest (formats, id, duration, epoch, ...) is enough for yt-dlp --load-info-json.
+    """
+    return {k: v for k, v in info.items() if k not in _PRUNED_INFO_KEYS}
+
+
+def _pick_subtitle_lang(tracks: dict | None) -> str | None:
+    """Mirror yt-dlp's default choice: English if offered, else the first listed track."""
+    langs = [
+        lang
+        for lang, formats in (tracks or {}).items()
+        if formats and lang not in _IGNORED_SUBTITLE_LANGS
+    ]
+    if not langs:
+        return None
+    return "en" if "en" in langs else langs[0]
+
+
+def select_subtitle_tracks(info: dict) -> list[tuple[str, str]]:
+    """Return the (source, lang) subtitle tracks to try, manual before auto."""
+    tracks: list[tuple[str, str]] = []
+    manual_lang = _pick_subtitle_lang(info.get("subtitles"))
+    if manual_lang:
+        tracks.append(("manual", manual_lang))
+    auto_lang = _pick_subtitle_lang(info.get("automatic_captions"))
+    if auto_lang:
+        tracks.append(("auto", auto_lang))
+    return tracks
+
+
+def _download_subtitles(temp_dir: str, source: str, lang: str) -> str | None:
+    """Fetch one subtitle track from the probed info; returns its VTT text or None."""
+    out_base = str(Path(temp_dir) / f"subs_{source}")
+    with observe_stage(f"{source}_subs"):
+        run_process(
             [
                 "yt-dlp",
-                "--match-filter",
-                "duration>60",
-                "--write-auto-sub",
+                "--load-info-json",
+                str(Path(temp_dir) / "info.json"),
+                "--write-sub" if source == "manual" else "--write-auto-sub",
+                "--sub-langs",
+                lang,
+                "--sub-format",
+                "vtt",
                 "--skip-download",
                 "--output",
                 out_base,
-                video_url,
             ],
             capture_output=True,
         )
-        vtt_files = list(Path(temp_dir).glob("*.vtt"))
-        if vtt_files:
-            logger.info("get_transcript.auto_subtitles_found", video_url=video_url)
-            return ("auto", vtt_files[0].read_text())
-
-        # Whisper fallback: download audio with yt-dlp -x, transcribe with faster-whisper, return vtt text.
-        logger.info("get_transcript.whisper_fallback_start", video_url=video_url)
-        audio_out = str(Path(temp_dir) / "audio_%(id)s.%(ext)s")
-        subprocess.run(
+    vtt_files = list(Path(temp_dir).glob(f"subs_{source}*.vtt"))
+    if not vtt_files:
+        return None
+    return vtt_files[0].read_text()
+
+
+def _download_audio(temp_dir: str) -> Path | None:
+    """Download and extract the probed video's audio as mp3; returns the file or None."""
+    audio_out = str(Path(temp_dir) / "audio_%(id)s.%(ext)s")
+    run_process(
+        [
+            "yt-dlp",
+            "--load-info-json",
+            str(Path(temp_dir) / "info.json"),
+            "-x",
+            "--audio-format",
+            "mp3",
+            "--output",
+            audio_out,
+        ],
+        capture_output=True,
+    )
+    mp3_files = list(Path(temp_dir).glob("*.mp3"))
+    return mp3_files[0] if mp3_files else None
+
+
+def _cached_audio(temp_dir: str, video_id: str) -> Path | None:
+    """Return the video's native audio from the audio cache, downloading it on a miss.
+
+    yt-dlp --continue resumes a .part file left by an interrupted download of the same
+    video. The per-video lock keeps concurrent jobs from writing the same file.
+    """
+    with audio_cache.locked(video_id):
+        cached = audio_cache.lookup(video_id)
+        if cached is not None:
+            logger.info("get_transcript.audio_cache_hit", video_id=video_id)
+            return cached
+        result = run_process(
             [
                 "yt-dlp",
-                "--match-filter",
-                "duration>60",
-                "-x",
-                "--audio-format",
-                "mp3",
+                "--load-info-json",
+                str(Path(temp_dir) / "info.json"),
+                "--format",
+                f"{audio_cache.AUDIO_FORMAT}/best",
+                "--continue",
                 "--output",
-                audio_out,
-                video_url,
+                audio_cache.output_template(video_id),
             ],
             capture_output=True,
         )
-        mp3_files = list(Path(temp_dir).glob("*.mp3"))
-        if not mp3_files:
+        cached = audio_cache.lookup(video_id, record=False)
+        if cached is None:
             logger.error(
-                "get_transcript.no_audio_downloaded_for_whisper",
-                video_url=video_url,
+                "get_transcript.audio_cache_download_failed",
+                video_id=video_id,
+                returncode=result.returncode,
+                stderr=(result.stderr or b"").decode(errors="replace")[-500:],
             )
-            raise NoSubtitlesError("No manual or auto subtitles available for this video")
-        audio_path = str(mp3_files[0])
-        model_path_or_name = settings.WHISPER_MODEL.strip()
-        project_root = Path(__file__).resolve().parent.parent
-        resolved_path = (
-            (project_root / model_path_or_name).resolve()
-            if not Path(model_path_or_name).is_absolute()
-            else Path(model_path_or_name)
+            return None
+        audio_cache.evict(keep=cached)
+        return cached
+
+
+def _decode_file(path: Path) -> np.ndarray | None:
+    """Decode an audio file to 16 kHz mono float32 with one ffmpeg resample."""
+    result = run_process(
+        [
+            "ffmpeg",
+            "-nostdin",
+            "-loglevel",
+            "error",
+            "-i",
+            str(path),
+            "-f",
+            "f32le",
+            "-ac",
+            "1",
+            "-ar",
+            str(_WHISPER_SAMPLE_RATE),
+            "pipe:1",
+        ],
+        capture_output=True,
+    )
+    if result.returncode != 0 or not result.stdout:
+        logger.error(
+            "get_transcript.audio_decode_failed",
+            path=str(path),
+            stderr=result.stderr.decode(errors="replace")[-500:],
         )
-        model_kwargs: dict = {"compute_type": settings.WHISPER_COMPUTE_TYPE}
-        if resolved_path.is_dir() and (resolved_path / "model.bin").exists():
-            model_kwargs["local_files_only"] = True
-            model = WhisperModel(str(resolved_path), **model_kwargs)
-        else:
-            if settings.WHISPER_DOWNLOAD_ROOT:
-                model_kwargs["download_root"] = settings.WHISPER_DOWNLOAD_ROOT
-            model = WhisperModel(model_path_or_name, **model_kwargs)
-        segments, _ = model.transcribe(audio_path)
-        vtt_lines = ["WEBVTT", ""]
+        return None
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+
+def _stream_audio(temp_dir: str) -> np.ndarray | None:
+    """Pipe the native audio stream through one ffmpeg resample into 16 kHz mono float32.
+
+    yt-dlp writes the best audio-only format (opus/m4a) to stdout and ffmpeg decodes it
+    straight from the pipe, so there is no mp3 re-encode and no audio file on disk.
+    Returns None if nothing could be decoded.
+    """
+    downloader = subprocess.Popen(
+        [
+            "yt-dlp",
+            "--load-info-json",
+            str(Path(temp_dir) / "info.json"),
+            "--format",
+            "bestaudio/best",
+            "--quiet",
+            "--output",
+            "-",
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    decoder = subprocess.Popen(
+        [
+            "ffmpeg",
+            "-nostdin",
+            "-loglevel",
+            "error",
+            "-i",
+            "pipe:0",
+            "-f",
+            "f32le",
+            "-ac",
+            "1",
+            "-ar",
+            str(_WHISPER_SAMPLE_RATE),
+            "pipe:1",
+        ],
+        stdin=downloader.stdout,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True,
+    )
+    # Only ffmpeg holds the pipe now, so yt-dlp sees EPIPE if ffmpeg exits early.
+    downloader.stdout.close()
+    with kill_on_stop(downloader, decoder):
+        # communicate() drains stdout and stderr together, so a chatty ffmpeg cannot block.
+        pcm, decode_error = decoder.communicate()
+        downloader.wait()
+    if decoder.returncode != 0 or not pcm:
+        logger.error(
+            "get_transcript.audio_stream_failed",
+            downloader_returncode=downloader.returncode,
+            decoder_returncode=decoder.returncode,
+            stderr=decode_error.decode(errors="replace")[-500:],
+        )
+        return None
+    return np.frombuffer(pcm, dtype=np.float32)
+
+
+def _partial_due(segments: int, audio_seconds: float) -> bool:
+    """True once enough new segments or audio have been decoded to flush a partial result."""
+    if settings.PARTIAL_FLUSH_SEGMENTS > 0 and segments >= settings.PARTIAL_FLUSH_SEGMENTS:
+        return True
+    return (
+        settings.PARTIAL_FLUSH_AUDIO_SECONDS > 0
+        and audio_seconds >= settings.PARTIAL_FLUSH_AUDIO_SECONDS
+    )
+
+
+def _decode_options(overrides: dict | None, batched: bool) -> dict:
+    """faster-whisper transcribe() arguments from the WHISPER_* settings and overrides."""
+    opts = {
+        "beam_size": settings.WHISPER_BEAM_SIZE,
+        "best_of": settings.WHISPER_BEST_OF,
+        "condition_on_previous_text": settings.WHISPER_CONDITION_ON_PREVIOUS_TEXT,
+        "language": settings.WHISPER_LANGUAGE,
+        "vad_filter": settings.WHISPER_VAD_FILTER,
+        "vad_threshold": settings.WHISPER_VAD_THRESHOLD,
+        "vad_min_silence_ms": settings.WHISPER_VAD_MIN_SILENCE_MS,
+        "vad_speech_pad_ms": settings.WHISPER_VAD_SPEECH_PAD_MS,
+        **(overrides or {}),
+    }
+    vad_parameters = {
+        "threshold": opts.pop("vad_threshold"),
+        "min_silence_duration_ms": opts.pop("vad_min_silence_ms"),
+        "speech_pad_ms": opts.pop("vad_speech_pad_ms"),
+    }
+    # The batched pipeline always runs VAD: it is what splits the audio into chunks.
+    if opts.pop("vad_filter") or batched:
+        opts["vad_parameters"] = vad_parameters
+        if not batched:
+            opts["vad_filter"] = True
+    return opts
+
+
+def _transcribe(
+    audio: np.ndarray | str,
+    duration: float | None,
+    on_partial: Callable[[list[Cue]], None] | None = None,
+    model: tuple[str, str] | None = None,
+    decode: dict | None = None,
+    on_progress: Callable[[str, float | None], None] | None = None,
+) -> str:
+    """Transcribe audio to VTT; long audio goes through the batched pipeline.
+
+    Past WHISPER_LONG_AUDIO_SECONDS, VAD splits the audio at silences into chunks of at most
+    WHISPER_CHUNK_LENGTH seconds and WHISPER_BATCH_SIZE chunks are decoded together, instead
+    of one sequential pass. Segment timestamps are already offset to the full audio.
+
+    faster-whisper decodes lazily while segments are iterated, so they are consumed inside
+    the transcribe stage and rendered to VTT separately. With on_partial, every batch of new
+    cues (PARTIAL_FLUSH_SEGMENTS segments or PARTIAL_FLUSH_AUDIO_SECONDS of audio, whichever
+    comes first) is handed to it as soon as it is decoded; the tail goes out with the result.
+    model is (name, compute_type); None uses WHISPER_MODEL. decode overrides the WHISPER_*
+    decoding settings (beam size, VAD, language, ...). on_progress is called with
+    ("transcribing", fraction of the audio done) at the start and at every such batch.
+    Between segments the job's cancellation flag and time budget are checked (app.jobs).
+    """
+    model_name, compute_type = model or (None, None)
+    long_audio = (
+        settings.WHISPER_LONG_AUDIO_SECONDS > 0
+        and duration is not None
+        and duration >= settings.WHISPER_LONG_AUDIO_SECONDS
+    )
+    if long_audio:
+        logger.info(
+            "get_transcript.whisper_batched",
+            duration=duration,
+            batch_size=settings.WHISPER_BATCH_SIZE,
+            chunk_length=settings.WHISPER_CHUNK_LENGTH,
+        )
+        transcriber = get_batched_pipeline(model_name, compute_type)
+        options = {
+            "batch_size": settings.WHISPER_BATCH_SIZE,
+            "chunk_length": settings.WHISPER_CHUNK_LENGTH,
+            **_decode_options(decode, batched=True),
+        }
+    else:
+        transcriber = get_model(model_name, compute_type)
+        options = _decode_options(decode, batched=False)
+    started = time.perf_counter()
+    cues: list[Cue] = []
+    flushed = 0
+    flushed_until = 0.0
+    if on_progress is not None:
+        on_progress(TRANSCRIBING, 0.0)
+    with observe_stage("transcribe"):
+        segments, _ = transcriber.transcribe(audio, **options)
         for seg in segments:
-            if not seg.text.strip():
+            check()
+            text = seg.text.strip()
+            if not text:
                 continue
-            vtt_lines.append(
-                f"{_seconds_to_vtt_ts(seg.start)} --> {_seconds_to_vtt_ts(seg.end)}"
-            )
-            vtt_lines.append(seg.text.strip())
-            vtt_lines.append("")
-        logger.info("get_transcript.whisper_fallback_success", video_url=video_url)
-        return ("whisper", "\n".join(vtt_lines).strip())
+            cues.append(Cue(seg.start, seg.end, text))
+            if _partial_due(len(cues) - flushed, seg.end - flushed_until):
+                if on_partial is not None:
+                    on_partial(cues[flushed:])
+                if on_progress is not None and duration:
+                    on_progress(TRANSCRIBING, min(seg.end / duration, 1.0))
+                flushed = len(cues)
+                flushed_until = seg.end
+    if duration:
+        # Model load is excluded: the clock starts once the model is in hand.
+        WHISPER_REAL_TIME_FACTOR.labels(mode="batched" if long_audio else "sequential").set(
+            (time.perf_counter() - started) / duration
+        )
+    with observe_stage("vtt_build"):
+        return to_vtt(cues)
+
+
+@contextmanager
+def _work_dir(video_url: str) -> Iterator[str]:
+    """Per-stage temp dir, always removed afterwards."""
+    temp_dir = mkdtemp()
+    try:
+        yield temp_dir
     finally:
         shutil.rmtree(temp_dir, ignore_errors=True)
         logger.info("get_transcript.cleanup_complete", video_url=video_url)
+
+
+def _fetch_subtitles(
+    video_url: str, temp_dir: str, policy: dict | None = None
+) -> tuple[dict, tuple[str, str] | None]:
+    info = probe_video(video_url, temp_dir)
+    # Out-of-policy videos fail here, before any subtitle or audio download.
+    check_video_policy(info, policy)
+    # Only tracks the probe reported are fetched; manual is preferred over auto.
+    for source, lang in select_subtitle_tracks(info):
+        logger.info(f"get_transcript.try_{source}_subtitles", video_url=video_url, lang=lang)
+        vtt_content = _download_subtitles(temp_dir, source, lang)
+        if vtt_content is not None:
+            logger.info(f"get_transcript.{source}_subtitles_found", video_url=video_url)
+            return info, (source, vtt_content)
+    return info, None
+
+
+def _transcribe_whisper(
+    video_url: str,
+    temp_dir: str,
+    info: dict,
+    on_partial: Callable[[list[Cue]], None] | None = None,
+    model: tuple[str, str] | None = None,
+    decode: dict | None = None,
+    on_progress: Callable[[str, float | None], None] | None = None,
+) -> str:
+    # Whisper fallback: stream decoded audio (or, in file mode, download an mp3 with
+    # yt-dlp -x; with AUDIO_CACHE_DIR, reuse or fetch the cached native audio) and
+    # transcribe with faster-whisper, return vtt text.
+    logger.info(
+        "get_transcript.whisper_fallback_start",
+        video_url=video_url,
+        audio_mode=settings.WHISPER_AUDIO_MODE,
+    )
+    if on_progress is not None:
+        on_progress(DOWNLOADING, None)
+    with observe_stage("audio_download"):
+        if settings.AUDIO_CACHE_DIR and info.get("id"):
+            # Cached audio is the native stream: decoded here in stream mode, handed to
+            # faster-whisper as a file (it decodes any container) in file mode.
+            audio_path = _cached_audio(temp_dir, info["id"])
+            if audio_path is None:
+                audio = None
+            elif settings.WHISPER_AUDIO_MODE == "stream":
+                audio = _decode_file(audio_path)
+            else:
+                audio = str(audio_path)
+        elif settings.WHISPER_AUDIO_MODE == "stream":
+            audio = _stream_audio(temp_dir)
+        else:
+            audio_path = _download_audio(temp_dir)
+            audio = str(audio_path) if audio_path is not None else None
+    if audio is None:
+        logger.error(
+            "get_transcript.no_audio_downloaded_for_whisper",
+            video_url=video_url,
+        )
+        raise NoSubtitlesError("No manual or auto subtitles available for this video")
+    duration = (
+        len(audio) / _WHISPER_SAMPLE_RATE if isinstance(audio, np.ndarray) else info.get("duration")
+    )
+    vtt_content = _transcribe(audio, duration, on_partial, model, decode, on_progress)
+    logger.info("get_transcript.whisper_fallback_success", video_url=video_url)
+    return vtt_content
+
+
+def find_subtitles(
+    video_url: str, policy: dict | None = None
+) -> tuple[dict, tuple[str, str] | None]:
+    """Subtitle stage: probe once, apply the duration policy, fetch the preferred subtitles.
+
+    Returns (info, (source, vtt_content)), or (info, None) when the video has no usable
+    subtitles and needs Whisper. Raises NoSubtitlesError if the probe fails and
+    app.video_policy.VideoRejectedError if the video is outside the policy.
+    """
+    logger.info("get_transcript.start", video_url=video_url)
+    with _work_dir(video_url) as temp_dir:
+        return _fetch_subtitles(video_url, temp_dir, policy)
+
+
+def transcribe_video(
+    video_url: str,
+    info: dict | None = None,
+    on_partial: Callable[[list[Cue]], None] | None = None,
+    model: tuple[str, str] | None = None,
+    decode: dict | None = None,
+    on_progress: Callable[[str, float | None], None] | None = None,
+) -> str:
+    """Whisper stage: transcribe the video's audio and return VTT text.
+
+    Reuses info from the subtitle stage unless it is older than PROBE_MAX_AGE_SECONDS
+    (stream URLs in it expire), in which case the video is probed again. on_partial, if
+    given, receives batches of cues while transcription is still running; model is
+    (name, compute_type) of the quality tier to use, None for WHISPER_MODEL; decode holds
+    the request's decoding overrides. on_progress receives (stage, fraction done) as the job
+    moves from downloading to transcribing.
+    """
+    with _work_dir(video_url) as temp_dir:
+        probed_at = (info or {}).get("epoch") or 0
+        if info is None or time.time() - probed_at > settings.PROBE_MAX_AGE_SECONDS:
+            info = probe_video(video_url, temp_dir)
+        else:
+            (Path(temp_dir) / "info.json").write_text(json.dumps(info))
+        return _transcribe_whisper(
+            video_url, temp_dir, info, on_partial, model, decode, on_progress
+        )
+
+
+def get_transcript(video_url: str) -> tuple[str, str]:
+    """Return (source, vtt_content). Raises NoSubtitlesError if no subtitles available.
+
+    Runs both stages in one process with a single temp dir and probe.
+    """
+    logger.info("get_transcript.start", video_url=video_url)
+    with _work_dir(video_url) as temp_dir:
+        info, subtitles = _fetch_subtitles(video_url, temp_dir)
+        if subtitles is not None:
+            return subtitles
+        return ("whisper", _transcribe_whisper(video_url, temp_dir, info))
@@ -0,0 +1,121 @@
+"""Progress of a playlist or channel expansion and its aggregate webhook.
+
+expand_collection streams a collection's videos onto the queue as yt-dlp lists them. Each
+video becomes an ordinary pipeline job whose payload carries parent_task_id; this module
+keeps a Redis hash per expansion counting finished children, and a set of video IDs
+already enqueued so a video listed twice (or a redelivered expansion) is only done once.
+Exactly one caller, the last child to finish or the end of the listing, gets the
+aggregate payload to deliver.
+"""
+
+import redis
+import structlog
+
+from app.config import settings
+from app.redis_client import get_redis
+
+logger = structlog.get_logger()
+
+_STATE_PREFIX = "aqua:playlist:"
+_SEEN_SUFFIX = ":seen"
+
+# KEYS: state. ARGV: counter field ("succeeded" | "failed").
+# Returns 1 if this completion finished the expansion (reported exactly once).
+_CHILD_DONE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+  return 0
+end
+redis.call('HINCRBY', KEYS[1], ARGV[1], 1)
+local done = redis.call('HINCRBY', KEYS[1], 'done', 1)
+local total = redis.call('HGET', KEYS[1], 'total')
+if total and tonumber(total) == done then
+  return redis.call('HSETNX', KEYS[1], 'reported', 1)
+end
+return 0
+"""
+
+# KEYS: state. ARGV: total, status. Returns 1 if every child had already finished.
+_LISTING_DONE_SCRIPT = """
+redis.call('HSET', KEYS[1], 'total', ARGV[1], 'status', ARGV[2])
+local done = tonumber(redis.call('HGET', KEYS[1], 'done') or '0')
+if done == tonumber(ARGV[1]) then
+  return redis.call('HSETNX', KEYS[1], 'reported', 1)
+end
+return 0
+"""
+
+
+def _state_key(parent_task_id: str) -> str:
+    return _STATE_PREFIX + parent_task_id
+
+
+def start_expansion(parent_task_id: str, webhook_url: str, author: str) -> None:
+    """Create the progress hash (kept if it exists, so a redelivered expansion resumes)."""
+    state = _state_key(parent_task_id)
+    with get_redis().pipeline() as pipe:
+        pipe.hsetnx(state, "webhook_url", webhook_url)
+        pipe.hsetnx(state, "author", author)
+        pipe.hsetnx(state, "done", 0)
+        pipe.expire(state, settings.COLLECTION_STATE_TTL_SECONDS)
+        pipe.execute()
+
+
+def mark_seen(parent_task_id: str, video_id: str) -> bool:
+    """Record video_id for this expansion; False if it was already enqueued."""
+    seen = _state_key(parent_task_id) + _SEEN_SUFFIX
+    with get_redis().pipeline() as pipe:
+        pipe.sadd(seen, video_id)
+        pipe.expire(seen, settings.COLLECTION_STATE_TTL_SECONDS)
+        added, _ = pipe.execute()
+    return bool(added)
+
+
+def forget_seen(parent_task_id: str, video_id: str) -> None:
+    """Undo mark_seen for a video that was not enqueued after all."""
+    get_redis().srem(_state_key(parent_task_id) + _SEEN_SUFFIX, video_id)
+
+
+def seen_count(parent_task_id: str) -> int:
+    """Number of distinct videos enqueued so far for this expansion."""
+    return get_redis().scard(_state_key(parent_task_id) + _SEEN_SUFFIX)
+
+
+def _aggregate(parent_task_id: str) -> dict:
+    state = {
+        k.decode(): v.decode() for k, v in get_redis().hgetall(_state_key(parent_task_id)).items()
+    }
+    return {
+        "webhook_url": state.get("webhook_url"),
+        "payload": {
+            "task_id": parent_task_id,
+            "status": state.get("status", "completed"),
+            "videos": int(state.get("total", 0)),
+            "succeeded": int(state.get("succeeded", 0)),
+            "failed": int(state.get("failed", 0)),
+            "author": state.get("author", "unknown"),
+        },
+    }
+
+
+def finish_listing(parent_task_id: str, total: int, status: str = "completed") -> dict | None:
+    """Record the final video count; returns the aggregate if all children already finished.
+
+    status is "partial" when the listing broke off after some videos were enqueued.
+    """
+    state = _state_key(parent_task_id)
+    completed = get_redis().eval(_LISTING_DONE_SCRIPT, 1, state, total, status)
+    logger.info(
+        "playlists.listing_complete", parent_task_id=parent_task_id, videos=total, status=status
+    )
+    return _aggregate(parent_task_id) if completed else None
+
+
+def record_child(parent_task_id: str, failed: bool) -> dict | None:
+    """Count one finished child; returns {"webhook_url", "payload"} once the last one is in."""
+    field = "failed" if failed else "succeeded"
+    try:
+        completed = get_redis().eval(_CHILD_DONE_SCRIPT, 1, _state_key(parent_task_id), field)
+    except redis.RedisError as e:
+        logger.warning("playlists.record_failed", parent_task_id=parent_task_id, error=str(e))
+        return None
+    return _aggregate(parent_task_id) if completed else None
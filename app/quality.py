@@ -0,0 +1,73 @@
+"""Whisper quality tiers: per-request model choice and the "auto" policy.
+
+A request may name a tier from WHISPER_QUALITY_TIERS (e.g. draft/standard/high, each a
+model and compute type) or ask for "auto". Auto is decided by the Whisper stage, when the
+audio duration is known: it starts from the highest tier and steps down for long audio and
+for a backlog on the whisper queue, so a spike trades accuracy for latency instead of
+letting the queue grow without bound.
+"""
+
+import redis
+import structlog
+
+from app.config import settings
+from app.lanes import queue_depths
+
+logger = structlog.get_logger()
+
+AUTO = "auto"
+_WHISPER_QUEUE = "whisper"
+
+
+def tier_names() -> list[str]:
+    """Configured tier names, lowest quality first."""
+    return list(settings.WHISPER_QUALITY_TIERS)
+
+
+def resolve_tier(quality: str | None) -> tuple[str, str]:
+    """Return (model, compute_type) for a tier name; None means the configured default."""
+    if quality is None:
+        return settings.WHISPER_MODEL.strip(), settings.WHISPER_COMPUTE_TYPE
+    model, _, compute_type = settings.WHISPER_QUALITY_TIERS[quality].partition(":")
+    return model.strip(), compute_type or settings.WHISPER_COMPUTE_TYPE
+
+
+def cache_variant(quality: str | None) -> str:
+    """Cache and in-flight key suffix: the model for a fixed tier, "auto" for the policy."""
+    if quality == AUTO:
+        return AUTO
+    return ":".join(resolve_tier(quality))
+
+
+def whisper_queue_depth() -> int:
+    """Jobs waiting on the whisper queue, all lanes (0 if the broker cannot be read)."""
+    try:
+        return sum(queue_depths(_WHISPER_QUEUE).values())
+    except redis.RedisError as e:
+        logger.warning("quality.queue_depth_failed", error=str(e))
+        return 0
+
+
+def pick_auto_tier(duration: float | None, queue_depth: int) -> str:
+    """Choose a tier for "auto" from the audio duration and the whisper queue backlog."""
+    tiers = tier_names()
+    steps = 0
+    if (
+        settings.WHISPER_AUTO_LONG_AUDIO_SECONDS > 0
+        and duration is not None
+        and duration >= settings.WHISPER_AUTO_LONG_AUDIO_SECONDS
+    ):
+        steps += 1
+    if settings.WHISPER_AUTO_QUEUE_STEP > 0:
+        steps += queue_depth // settings.WHISPER_AUTO_QUEUE_STEP
+    return tiers[max(len(tiers) - 1 - steps, 0)]
+
+
+def select_tier(quality: str | None, duration: float | None) -> str | None:
+    """Resolve the request's quality to a tier name (None keeps the default model)."""
+    if quality != AUTO or not settings.WHISPER_QUALITY_TIERS:
+        return None if quality == AUTO else quality
+    depth = whisper_queue_depth()
+    tier = pick_auto_tier(duration, depth)
+    logger.info("quality.auto_tier", tier=tier, duration=duration, queue_depth=depth)
+    return tier
@@ -0,0 +1,25 @@
+"""Shared Redis connection for caches and coordination state (separate from the Celery broker)."""
+
+import redis
+import redis.asyncio
+
+from app.config import settings
+
+_client: redis.Redis | None = None
+_async_client: redis.asyncio.Redis | None = None
+
+
+def get_redis() -> redis.Redis:
+    """Return the process-wide Redis client, created on first use."""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL)
+    return _client
+
+
+def get_async_redis() -> redis.asyncio.Redis:
+    """Return the process-wide asyncio Redis client for the API's long-lived streams."""
+    global _async_client
+    if _async_client is None:
+        _async_client = redis.asyncio.Redis.from_url(settings.REDIS_URL)
+    return _async_client
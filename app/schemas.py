@@ -1,6 +1,26 @@
 """Pydantic request/response schemas."""
 
-from pydantic import BaseModel
+from typing import Literal
+
+from pydantic import BaseModel, Field, field_validator
+
+from app.captions import OutputFormat
+from app.config import settings
+from app.quality import AUTO, tier_names
+
+
+class WhisperOptions(BaseModel):
+    """Per-request overrides of the WHISPER_* decoding settings (unset fields keep them)."""
+
+    beam_size: int | None = Field(None, ge=1, le=10)
+    best_of: int | None = Field(None, ge=1, le=10)
+    condition_on_previous_text: bool | None = None
+    # Skips language detection, e.g. "en".
+    language: str | None = Field(None, pattern=r"^[a-z]{2,3}$")
+    vad_filter: bool | None = None
+    vad_threshold: float | None = Field(None, ge=0, le=1)
+    vad_min_silence_ms: int | None = Field(None, ge=0)
+    vad_speech_pad_ms: int | None = Field(None, ge=0)
 
 
 class TranscriptRequest(BaseModel):
@@ -9,3 +29,38 @@ class TranscriptRequest(BaseModel):
     video_url: str
     webhook_url: str
     author: str = "unknown"
+    # Transcript format in the webhook; None sends the source VTT unchanged.
+    output_format: OutputFormat | None = None
+    # Compress the webhook request body (Content-Encoding); None sends plain JSON.
+    webhook_encoding: Literal["gzip", "zstd"] | None = None
+    # Whisper jobs: also send "partial" webhooks with numbered batches while transcribing.
+    progressive: bool = False
+    # Whisper quality tier (WHISPER_QUALITY_TIERS) or "auto"; None uses WHISPER_MODEL.
+    quality: str | None = None
+    # Whisper decoding overrides (beam size, VAD, language, ...).
+    whisper: WhisperOptions | None = None
+    # Scheduling lane: interactive jobs are served before normal, normal before bulk.
+    priority: Literal["interactive", "normal", "bulk"] = "normal"
+    # Running-time budget for this job (capped by JOB_TIMEOUT_SECONDS); None uses the cap.
+    timeout_seconds: int | None = Field(None, gt=0)
+    # Duration policy overrides; None uses MIN_VIDEO_SECONDS / MAX_VIDEO_SECONDS.
+    min_duration_seconds: float | None = Field(None, ge=0)
+    max_duration_seconds: float | None = Field(None, gt=0)
+    # "reject" also refuses recordings of finished live streams; None uses LIVE_VIDEO_POLICY.
+    live_policy: Literal["recordings", "reject"] | None = None
+
+    @field_validator("quality")
+    @classmethod
+    def _known_quality(cls, value: str | None) -> str | None:
+        allowed = [*tier_names(), AUTO] if tier_names() else []
+        if value is not None and value not in allowed:
+            raise ValueError(f"quality must be one of {allowed}")
+        return value
+
+
+class TranscriptBatchRequest(BaseModel):
+    """Request body for POST /transcripts/batch."""
+
+    items: list[TranscriptRequest] = Field(
+        min_length=1, max_length=settings.TRANSCRIPT_BATCH_MAX_ITEMS
+    )
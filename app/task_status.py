@@ -0,0 +1,84 @@
+"""Per-task status and result store behind GET /transcript/{task_id}.
+
+Each task has a Redis hash (aqua:status:{task_id}) holding its status, progress (0 to 1,
+while transcribing) and update time, kept for TASK_STATUS_TTL_SECONDS after the last
+write. The final webhook payload is stored in it zstd-compressed, so a receiver that lost
+a webhook can read the result back instead of submitting the video again. Writes never
+fail a job: if Redis is unavailable the status is simply not recorded.
+"""
+
+import json
+import time
+
+import redis
+import structlog
+import zstandard
+
+from app.config import settings
+from app.redis_client import get_redis
+
+logger = structlog.get_logger()
+
+QUEUED = "queued"
+PROBING = "probing"
+DOWNLOADING = "downloading"
+TRANSCRIBING = "transcribing"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TIMEOUT = "timeout"
+FINISHED = frozenset({DONE, FAILED, CANCELLED, TIMEOUT})
+
+_STATUS_PREFIX = "aqua:status:"
+
+
+def _write(task_ids: list[str], fields: dict) -> None:
+    if settings.TASK_STATUS_TTL_SECONDS <= 0 or not task_ids:
+        return
+    fields = {**fields, "updated_at": round(time.time(), 3)}
+    try:
+        with get_redis().pipeline(transaction=False) as pipe:
+            for task_id in task_ids:
+                pipe.hset(_STATUS_PREFIX + task_id, mapping=fields)
+                pipe.expire(_STATUS_PREFIX + task_id, settings.TASK_STATUS_TTL_SECONDS)
+            pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("task_status.write_failed", tasks=len(task_ids), error=str(e))
+
+
+def set_status(task_id: str, status: str, progress: float | None = None) -> None:
+    """Record the stage a task is in; progress is the transcribed fraction of the audio."""
+    _write([task_id], {"status": status, "progress": "" if progress is None else progress})
+
+
+def mark_queued(task_ids: list[str]) -> None:
+    """Record newly accepted tasks as queued (one round-trip for all of them)."""
+    _write(task_ids, {"status": QUEUED, "progress": ""})
+
+
+def store_result(payload: dict) -> None:
+    """Record a task's final webhook payload (done, or failed/cancelled/timeout if it says so)."""
+    body = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode()
+    _write(
+        [payload["task_id"]],
+        {
+            "status": payload["status"] if payload["status"] in FINISHED else DONE,
+            "progress": 1,
+            "result": zstandard.ZstdCompressor(level=3).compress(body),
+        },
+    )
+
+
+def get_status(task_id: str) -> dict | None:
+    """Return {"status", "progress", "updated_at", "result"?} for a task, or None if unknown."""
+    raw = get_redis().hgetall(_STATUS_PREFIX + task_id)
+    if not raw:
+        return None
+    status = {
+        "status": raw[b"status"].decode(),
+        "progress": float(raw[b"progress"]) if raw.get(b"progress") else None,
+        "updated_at": float(raw[b"updated_at"]),
+    }
+    if b"result" in raw:
+        status["result"] = json.loads(zstandard.ZstdDecompressor().decompress(raw[b"result"]))
+    return status
@@ -1,21 +1,297 @@
-"""Celery tasks: run transcript pipeline and POST result to webhook."""
+"""Celery tasks: run transcript pipeline stages and POST results to webhooks.
+
+run_transcript_pipeline (queue "subs") probes the video and fetches subtitles, which takes
+about a second of network time. Only videos without subtitles escalate to
+run_whisper_transcription (queue "whisper"), so cheap jobs never wait behind long
+transcriptions and each pool can be sized on its own. deliver_webhook (queue "webhooks")
+does the POSTs. expand_collection (queue "subs") turns a playlist or channel into one
+run_transcript_pipeline job per video, tagged with its parent_task_id. Jobs are enqueued
+with the Celery priority of their lane (app.lanes). Both pipeline stages run under the
+job's time budget and can be cancelled (app.jobs); a stopped job gets a "cancelled" or
+"timeout" webhook, and the submissions coalesced into it are resubmitted.
+"""
+
+from uuid import uuid4
 
 import httpx
 import structlog
 from opentelemetry import trace
 
+from app.admission import Rejected, check_backlog, check_rate
+from app.cache import get_cached_transcript, store_transcript, transcript_cache_key
+from app.captions import Cue, format_payload, render_cues
 from app.celery_app import celery_app
-from app.pipeline import get_transcript
+from app.config import settings
+from app.events import RESULT_EVENT, publish_event
+from app.inflight import claim, keep_alive, release, renew
+from app.jobs import JobCancelled, JobStopped, JobTimedOut, is_cancelled, job_scope, remaining
+from app.lanes import fair_lane, lane_priority
+from app.metrics import TRANSCRIPTS, VIDEO_REJECTIONS, WHISPER_JOBS
+from app.pipeline import find_subtitles, iter_collection_videos, prune_info, transcribe_video
+from app.playlists import (
+    finish_listing,
+    forget_seen,
+    mark_seen,
+    record_child,
+    seen_count,
+    start_expansion,
+)
+from app.quality import resolve_tier, select_tier
+from app.task_status import PROBING, QUEUED, mark_queued, set_status, store_result
+from app.video_policy import VideoRejectedError, check_video_policy, policy_info
+from app.webhooks import (
+    dead_letter,
+    is_retryable,
+    offload_transcript,
+    post_webhook,
+    retry_delay,
+)
 
 logger = structlog.get_logger()
 tracer = trace.get_tracer(__name__)
 
 
-@celery_app.task
+def _deliver(
+    webhook_url: str,
+    payload: dict,
+    parent_task_id: str | None,
+    options: dict | None,
+    seq: int | None = None,
+) -> None:
+    """Enqueue a result webhook in the recipient's output format and encoding.
+
+    The payload is also published as the "result" event of the recipient's event stream
+    and recorded as the task's result (app.task_status). A
+    collection child also counts toward its parent's aggregate. seq numbers the final
+    webhook after a progressive job's partials.
+    """
+    options = options or {}
+    if payload["status"] == "success" and is_cancelled(payload["task_id"]):
+        # A coalesced request cancelled while the job it joined kept running.
+        payload = _stopped(
+            payload["task_id"], payload["author"], JobCancelled("Cancelled by request")
+        )
+    payload = format_payload(payload, options.get("output_format"))
+    if parent_task_id:
+        payload = {**payload, "parent_task_id": parent_task_id}
+    if seq is not None:
+        payload = {**payload, "seq": seq}
+    # The status store keeps the full transcript even when the webhook only links to it.
+    store_result(payload)
+    payload = offload_transcript(payload)
+    deliver_webhook.delay(webhook_url, payload, options.get("webhook_encoding"))
+    publish_event(payload["task_id"], RESULT_EVENT, payload)
+    if parent_task_id:
+        aggregate = record_child(parent_task_id, failed=payload["status"] != "success")
+        if aggregate is not None:
+            deliver_webhook.delay(aggregate["webhook_url"], aggregate["payload"])
+            publish_event(parent_task_id, RESULT_EVENT, aggregate["payload"])
+            store_result(aggregate["payload"])
+
+
+def _finish(
+    task_id: str,
+    video_url: str,
+    webhook_url: str,
+    author: str,
+    cache_key: str | None,
+    payload: dict,
+    parent_task_id: str | None = None,
+    options: dict | None = None,
+    seq: int | None = None,
+    video: dict | None = None,
+) -> None:
+    """Release the in-flight lock and enqueue webhooks for the owner and every subscriber.
+
+    A cancellation or time budget belongs to the owner alone: if the owner was stopped,
+    each subscriber (unless cancelled itself) is resubmitted as a job of its own instead.
+    So is its duration policy: video (policy_info, given with a success or a policy
+    rejection) is checked against each subscriber's own policy. A subscriber refused by it
+    gets a rejection; one that accepts a video the owner's policy refused is resubmitted.
+    Those rejections count in VIDEO_REJECTIONS once per reason, not once per subscriber.
+    """
+    subscribers = release(cache_key, task_id)
+    trace.get_current_span().set_attribute("inflight.subscribers", len(subscribers))
+    _deliver(webhook_url, payload, parent_task_id, options, seq)
+    stopped = payload["status"] in (JobCancelled.status, JobTimedOut.status)
+    counted = {payload.get("rejected")}
+    for subscriber in subscribers:
+        subscriber_payload = {
+            **payload,
+            "task_id": subscriber["task_id"],
+            "author": subscriber["author"],
+        }
+        if stopped:
+            if not is_cancelled(subscriber["task_id"]):
+                _resubmit(video_url, subscriber)
+                continue
+            subscriber_payload = _stopped(
+                subscriber["task_id"], subscriber["author"], JobCancelled("Cancelled by request")
+            )
+        elif video:
+            try:
+                check_video_policy(video, subscriber.get("options"), record=False)
+            except VideoRejectedError as e:
+                if e.reason not in counted:
+                    counted.add(e.reason)
+                    VIDEO_REJECTIONS.labels(reason=e.reason).inc()
+                subscriber_payload = _rejected(
+                    subscriber["task_id"], video_url, subscriber["author"], e
+                )
+            else:
+                if payload.get("rejected"):
+                    _resubmit(video_url, subscriber)
+                    continue
+        _deliver(
+            subscriber["webhook_url"],
+            subscriber_payload,
+            subscriber.get("parent_task_id"),
+            subscriber.get("options"),
+        )
+
+
+def _resubmit(video_url: str, subscriber: dict) -> None:
+    """Enqueue a subscriber of a stopped job as a new job (subscribers coalesce again)."""
+    options = subscriber.get("options") or {}
+    logger.info("run_transcript_pipeline.subscriber_resubmitted", task_id=subscriber["task_id"])
+    set_status(subscriber["task_id"], QUEUED)
+    run_transcript_pipeline.apply_async(
+        (subscriber["task_id"], video_url, subscriber["webhook_url"], subscriber["author"]),
+        {"parent_task_id": subscriber.get("parent_task_id"), "options": options},
+        priority=lane_priority(options.get("priority")),
+    )
+
+
+class _PartialResults:
+    """Publishes batches of cues as numbered "partial" events while Whisper is still running.
+
+    Progressive requests also get each batch as a "partial" webhook.
+    """
+
+    def __init__(
+        self,
+        task_id: str,
+        webhook_url: str,
+        author: str,
+        parent_task_id: str | None,
+        options: dict,
+    ) -> None:
+        self.task_id = task_id
+        self.webhook_url = webhook_url
+        self.author = author
+        self.parent_task_id = parent_task_id
+        self.options = options
+        self.seq = 0
+
+    def __call__(self, cues: list[Cue]) -> None:
+        self.seq += 1
+        output_format = self.options.get("output_format")
+        payload = {
+            "task_id": self.task_id,
+            "status": "partial",
+            "seq": self.seq,
+            "source": "whisper",
+            "transcript": render_cues(cues, output_format or "vtt"),
+            "author": self.author,
+        }
+        if output_format:
+            payload["format"] = output_format
+        if self.parent_task_id:
+            payload["parent_task_id"] = self.parent_task_id
+        publish_event(self.task_id, "partial", payload)
+        if self.options.get("progressive"):
+            deliver_webhook.delay(self.webhook_url, payload, self.options.get("webhook_encoding"))
+        logger.info(
+            "run_whisper_transcription.partial_sent",
+            task_id=self.task_id,
+            seq=self.seq,
+            segments=len(cues),
+        )
+
+
+def _success(
+    task_id: str,
+    video_url: str,
+    author: str,
+    cache_key: str | None,
+    source: str,
+    transcript: str,
+    cached: bool = False,
+    video: dict | None = None,
+) -> dict:
+    """Build the success payload, caching fresh results (with the video's policy_info)."""
+    if not cached:
+        TRANSCRIPTS.labels(source=source).inc()
+        if cache_key:
+            store_transcript(cache_key, source, transcript, video)
+    payload = {
+        "task_id": task_id,
+        "status": "success",
+        "source": source,
+        "transcript": transcript,
+        "author": author,
+    }
+    if cached:
+        payload["cached"] = True
+    logger.info(
+        "run_transcript_pipeline.success",
+        task_id=task_id,
+        video_url=video_url,
+        source=source,
+        author=author,
+        cached=cached,
+    )
+    return payload
+
+
+def _failure(task_id: str, video_url: str, author: str, error: Exception) -> dict:
+    """Build the failed payload."""
+    logger.error(
+        "run_transcript_pipeline.failed",
+        task_id=task_id,
+        video_url=video_url,
+        author=author,
+        error=str(error),
+    )
+    return {
+        "task_id": task_id,
+        "status": "failed",
+        "error": str(error),
+        "author": author,
+    }
+
+
+def _rejected(task_id: str, video_url: str, author: str, error: VideoRejectedError) -> dict:
+    """Build the failed payload of a video outside the request's duration policy."""
+    return {**_failure(task_id, video_url, author, error), "rejected": error.reason}
+
+
+def _stopped(task_id: str, author: str, stop: JobStopped) -> dict:
+    """Build the cancelled or timeout payload."""
+    logger.warning(
+        "run_transcript_pipeline.stopped", task_id=task_id, status=stop.status, reason=str(stop)
+    )
+    return {"task_id": task_id, "status": stop.status, "error": str(stop), "author": author}
+
+
+def _budget(options: dict) -> float | None:
+    """Seconds the job may run: the request's timeout_seconds, capped by JOB_TIMEOUT_SECONDS."""
+    budgets = [b for b in (options.get("timeout_seconds"), settings.JOB_TIMEOUT_SECONDS) if b]
+    return min(budgets) if budgets else None
+
+
+# acks_late + reject_on_worker_lost: if the worker dies mid-job the task is redelivered and
+# reclaims its in-flight lock, so coalesced subscribers are still served.
+@celery_app.task(acks_late=True, reject_on_worker_lost=True)
 def run_transcript_pipeline(
-    task_id: str, video_url: str, webhook_url: str, author: str = "unknown"
+    task_id: str,
+    video_url: str,
+    webhook_url: str,
+    author: str = "unknown",
+    parent_task_id: str | None = None,
+    options: dict | None = None,
 ) -> None:
-    """Run transcript pipeline for video_url and POST result to webhook_url."""
+    """Subtitle stage: deliver cached or subtitle results, else escalate to the Whisper queue."""
     with tracer.start_as_current_span("run_transcript_pipeline") as span:
         span.set_attribute("task.id", task_id)
         span.set_attribute("video.url", video_url)
@@ -29,35 +305,264 @@ def run_transcript_pipeline(
             webhook_url=webhook_url,
             author=author,
         )
+        options = options or {}
+        cache_key = transcript_cache_key(video_url, options.get("quality"), options.get("whisper"))
+        cached = get_cached_transcript(cache_key) if cache_key else None
+        span.set_attribute("cache.hit", cached is not None)
+        if (
+            cached is None
+            and cache_key
+            and not claim(cache_key, task_id, webhook_url, author, parent_task_id, options)
+        ):
+            # Another job is already producing this transcript and will deliver ours too.
+            logger.info("run_transcript_pipeline.coalesced", task_id=task_id, video_url=video_url)
+            return
+        video = None
         try:
-            source, transcript = get_transcript(video_url)
-            payload = {
-                "task_id": task_id,
-                "status": "success",
-                "source": source,
-                "transcript": transcript,
-                "author": author,
-            }
+            if cached is not None:
+                video = cached.get("video")
+                if video:
+                    check_video_policy(video, options)
+                payload = _success(
+                    task_id,
+                    video_url,
+                    author,
+                    cache_key,
+                    cached["source"],
+                    cached["transcript"],
+                    cached=True,
+                )
+            else:
+                set_status(task_id, PROBING)
+                with job_scope(task_id, _budget(options)), keep_alive(cache_key, task_id):
+                    info, subtitles = find_subtitles(video_url, options)
+                    left = remaining()
+                video = policy_info(info)
+                if subtitles is None:
+                    # Nothing renews the lease while the job waits in the whisper queue.
+                    renew(cache_key, task_id, settings.CELERY_VISIBILITY_TIMEOUT_SECONDS)
+                    set_status(task_id, QUEUED)
+                    if left is not None:
+                        # The whisper stage gets what is left of the job's time budget.
+                        options = {**options, "timeout_seconds": max(left, 1.0)}
+                    # The job keeps the lane it was scheduled in.
+                    run_whisper_transcription.apply_async(
+                        (task_id, video_url, webhook_url, author, prune_info(info)),
+                        {"parent_task_id": parent_task_id, "options": options},
+                        priority=lane_priority(options.get("priority")),
+                    )
+                    logger.info(
+                        "run_transcript_pipeline.escalated_to_whisper",
+                        task_id=task_id,
+                        video_url=video_url,
+                    )
+                    return
+                source, transcript = subtitles
+                payload = _success(
+                    task_id, video_url, author, cache_key, source, transcript, video=video
+                )
+        except JobStopped as e:
+            payload = _stopped(task_id, author, e)
+            video = None
+        except VideoRejectedError as e:
+            payload = _rejected(task_id, video_url, author, e)
+            video = e.video
+        except Exception as e:  # noqa: BLE001
+            payload = _failure(task_id, video_url, author, e)
+            video = None
+        _finish(
+            task_id,
+            video_url,
+            webhook_url,
+            author,
+            # A cache hit never claimed the key: its subscribers belong to another owner.
+            cache_key if cached is None else None,
+            payload,
+            parent_task_id,
+            options,
+            video=video,
+        )
+
+
+@celery_app.task(acks_late=True, reject_on_worker_lost=True)
+def run_whisper_transcription(
+    task_id: str,
+    video_url: str,
+    webhook_url: str,
+    author: str = "unknown",
+    info: dict | None = None,
+    parent_task_id: str | None = None,
+    options: dict | None = None,
+) -> None:
+    """Whisper stage: transcribe a video that has no subtitles and deliver the result."""
+    with tracer.start_as_current_span("run_whisper_transcription") as span:
+        span.set_attribute("task.id", task_id)
+        span.set_attribute("video.url", video_url)
+        span.set_attribute("author", author)
+        logger.info(
+            "run_whisper_transcription.start",
+            task_id=task_id,
+            video_url=video_url,
+            author=author,
+        )
+        options = options or {}
+        quality = options.get("quality")
+        cache_key = transcript_cache_key(video_url, quality, options.get("whisper"))
+        # Coalesced subscribers only get the final result.
+        partials = _PartialResults(task_id, webhook_url, author, parent_task_id, options)
+        video = None
+        try:
+            tier = select_tier(quality, (info or {}).get("duration"))
+            WHISPER_JOBS.labels(tier=tier or "default").inc()
+            span.set_attribute("whisper.tier", tier or "default")
+            with job_scope(task_id, _budget(options)), keep_alive(cache_key, task_id):
+                transcript = transcribe_video(
+                    video_url,
+                    info,
+                    on_partial=partials,
+                    model=resolve_tier(tier),
+                    decode=options.get("whisper"),
+                    on_progress=lambda stage, fraction: set_status(task_id, stage, fraction),
+                )
+            video = policy_info(info) if info else None
+            payload = _success(
+                task_id, video_url, author, cache_key, "whisper", transcript, video=video
+            )
+            if quality:
+                payload["quality"] = tier
+        except JobStopped as e:
+            payload = _stopped(task_id, author, e)
+            video = None
+        except Exception as e:  # noqa: BLE001
+            payload = _failure(task_id, video_url, author, e)
+            video = None
+        _finish(
+            task_id,
+            video_url,
+            webhook_url,
+            author,
+            cache_key,
+            payload,
+            parent_task_id,
+            options,
+            seq=partials.seq + 1 if options.get("progressive") else None,
+            video=video,
+        )
+
+
+@celery_app.task(acks_late=True, reject_on_worker_lost=True)
+def expand_collection(
+    task_id: str,
+    collection_url: str,
+    webhook_url: str,
+    author: str = "unknown",
+    options: dict | None = None,
+) -> None:
+    """Enqueue one pipeline job per video of a playlist or channel as the listing streams in.
+
+    Every video gets its own webhook (with parent_task_id = task_id); once all of them have
+    finished, one aggregate webhook with the counts is sent for task_id. Each video passes
+    admission control like a single submission; once one is refused the expansion pauses
+    and is re-enqueued after the Retry-After, skipping the videos already enqueued.
+    """
+    with tracer.start_as_current_span("expand_collection") as span:
+        span.set_attribute("task.id", task_id)
+        span.set_attribute("collection.url", collection_url)
+        span.set_attribute("author", author)
+        logger.info(
+            "expand_collection.start", task_id=task_id, collection_url=collection_url, author=author
+        )
+        options = options or {}
+        start_expansion(task_id, webhook_url, author)
+        set_status(task_id, PROBING)
+        status = "completed"
+        paused: Rejected | None = None
+        try:
+            for video_id in iter_collection_videos(collection_url):
+                # Skips repeats across channel tabs and videos already enqueued before a
+                # redelivery of this task.
+                if is_cancelled(task_id):
+                    # Videos already enqueued still run; no more are added.
+                    status = "cancelled"
+                    break
+                if not mark_seen(task_id, video_id):
+                    continue
+                try:
+                    check_backlog(options.get("priority"))
+                    check_rate(author)
+                except Rejected as e:
+                    forget_seen(task_id, video_id)
+                    paused = e
+                    break
+                lane = fair_lane(author, options.get("priority"))
+                child_id = str(uuid4())
+                mark_queued([child_id])
+                run_transcript_pipeline.apply_async(
+                    (
+                        child_id,
+                        f"https://www.youtube.com/watch?v={video_id}",
+                        webhook_url,
+                        author,
+                    ),
+                    {"parent_task_id": task_id, "options": {**options, "priority": lane}},
+                    priority=lane_priority(lane),
+                )
+        except Exception as e:  # noqa: BLE001
+            if not seen_count(task_id):
+                payload = _failure(task_id, collection_url, author, e)
+                store_result(payload)
+                deliver_webhook.delay(webhook_url, payload)
+                return
+            status = "partial"
+            logger.warning("expand_collection.listing_interrupted", task_id=task_id, error=str(e))
+        if paused is not None:
+            expand_collection.apply_async(
+                (task_id, collection_url, webhook_url, author),
+                {"options": options},
+                countdown=paused.retry_after,
+                priority=lane_priority(options.get("priority")),
+            )
             logger.info(
-                "run_transcript_pipeline.success",
+                "expand_collection.paused",
                 task_id=task_id,
-                video_url=video_url,
-                source=source,
-                author=author,
+                reason=paused.detail,
+                retry_after=paused.retry_after,
             )
-        except Exception as e:  # noqa: BLE001
-            logger.error(
-                "run_transcript_pipeline.failed",
+            return
+        total = seen_count(task_id)
+        span.set_attribute("collection.videos", total)
+        aggregate = finish_listing(task_id, total, status)
+        if aggregate is not None:
+            deliver_webhook.delay(aggregate["webhook_url"], aggregate["payload"])
+            store_result(aggregate["payload"])
+
+
+@celery_app.task(bind=True, acks_late=True, max_retries=settings.WEBHOOK_MAX_RETRIES)
+def deliver_webhook(
+    self, webhook_url: str, payload: dict, content_encoding: str | None = None
+) -> None:
+    """POST payload to webhook_url; retry with exponential backoff, then dead-letter."""
+    task_id = payload.get("task_id")
+    try:
+        post_webhook(webhook_url, payload, content_encoding)
+    except httpx.HTTPError as e:
+        retries = self.request.retries
+        if is_retryable(e) and retries < self.max_retries:
+            logger.warning(
+                "deliver_webhook.retry",
                 task_id=task_id,
-                video_url=video_url,
-                author=author,
+                webhook_url=webhook_url,
+                retries=retries,
                 error=str(e),
             )
-            payload = {
-                "task_id": task_id,
-                "status": "failed",
-                "error": str(e),
-                "author": author,
-            }
-        with httpx.Client() as client:
-            client.post(webhook_url, json=payload)
+            raise self.retry(exc=e, countdown=retry_delay(retries))
+        logger.error(
+            "deliver_webhook.dead_lettered",
+            task_id=task_id,
+            webhook_url=webhook_url,
+            retries=retries,
+            error=str(e),
+        )
+        dead_letter(webhook_url, payload, str(e), content_encoding)
+        return
+    logger.info("deliver_webhook.delivered", task_id=task_id, webhook_url=webhook_url)
@@ -0,0 +1,69 @@
+"""Duration and live-stream policy for the videos a request may have transcribed.
+
+The policy is checked once against the probed info dict, before anything is downloaded;
+MIN_VIDEO_SECONDS, MAX_VIDEO_SECONDS and LIVE_VIDEO_POLICY set it, and a request may
+override it. The few info fields it reads (policy_info) travel with the result to the
+coalesced requests and into the transcript cache, so each recipient of a shared result is
+checked against its own policy.
+"""
+
+import structlog
+
+from app.config import settings
+from app.metrics import VIDEO_REJECTIONS
+
+logger = structlog.get_logger()
+
+# Info dict fields the policy reads.
+_POLICY_FIELDS = ("id", "duration", "is_live", "was_live", "live_status")
+
+
+class VideoRejectedError(Exception):
+    """Raised when the probed video is outside the duration or live-stream policy."""
+
+    def __init__(self, reason: str, message: str, video: dict | None = None) -> None:
+        super().__init__(message)
+        self.reason = reason
+        # policy_info() of the video, to check other requests for it against.
+        self.video = video or {}
+
+
+def policy_info(info: dict) -> dict:
+    """The part of a probed info dict that check_video_policy reads."""
+    return {k: info[k] for k in _POLICY_FIELDS if info.get(k) is not None}
+
+
+def check_video_policy(info: dict, policy: dict | None = None, record: bool = True) -> None:
+    """Raise VideoRejectedError if the probed video may not be transcribed.
+
+    policy holds the request's min_duration_seconds, max_duration_seconds and live_policy;
+    unset ones fall back to MIN_VIDEO_SECONDS, MAX_VIDEO_SECONDS and LIVE_VIDEO_POLICY. A
+    video whose duration is unknown passes the duration limits. record=False skips the
+    rejection metric, for the recipients of a shared result (see tasks._finish).
+    """
+    policy = policy or {}
+    live_status = info.get("live_status")
+    duration = info.get("duration")
+    min_seconds = policy.get("min_duration_seconds")
+    if min_seconds is None:
+        min_seconds = settings.MIN_VIDEO_SECONDS
+    limits = [m for m in (policy.get("max_duration_seconds"), settings.MAX_VIDEO_SECONDS) if m]
+    max_seconds = min(limits) if limits else 0
+    if info.get("is_live") or live_status in ("is_live", "is_upcoming"):
+        reason, message = "live", "Live and upcoming streams cannot be transcribed"
+    elif (policy.get("live_policy") or settings.LIVE_VIDEO_POLICY) == "reject" and (
+        info.get("was_live") or live_status in ("was_live", "post_live")
+    ):
+        reason, message = "live", "Recordings of live streams are not accepted"
+    elif duration is not None and min_seconds and duration < min_seconds:
+        reason = "too_short"
+        message = f"Video is {duration:g} s long, shorter than the minimum of {min_seconds:g} s"
+    elif duration is not None and max_seconds and duration > max_seconds:
+        reason = "too_long"
+        message = f"Video is {duration:g} s long, longer than the maximum of {max_seconds:g} s"
+    else:
+        return
+    if record:
+        VIDEO_REJECTIONS.labels(reason=reason).inc()
+    logger.info("video_policy.rejected", video_id=info.get("id"), reason=reason)
+    raise VideoRejectedError(reason, message, policy_info(info))
@@ -0,0 +1,169 @@
+"""Webhook delivery to caller-supplied URLs.
+
+Delivery runs in the deliver_webhook task on its own lightweight queue, so the worker that
+produced a transcript is free as soon as the payload is enqueued. Each process keeps one
+pooled httpx.Client with bounded timeouts. Failed deliveries are retried with exponential
+backoff; once retries are exhausted (or the receiver rejects the payload with a 4xx) the
+delivery is pushed to a Redis dead-letter list that can be replayed later.
+
+Receivers may opt in to a gzip or zstd request body (Content-Encoding). Transcripts larger
+than WEBHOOK_INLINE_MAX_BYTES are not sent inline: the webhook carries a transcript_url
+on the API from which the receiver fetches the content, in ranges if it likes.
+"""
+
+import gzip
+import json
+import threading
+import time
+from typing import Literal
+
+import httpx
+import redis
+import structlog
+import zstandard
+
+from app.blobs import store_blob
+from app.config import settings
+from app.metrics import observe_stage
+from app.redis_client import get_redis
+
+logger = structlog.get_logger()
+
+DEAD_LETTER_KEY = "aqua:webhooks:dead"
+# 4xx responses worth retrying; any other 4xx means the receiver rejected the payload.
+_RETRYABLE_CLIENT_ERRORS = frozenset({408, 425, 429})
+_CONTENT_TYPES = {
+    "vtt": "text/vtt; charset=utf-8",
+    "srt": "application/x-subrip; charset=utf-8",
+    "text": "text/plain; charset=utf-8",
+    "json": "application/json",
+}
+
+ContentEncoding = Literal["gzip", "zstd"]
+
+_client: httpx.Client | None = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> httpx.Client:
+    """Return the process-wide pooled client, created on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = httpx.Client(
+                timeout=httpx.Timeout(settings.WEBHOOK_TIMEOUT_SECONDS),
+                limits=httpx.Limits(
+                    max_connections=settings.WEBHOOK_POOL_SIZE,
+                    max_keepalive_connections=settings.WEBHOOK_POOL_SIZE,
+                ),
+            )
+        return _client
+
+
+def encode_body(body: bytes, content_encoding: ContentEncoding | None) -> bytes:
+    """Compress a request body for the given Content-Encoding (None leaves it as is)."""
+    if content_encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    if content_encoding == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    return body
+
+
+def post_webhook(
+    webhook_url: str, payload: dict, content_encoding: ContentEncoding | None = None
+) -> None:
+    """POST payload as JSON to webhook_url; raises httpx.HTTPError on failure or non-2xx."""
+    headers = {"Content-Type": "application/json"}
+    if content_encoding:
+        headers["Content-Encoding"] = content_encoding
+    body = encode_body(
+        json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode(), content_encoding
+    )
+    with observe_stage("webhook") as span:
+        span.set_attribute("http.request.body.size", len(body))
+        response = get_client().post(webhook_url, content=body, headers=headers)
+        span.set_attribute("http.status_code", response.status_code)
+    response.raise_for_status()
+
+
+def offload_transcript(payload: dict) -> dict:
+    """Swap a transcript over WEBHOOK_INLINE_MAX_BYTES for a URL to fetch it from the API.
+
+    Requires PUBLIC_BASE_URL; without it, or if the blob cannot be stored, the transcript
+    stays inline.
+    """
+    transcript = payload.get("transcript")
+    if transcript is None or settings.WEBHOOK_INLINE_MAX_BYTES <= 0 or not settings.PUBLIC_BASE_URL:
+        return payload
+    content = (
+        transcript.encode() if isinstance(transcript, str) else json.dumps(transcript).encode()
+    )
+    if len(content) <= settings.WEBHOOK_INLINE_MAX_BYTES:
+        return payload
+    task_id = payload["task_id"]
+    content_type = _CONTENT_TYPES[payload.get("format", "vtt")]
+    if not store_blob(task_id, content, content_type):
+        return payload
+    offloaded = {k: v for k, v in payload.items() if k != "transcript"}
+    offloaded["transcript_url"] = (
+        f"{settings.PUBLIC_BASE_URL.rstrip('/')}/transcript/{task_id}/content"
+    )
+    offloaded["transcript_bytes"] = len(content)
+    offloaded["transcript_content_type"] = content_type
+    logger.info("webhook.transcript_offloaded", task_id=task_id, transcript_bytes=len(content))
+    return offloaded
+
+
+def is_retryable(error: httpx.HTTPError) -> bool:
+    """Transport errors, 5xx and throttling responses are retried; other 4xx are not."""
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status >= 500 or status in _RETRYABLE_CLIENT_ERRORS
+    return True
+
+
+def retry_delay(retries: int) -> float:
+    """Exponential backoff for the given number of retries already made."""
+    return min(
+        settings.WEBHOOK_RETRY_BACKOFF_SECONDS * (2**retries),
+        settings.WEBHOOK_RETRY_BACKOFF_MAX_SECONDS,
+    )
+
+
+def dead_letter(
+    webhook_url: str, payload: dict, error: str, content_encoding: str | None = None
+) -> None:
+    """Keep an undeliverable payload in the dead-letter list (newest first, bounded)."""
+    entry = json.dumps(
+        {
+            "webhook_url": webhook_url,
+            "payload": payload,
+            "error": error,
+            "failed_at": time.time(),
+            "content_encoding": content_encoding,
+        }
+    )
+    try:
+        with get_redis().pipeline() as pipe:
+            pipe.lpush(DEAD_LETTER_KEY, entry)
+            pipe.ltrim(DEAD_LETTER_KEY, 0, settings.WEBHOOK_DEAD_LETTER_MAX - 1)
+            pipe.execute()
+    except redis.RedisError as e:
+        logger.error(
+            "webhook.dead_letter_failed",
+            webhook_url=webhook_url,
+            task_id=payload.get("task_id"),
+            error=str(e),
+        )
+
+
+def pop_dead_letters(limit: int) -> list[dict]:
+    """Remove and return up to limit dead-lettered deliveries, oldest first."""
+    client = get_redis()
+    entries = []
+    for _ in range(limit):
+        raw = client.rpop(DEAD_LETTER_KEY)
+        if raw is None:
+            break
+        entries.append(json.loads(raw))
+    return entries
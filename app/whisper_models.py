@@ -0,0 +1,146 @@
+"""Process-resident faster-whisper model registry.
+
+Each (model, compute_type, device) combination is loaded at most once per worker
+process and reused by every Whisper fallback that runs in that process. At most
+WHISPER_MAX_LOADED_MODELS stay loaded; the least recently used is dropped to make room
+for another quality tier's model. faster_whisper is
+imported on first load, so processes that never transcribe (the API, subtitle and webhook
+workers) do not pay for CTranslate2 and its dependencies.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import structlog
+
+from app.config import settings
+from app.metrics import (
+    MODEL_CACHE_LOOKUPS,
+    MODEL_LOAD_SECONDS,
+    MODEL_LOAD_SECONDS_SAVED,
+    observe_stage,
+)
+
+if TYPE_CHECKING:
+    from faster_whisper import BatchedInferencePipeline, WhisperModel
+
+logger = structlog.get_logger()
+
+ModelKey = tuple[str, str, str]
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+_models: OrderedDict[ModelKey, "WhisperModel"] = OrderedDict()
+_batched: dict[ModelKey, "BatchedInferencePipeline"] = {}
+_load_seconds: dict[ModelKey, float] = {}
+_lock = threading.Lock()
+
+
+def model_key(
+    model: str | None = None,
+    compute_type: str | None = None,
+    device: str | None = None,
+) -> ModelKey:
+    """Return the registry key, filling unset parts from settings."""
+    return (
+        (model or settings.WHISPER_MODEL).strip(),
+        compute_type or settings.WHISPER_COMPUTE_TYPE,
+        device or settings.WHISPER_DEVICE,
+    )
+
+
+def _load_model(key: ModelKey) -> "WhisperModel":
+    """Construct a WhisperModel; a local dir containing model.bin skips the HF download."""
+    from faster_whisper import WhisperModel
+
+    model_path_or_name, compute_type, device = key
+    resolved_path = (
+        (_PROJECT_ROOT / model_path_or_name).resolve()
+        if not Path(model_path_or_name).is_absolute()
+        else Path(model_path_or_name)
+    )
+    model_kwargs: dict = {"device": device, "compute_type": compute_type}
+    if settings.WHISPER_CPU_THREADS > 0:
+        model_kwargs["cpu_threads"] = settings.WHISPER_CPU_THREADS
+    if settings.WHISPER_NUM_WORKERS > 1:
+        model_kwargs["num_workers"] = settings.WHISPER_NUM_WORKERS
+    if resolved_path.is_dir() and (resolved_path / "model.bin").exists():
+        model_kwargs["local_files_only"] = True
+        return WhisperModel(str(resolved_path), **model_kwargs)
+    if settings.WHISPER_DOWNLOAD_ROOT:
+        model_kwargs["download_root"] = settings.WHISPER_DOWNLOAD_ROOT
+    return WhisperModel(model_path_or_name, **model_kwargs)
+
+
+def _evict_for_load() -> None:
+    """Drop least recently used models until one more fits (caller holds _lock)."""
+    limit = settings.WHISPER_MAX_LOADED_MODELS
+    while limit > 0 and len(_models) >= limit:
+        key, _ = _models.popitem(last=False)
+        _batched.pop(key, None)
+        _load_seconds.pop(key, None)
+        logger.info("whisper_models.evicted", model=key[0], compute_type=key[1], device=key[2])
+
+
+def get_model(
+    model: str | None = None,
+    compute_type: str | None = None,
+    device: str | None = None,
+) -> "WhisperModel":
+    """Return the loaded model for this combination, loading it on first use."""
+    key = model_key(model, compute_type, device)
+    labels = {"model": key[0], "compute_type": key[1], "device": key[2]}
+    # Loading under the lock keeps concurrent threads from loading the same model twice.
+    with _lock:
+        cached = _models.get(key)
+        if cached is not None:
+            _models.move_to_end(key)
+            MODEL_CACHE_LOOKUPS.labels(result="hit").inc()
+            MODEL_LOAD_SECONDS_SAVED.labels(**labels).inc(_load_seconds[key])
+            return cached
+        MODEL_CACHE_LOOKUPS.labels(result="miss").inc()
+        _evict_for_load()
+        started = time.perf_counter()
+        with observe_stage("model_load") as span:
+            span.set_attribute("whisper.model", key[0])
+            loaded = _load_model(key)
+        elapsed = time.perf_counter() - started
+        MODEL_LOAD_SECONDS.labels(**labels).observe(elapsed)
+        logger.info("whisper_models.loaded", load_seconds=round(elapsed, 3), **labels)
+        _models[key] = loaded
+        _load_seconds[key] = elapsed
+        return loaded
+
+
+def get_batched_pipeline(
+    model: str | None = None,
+    compute_type: str | None = None,
+    device: str | None = None,
+) -> "BatchedInferencePipeline":
+    """Return a batched (VAD-chunked, parallel) pipeline wrapping the registry's model."""
+    from faster_whisper import BatchedInferencePipeline
+
+    key = model_key(model, compute_type, device)
+    whisper_model = get_model(*key)
+    with _lock:
+        pipeline = _batched.get(key)
+        if pipeline is None:
+            pipeline = BatchedInferencePipeline(whisper_model)
+            _batched[key] = pipeline
+        return pipeline
+
+
+def warm_models() -> None:
+    """Load the default model so the first Whisper job does not pay the load time."""
+    get_model()
+
+
+def clear_models() -> None:
+    """Drop every loaded model (tests and manual memory release)."""
+    with _lock:
+        _models.clear()
+        _load_seconds.clear()
+        _batched.clear()
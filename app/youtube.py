@@ -1,12 +1,18 @@
-"""YouTube URL validation."""
+"""YouTube URL validation and classification (single video vs playlist/channel)."""
 
 import re
+from urllib.parse import parse_qs, urlparse
 
 # Allow youtube.com (with optional www.) and youtu.be
 _YOUTUBE_HOST_PATTERN = re.compile(
     r"^https?://(www\.)?(youtube\.com|youtu\.be)/",
     re.IGNORECASE,
 )
+_VIDEO_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{11}$")
+# youtube.com path prefixes that carry the video ID as the next path segment.
+_VIDEO_PATH_PREFIXES = frozenset({"shorts", "embed", "live", "v"})
+# youtube.com path prefixes of channel pages (besides /@handle).
+_CHANNEL_PATH_PREFIXES = frozenset({"channel", "c", "user"})
 
 
 def is_youtube_url(url: str) -> bool:
@@ -14,3 +20,43 @@ def is_youtube_url(url: str) -> bool:
     if not url or not url.strip():
         return False
     return bool(_YOUTUBE_HOST_PATTERN.match(url.strip()))
+
+
+def extract_video_id(url: str) -> str | None:
+    """Return the canonical 11-character video ID for a single-video URL, else None.
+
+    Playlist and channel URLs (no single video) return None.
+    """
+    if not is_youtube_url(url):
+        return None
+    parsed = urlparse(url.strip())
+    host = parsed.netloc.lower().removeprefix("www.")
+    parts = [p for p in parsed.path.split("/") if p]
+    candidate: str | None = None
+    if host == "youtu.be":
+        candidate = parts[0] if parts else None
+    elif parts and parts[0] == "watch":
+        candidate = parse_qs(parsed.query).get("v", [None])[0]
+    elif len(parts) >= 2 and parts[0] in _VIDEO_PATH_PREFIXES:
+        candidate = parts[1]
+    if candidate and _VIDEO_ID_PATTERN.match(candidate):
+        return candidate
+    return None
+
+
+def is_collection_url(url: str) -> bool:
+    """Return True for a playlist or channel URL that does not name a single video.
+
+    A watch URL with both v= and list= is a single video (the playlist is ignored).
+    """
+    if not is_youtube_url(url) or extract_video_id(url) is not None:
+        return False
+    parsed = urlparse(url.strip())
+    if parsed.netloc.lower().removeprefix("www.") != "youtube.com":
+        return False
+    parts = [p for p in parsed.path.split("/") if p]
+    if parts == ["playlist"]:
+        return bool(parse_qs(parsed.query).get("list"))
+    if parts and parts[0].startswith("@"):
+        return True
+    return len(parts) >= 2 and parts[0] in _CHANNEL_PATH_PREFIXES
@@ -0,0 +1,72 @@
+"""Benchmark caption parsing and rendering on a large synthetic auto-caption track.
+
+Builds a YouTube-style rolling VTT (repeated lines, inline word timings, 10 ms repeat
+cues) of the given length, then times parse_captions and each output format and prints
+the output size relative to the raw VTT.
+
+    uv run python benchmarks/bench_captions.py --hours 3 --repeat 5
+"""
+
+import argparse
+import json
+import time
+
+from app.captions import format_timestamp, parse_captions, render_transcript
+
+
+def rolling_vtt(hours: float) -> str:
+    """A rolling auto-caption track with one new four-word line every two seconds."""
+    blocks = ["WEBVTT\nKind: captions\nLanguage: en"]
+    previous = ""
+    for index in range(int(hours * 3600 / 2)):
+        start = index * 2.0
+        words = [f"word{index}_{n}" for n in range(4)]
+        timed = words[0] + "".join(
+            f"<{format_timestamp(start + 0.4 * n)}><c> {word}</c>" for n, word in enumerate(words)
+        )
+        line = " ".join(words)
+        blocks.append(
+            f"{format_timestamp(start)} --> {format_timestamp(start + 1.99)} "
+            f"align:start position:0%\n{previous or ' '}\n{timed}"
+        )
+        blocks.append(
+            f"{format_timestamp(start + 1.99)} --> {format_timestamp(start + 2.0)} "
+            f"align:start position:0%\n{line}\n "
+        )
+        previous = line
+    return "\n\n".join(blocks) + "\n"
+
+
+def _best_of(repeat: int, fn) -> tuple[float, object]:
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=float, default=3.0, help="caption track length")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement (best kept)")
+    args = parser.parse_args()
+
+    raw = rolling_vtt(args.hours)
+    raw_bytes = len(raw.encode())
+    seconds, cues = _best_of(args.repeat, lambda: parse_captions(raw))
+    print(f"input: {raw_bytes / 1e6:.1f} MB raw VTT, {len(cues)} cues after dedupe")
+    print(f"parse: {seconds * 1000:.1f} ms ({raw_bytes / seconds / 1e6:.0f} MB/s)")
+    for output_format in ("text", "vtt", "srt", "json"):
+        seconds, rendered = _best_of(args.repeat, lambda f=output_format: render_transcript(raw, f))
+        body = rendered if isinstance(rendered, str) else json.dumps(rendered)
+        size = len(body.encode())
+        print(
+            f"{output_format:>5}: {seconds * 1000:7.1f} ms parse+render, "
+            f"{size / 1e6:6.2f} MB ({size / raw_bytes:.0%} of raw)"
+        )
+
+
+if __name__ == "__main__":
+    main()
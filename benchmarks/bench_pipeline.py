@@ -0,0 +1,252 @@
+"""Offline end-to-end benchmark of the transcript pipeline, emitting JSON results.
+
+Runs run_transcript_pipeline in-process (Celery eager mode, --concurrency threads) on a
+mix of fake videos: yt-dlp and, if missing, ffmpeg are replaced by benchmarks/fake_tools.py,
+webhooks go to a local HTTP sink and Redis is fakeredis unless --redis-url is given.
+Whisper uses a stand-in model that decodes at --fake-rtf (with a --fake-load-seconds load)
+unless --whisper real, which loads the configured faster-whisper model.
+
+Reports jobs/sec, p50/p95/p99 latency (submit to final webhook) per source, model load
+time, mean time per pipeline stage and the peak RSS of this process and its children.
+
+    uv run python benchmarks/bench_pipeline.py --jobs 200 --mix manual=5,auto=4,whisper=1 \
+        --output results.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import patch
+from uuid import uuid4
+
+_FAKE_TOOLS = Path(__file__).resolve().with_name("fake_tools.py")
+
+
+class WebhookSink:
+    """Local HTTP server recording the arrival time of each final webhook by task_id."""
+
+    def __init__(self) -> None:
+        self.arrivals: dict[str, tuple[float, dict]] = {}
+        self.done = threading.Condition()
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if payload.get("status") != "partial":
+                    with sink.done:
+                        sink.arrivals[payload["task_id"]] = (time.perf_counter(), payload)
+                        sink.done.notify_all()
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, *_args: object) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/hook"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def wait_for(self, count: int, timeout: float) -> None:
+        with self.done:
+            self.done.wait_for(lambda: len(self.arrivals) >= count, timeout)
+
+
+class FakeWhisperModel:
+    """Stand-in for WhisperModel: emits a segment per 5 s of audio at a fixed real-time factor."""
+
+    def __init__(self, rtf: float) -> None:
+        self.rtf = rtf
+
+    def transcribe(self, audio: object, **_options: object) -> tuple[object, None]:
+        duration = len(audio) / 16000 if hasattr(audio, "__len__") else 60.0
+
+        def segments():
+            for start in range(0, int(duration), 5):
+                time.sleep(5 * self.rtf)
+                yield type("Segment", (), {"start": start, "end": start + 5, "text": " words"})()
+
+        return segments(), None
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    index = max(round(pct / 100 * len(values) + 0.5) - 1, 0)
+    return values[min(index, len(values) - 1)]
+
+
+def _install_fake_tools(bin_dir: Path) -> list[str]:
+    """Put yt-dlp (and ffmpeg if absent) shims first on PATH; returns the faked tools."""
+    faked = ["yt-dlp"] + ([] if shutil.which("ffmpeg") else ["ffmpeg"])
+    for tool in faked:
+        shim = bin_dir / tool
+        shim.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{_FAKE_TOOLS}" {tool} "$@"\n')
+        shim.chmod(0o755)
+    os.environ["PATH"] = f"{bin_dir}{os.pathsep}{os.environ['PATH']}"
+    return faked
+
+
+def _histogram_sums(histogram) -> dict[str, tuple[float, float]]:
+    """{label value: (sum, count)} of a one-label histogram."""
+    totals: dict[str, list[float]] = {}
+    for metric in histogram.collect():
+        for sample in metric.samples:
+            label = ",".join(sample.labels.values())
+            if sample.name.endswith("_sum"):
+                totals.setdefault(label, [0.0, 0.0])[0] += sample.value
+            elif sample.name.endswith("_count"):
+                totals.setdefault(label, [0.0, 0.0])[1] += sample.value
+    return {label: (total, count) for label, (total, count) in totals.items() if count}
+
+
+def _parse_mix(value: str) -> dict[str, float]:
+    mix = {kind: float(weight) for kind, weight in (p.split("=") for p in value.split(","))}
+    unknown = set(mix) - {"manual", "auto", "whisper"}
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown kinds {sorted(unknown)}")
+    return mix
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8, help="jobs running at once")
+    parser.add_argument("--mix", type=_parse_mix, default="manual=5,auto=4,whisper=1")
+    parser.add_argument("--duration", type=float, default=600, help="video length, seconds")
+    parser.add_argument("--audio-file", help="serve this file as every whisper video's audio")
+    parser.add_argument("--whisper", choices=["fake", "real"], default="fake")
+    parser.add_argument("--fake-rtf", type=float, default=0.01)
+    parser.add_argument("--fake-load-seconds", type=float, default=1.0)
+    parser.add_argument("--redis-url", help="use this Redis (flushes nothing) instead of fakeredis")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--verbose", action="store_true", help="keep the app's INFO logs")
+    args = parser.parse_args()
+
+    work_dir = Path(tempfile.mkdtemp(prefix="aqua-bench-"))
+    bin_dir = work_dir / "bin"
+    bin_dir.mkdir()
+    faked_tools = _install_fake_tools(bin_dir)
+
+    from app import redis_client
+    from app.celery_app import celery_app
+    from app.config import settings
+    from app.metrics import MODEL_LOAD_SECONDS, STAGE_SECONDS
+    from app.tasks import run_transcript_pipeline
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+    celery_app.conf.task_always_eager = True
+    settings.WHISPER_PRELOAD = False
+    if args.redis_url:
+        settings.REDIS_URL = args.redis_url
+        redis_client._client = None
+    else:
+        import fakeredis
+
+        redis_client._client = fakeredis.FakeRedis()
+
+    total_weight = sum(args.mix.values())
+    spec: dict[str, dict] = {}
+    jobs: list[tuple[str, str, str]] = []
+    run_tag = uuid4().hex[:4]
+    for kind, weight in args.mix.items():
+        for n in range(round(args.jobs * weight / total_weight)):
+            video_id = f"{kind[0]}{run_tag}{n:06d}"
+            spec[video_id] = {
+                "kind": kind,
+                "duration": args.duration,
+                "audio_file": args.audio_file,
+            }
+            jobs.append((str(uuid4()), f"https://www.youtube.com/watch?v={video_id}", kind))
+    spec_path = work_dir / "spec.json"
+    spec_path.write_text(json.dumps(spec))
+    os.environ["FAKE_TOOLS_SPEC"] = str(spec_path)
+
+    sink = WebhookSink()
+    patches = []
+    if args.whisper == "fake":
+
+        def load_fake(_key: object) -> FakeWhisperModel:
+            time.sleep(args.fake_load_seconds)
+            return FakeWhisperModel(args.fake_rtf)
+
+        patches = [
+            patch("app.whisper_models._load_model", load_fake),
+            patch("faster_whisper.BatchedInferencePipeline", lambda model: model),
+        ]
+    for p in patches:
+        p.start()
+
+    submitted: dict[str, float] = {}
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        for task_id, url, _kind in jobs:
+            submitted[task_id] = time.perf_counter()
+            pool.submit(run_transcript_pipeline.apply, args=[task_id, url, sink.url, "bench"])
+    sink.wait_for(len(jobs), args.timeout)
+    wall = time.perf_counter() - started
+    for p in patches:
+        p.stop()
+
+    latencies: dict[str, list[float]] = {}
+    for task_id, (arrived, payload) in sink.arrivals.items():
+        source = payload.get("source") if payload["status"] == "success" else "failed"
+        latencies.setdefault(source, []).append((arrived - submitted[task_id]) * 1000)
+    results = {
+        "config": {
+            "jobs": len(jobs),
+            "concurrency": args.concurrency,
+            "mix": args.mix,
+            "duration_seconds": args.duration,
+            "whisper": args.whisper,
+            "whisper_model": settings.WHISPER_MODEL if args.whisper == "real" else "fake",
+            "fake_tools": faked_tools,
+            "redis": "external" if args.redis_url else "fakeredis",
+        },
+        "wall_seconds": round(wall, 3),
+        "completed": len(sink.arrivals),
+        "jobs_per_second": round(len(sink.arrivals) / wall, 3),
+        "latency_ms": {
+            source: {
+                "count": len(values),
+                "p50": round(_percentile(sorted(values), 50), 1),
+                "p95": round(_percentile(sorted(values), 95), 1),
+                "p99": round(_percentile(sorted(values), 99), 1),
+            }
+            for source, values in sorted(latencies.items())
+        },
+        "model_load_seconds": {
+            label: round(total / count, 3)
+            for label, (total, count) in _histogram_sums(MODEL_LOAD_SECONDS).items()
+        },
+        "stage_mean_ms": {
+            stage: round(total / count * 1000, 2)
+            for stage, (total, count) in sorted(_histogram_sums(STAGE_SECONDS).items())
+        },
+        # ru_maxrss is in KiB on Linux.
+        "max_rss_mb": {
+            "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+        },
+    }
+    shutil.rmtree(work_dir, ignore_errors=True)
+    body = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(body + "\n")
+    else:
+        print(body)
+
+
+if __name__ == "__main__":
+    main()
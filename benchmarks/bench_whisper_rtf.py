@@ -0,0 +1,80 @@
+"""Benchmark Whisper real-time factor across decoding and threading configurations.
+
+Transcribes one local audio file under every combination of the given beam sizes, VAD
+on/off and CTranslate2 thread counts, and prints the real-time factor (transcription
+time / audio duration, lower is faster) of each. Decoding arguments are built the same
+way the worker builds them, so the other WHISPER_* settings apply as configured.
+
+    uv run python benchmarks/bench_whisper_rtf.py speech.wav \
+        --model base --compute-type int8 --beam-sizes 1,5 --cpu-threads 4,16
+"""
+
+import argparse
+import itertools
+import json
+import time
+
+from faster_whisper import WhisperModel, decode_audio
+
+from app.pipeline import _WHISPER_SAMPLE_RATE, _decode_options
+
+
+def _ints(value: str) -> list[int]:
+    return [int(v) for v in value.split(",")]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("audio", help="local audio file (any format ffmpeg reads)")
+    parser.add_argument("--model", default="base", help="model size name or local dir")
+    parser.add_argument("--compute-type", default="int8")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--beam-sizes", type=_ints, default=[1, 5], help="comma-separated")
+    parser.add_argument("--vad", default="off,on", help="comma-separated: off, on")
+    parser.add_argument("--cpu-threads", type=_ints, default=[0], help="0 = CTranslate2 default")
+    parser.add_argument("--language", default=None, help="skip language detection")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per configuration (best kept)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    audio = decode_audio(args.audio, sampling_rate=_WHISPER_SAMPLE_RATE)
+    duration = len(audio) / _WHISPER_SAMPLE_RATE
+    results = []
+    for cpu_threads in args.cpu_threads:
+        model = WhisperModel(
+            args.model, device=args.device, compute_type=args.compute_type, cpu_threads=cpu_threads
+        )
+        for beam_size, vad in itertools.product(args.beam_sizes, args.vad.split(",")):
+            overrides = {"beam_size": beam_size, "vad_filter": vad == "on"}
+            if args.language:
+                overrides["language"] = args.language
+            options = _decode_options(overrides, batched=False)
+            best = float("inf")
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                segments, _ = model.transcribe(audio, **options)
+                words = sum(len(seg.text.split()) for seg in segments)
+                best = min(best, time.perf_counter() - started)
+            result = {
+                "cpu_threads": cpu_threads,
+                "beam_size": beam_size,
+                "vad": vad,
+                "seconds": round(best, 3),
+                "rtf": round(best / duration, 4),
+                "words": words,
+            }
+            results.append(result)
+            if not args.json:
+                print(
+                    f"threads={cpu_threads:<3} beam={beam_size:<2} vad={vad:<3} "
+                    f"{best:8.2f} s  RTF {best / duration:.3f}  ({words} words)"
+                )
+        del model
+    if args.json:
+        print(json.dumps({"audio_seconds": round(duration, 2), "results": results}, indent=2))
+    else:
+        print(f"audio: {duration:.1f} s of {args.audio}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Offline stand-ins for yt-dlp and ffmpeg used by bench_pipeline.py.
+
+bench_pipeline.py puts shims named yt-dlp and ffmpeg on PATH that run this script with the
+tool name first. Videos come from the JSON file in FAKE_TOOLS_SPEC, mapping video ID to
+{"kind": "manual" | "auto" | "whisper", "duration": seconds}: manual and auto videos
+offer a generated VTT track of that kind, whisper videos offer none and serve a 16 kHz
+mono WAV of the given length (or the bytes of "audio_file" if set). The fake ffmpeg
+only converts such a WAV to the f32le PCM the pipeline reads.
+
+    fake_tools.py yt-dlp --dump-single-json https://www.youtube.com/watch?v=<id>
+"""
+
+import io
+import json
+import os
+import re
+import sys
+import time
+import wave
+from pathlib import Path
+
+_SAMPLE_RATE = 16000
+_ID_PATTERN = re.compile(r"(?:v=|youtu\.be/)([A-Za-z0-9_-]{11})")
+
+
+def _spec() -> dict:
+    return json.loads(Path(os.environ["FAKE_TOOLS_SPEC"]).read_text())
+
+
+def _arg(argv: list[str], flag: str) -> str | None:
+    return argv[argv.index(flag) + 1] if flag in argv else None
+
+
+def _timestamp(seconds: float) -> str:
+    h, rest = divmod(seconds, 3600)
+    m, s = divmod(rest, 60)
+    return f"{int(h):02d}:{int(m):02d}:{s:06.3f}"
+
+
+def _vtt(duration: float, rolling: bool) -> str:
+    """One four-word cue every two seconds; auto tracks repeat the previous line."""
+    blocks = ["WEBVTT"]
+    previous = ""
+    for index in range(int(duration / 2)):
+        line = " ".join(f"word{index}_{n}" for n in range(4))
+        text = f"{previous}\n{line}" if rolling and previous else line
+        blocks.append(f"{_timestamp(index * 2)} --> {_timestamp(index * 2 + 1.99)}\n{text}")
+        previous = line
+    return "\n\n".join(blocks) + "\n"
+
+
+def _wav(duration: float) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(_SAMPLE_RATE)
+        out.writeframes(b"\x00\x00" * int(duration * _SAMPLE_RATE))
+    return buffer.getvalue()
+
+
+def _audio(video: dict) -> bytes:
+    if video.get("audio_file"):
+        return Path(video["audio_file"]).read_bytes()
+    return _wav(video["duration"])
+
+
+def _probe(url: str) -> int:
+    match = _ID_PATTERN.search(url)
+    video = _spec().get(match.group(1)) if match else None
+    if video is None:
+        print(f"ERROR: [youtube] {url}: Video unavailable", file=sys.stderr)
+        return 1
+    track = {"en": [{"ext": "vtt", "url": f"https://fake.invalid/{match.group(1)}.vtt"}]}
+    info = {
+        "id": match.group(1),
+        "webpage_url": url,
+        "duration": video["duration"],
+        "epoch": int(time.time()),
+        "subtitles": track if video["kind"] == "manual" else {},
+        "automatic_captions": track if video["kind"] == "auto" else {},
+    }
+    print(json.dumps(info))
+    return 0
+
+
+def yt_dlp(argv: list[str]) -> int:
+    if "--dump-single-json" in argv:
+        return _probe(argv[-1])
+    info = json.loads(Path(_arg(argv, "--load-info-json")).read_text())
+    video = _spec()[info["id"]]
+    output = _arg(argv, "--output")
+    if "--write-sub" in argv or "--write-auto-sub" in argv:
+        wanted = "manual" if "--write-sub" in argv else "auto"
+        if video["kind"] == wanted:
+            lang = _arg(argv, "--sub-langs")
+            Path(f"{output}.{lang}.vtt").write_text(_vtt(video["duration"], wanted == "auto"))
+        return 0
+    if output == "-":
+        sys.stdout.buffer.write(_audio(video))
+        return 0
+    if "-x" in argv:
+        # Containers are sniffed on decode, so WAV bytes under an .mp3 name are fine.
+        path = output.replace("%(id)s", info["id"]).replace("%(ext)s", "mp3")
+        Path(path).write_bytes(_audio(video))
+        return 0
+    print(f"fake yt-dlp: unsupported arguments {argv}", file=sys.stderr)
+    return 2
+
+
+def ffmpeg(_argv: list[str]) -> int:
+    """Convert a 16-bit PCM WAV on stdin to float32 samples on stdout."""
+    import numpy as np
+
+    with wave.open(io.BytesIO(sys.stdin.buffer.read()), "rb") as source:
+        frames = source.readframes(source.getnframes())
+    samples = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768.0
+    sys.stdout.buffer.write(samples.tobytes())
+    return 0
+
+
+if __name__ == "__main__":
+    tool, *args = sys.argv[1:]
+    sys.exit({"yt-dlp": yt_dlp, "ffmpeg": ffmpeg}[tool](args))
@@ -0,0 +1,20 @@
+"""Re-enqueue dead-lettered webhook deliveries (oldest first) onto the webhooks queue."""
+
+import argparse
+
+from app.tasks import deliver_webhook
+from app.webhooks import pop_dead_letters
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--limit", type=int, default=100, help="max deliveries to replay")
+    args = parser.parse_args()
+    entries = pop_dead_letters(args.limit)
+    for entry in entries:
+        deliver_webhook.delay(entry["webhook_url"], entry["payload"], entry.get("content_encoding"))
+    print(f"Re-enqueued {len(entries)} webhook deliveries")
+
+
+if __name__ == "__main__":
+    main()
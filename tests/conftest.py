@@ -0,0 +1,24 @@
+"""Shared fixtures: every test gets an isolated in-memory Redis."""
+
+import os
+from collections.abc import Iterator
+
+import fakeredis
+import pytest
+
+# Set env before importing app so pydantic-settings picks them up.
+os.environ.setdefault("API_KEY", "test-secret-key")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
+
+from app import redis_client
+
+
+@pytest.fixture(autouse=True)
+def fake_redis(monkeypatch: pytest.MonkeyPatch) -> Iterator[fakeredis.FakeRedis]:
+    """Replace the shared Redis clients (sync and asyncio) with one fresh fakeredis server."""
+    server = fakeredis.FakeServer()
+    client = fakeredis.FakeRedis(server=server)
+    monkeypatch.setattr(redis_client, "_client", client)
+    monkeypatch.setattr(redis_client, "_async_client", fakeredis.FakeAsyncRedis(server=server))
+    yield client
+    client.flushall()
@@ -0,0 +1,146 @@
+"""Tests for admission control: per-author rate limits, backlog limits and the ETA."""
+
+from collections.abc import Iterator
+from datetime import UTC, datetime
+from unittest.mock import patch
+
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+
+from app.admission import Rejected, check_backlog, check_rate, record_job_seconds
+from app.config import settings
+from app.lanes import lane_queue
+from app.main import app
+
+client = TestClient(app)
+HEADERS = {"X-API-Key": "test-secret-key"}
+
+
+def _body(n: int, **extra: str) -> dict[str, str]:
+    return {
+        "video_url": f"https://www.youtube.com/watch?v=adm{n:08d}",
+        "webhook_url": "https://example.com/hook",
+        **extra,
+    }
+
+
+@pytest.fixture(autouse=True)
+def _send_task() -> Iterator[None]:
+    with patch("app.main.celery_app.send_task"):
+        yield
+
+
+def test_rate_limit_slides_and_sets_retry_after() -> None:
+    """The window admits RATE_LIMIT_REQUESTS per author, then 429 until the oldest expires."""
+    with (
+        patch.object(settings, "RATE_LIMIT_REQUESTS", 2),
+        patch.object(settings, "RATE_LIMIT_WINDOW_SECONDS", 30),
+    ):
+        statuses = [
+            client.post("/transcript", json=_body(n, author="alice"), headers=HEADERS)
+            for n in range(3)
+        ]
+        other = client.post("/transcript", json=_body(9, author="bob"), headers=HEADERS)
+
+    assert [r.status_code for r in statuses] == [202, 202, 429]
+    assert 1 <= int(statuses[2].headers["Retry-After"]) <= 30
+    assert other.status_code == 202
+
+
+def test_rate_limit_cost_is_all_or_nothing() -> None:
+    """A batch charge that does not fit is refused without using up the window."""
+    with patch.object(settings, "RATE_LIMIT_REQUESTS", 3):
+        with pytest.raises(Rejected) as rejected:
+            check_rate("carol", 4)
+        assert rejected.value.status == 429
+        check_rate("carol", 3)
+        with pytest.raises(Rejected):
+            check_rate("carol")
+
+
+def test_backlog_estimate_uses_lanes_and_recent_job_times(
+    fake_redis: fakeredis.FakeRedis,
+) -> None:
+    """Jobs in lanes at or ahead of the request's lane count, at the queue's mean run time."""
+    for seconds in (10, 30):
+        record_job_seconds("whisper", seconds)
+    record_job_seconds("subs", 2)
+    record_job_seconds("webhooks", 99)
+    fake_redis.rpush(lane_queue("whisper", "interactive"), *["m"] * 3)
+    fake_redis.rpush(lane_queue("whisper", "bulk"), *["m"] * 10)
+    fake_redis.rpush(lane_queue("subs", "normal"), *["m"] * 4)
+    with (
+        patch.object(settings, "ADMISSION_WHISPER_WORKERS", 1),
+        patch.object(settings, "ADMISSION_SUBS_WORKERS", 2),
+    ):
+        assert check_backlog("interactive") == pytest.approx(3 * 20 + 1)
+        assert check_backlog("normal") == pytest.approx(3 * 20 + 4 * 1 + 1)
+        assert check_backlog("bulk") == pytest.approx(13 * 20 + 4 * 1 + 1)
+
+
+def test_deep_backlog_refuses_new_jobs_with_503(fake_redis: fakeredis.FakeRedis) -> None:
+    """Past the limit new jobs get 503 + Retry-After; more urgent lanes still get in."""
+    record_job_seconds("whisper", 600)
+    fake_redis.rpush(lane_queue("whisper", "bulk"), *["m"] * 10)
+    with patch.object(settings, "ADMISSION_MAX_BACKLOG_SECONDS", 3600):
+        refused = client.post("/transcript", json=_body(1, priority="bulk"), headers=HEADERS)
+        admitted = client.post("/transcript", json=_body(2, priority="normal"), headers=HEADERS)
+        batch = client.post(
+            "/transcripts/batch",
+            json={"items": [_body(3), _body(4, priority="bulk")]},
+            headers=HEADERS,
+        )
+
+    assert refused.status_code == 503
+    assert int(refused.headers["Retry-After"]) == 6000 - 3600
+    assert admitted.status_code == 202
+    assert batch.status_code == 503
+
+
+def test_queue_job_cap_refuses_new_jobs(fake_redis: fakeredis.FakeRedis) -> None:
+    """ADMISSION_MAX_QUEUED_JOBS bounds the messages held by the broker."""
+    fake_redis.rpush(lane_queue("subs", "normal"), *["m"] * 5)
+    with patch.object(settings, "ADMISSION_MAX_QUEUED_JOBS", 5):
+        response = client.post("/transcript", json=_body(1), headers=HEADERS)
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_backlog_refusal_does_not_use_up_rate_limit(fake_redis: fakeredis.FakeRedis) -> None:
+    """Requests refused with 503 are not charged to the author's window."""
+    fake_redis.rpush(lane_queue("subs", "normal"), "m")
+    with (
+        patch.object(settings, "RATE_LIMIT_REQUESTS", 2),
+        patch.object(settings, "ADMISSION_MAX_QUEUED_JOBS", 1),
+    ):
+        refused = [client.post("/transcript", json=_body(n), headers=HEADERS) for n in range(3)]
+        batch = client.post("/transcripts/batch", json={"items": [_body(3)]}, headers=HEADERS)
+        fake_redis.delete(lane_queue("subs", "normal"))
+        admitted = [client.post("/transcript", json=_body(n), headers=HEADERS) for n in (4, 5)]
+    assert [r.status_code for r in refused] == [503, 503, 503]
+    assert batch.status_code == 503
+    assert [r.status_code for r in admitted] == [202, 202]
+
+
+def test_accepted_job_carries_estimated_completion(fake_redis: fakeredis.FakeRedis) -> None:
+    """The 202 body has an ISO 8601 estimate of when the job's subtitle stage finishes."""
+    record_job_seconds("subs", 120)
+    with patch.object(settings, "ADMISSION_SUBS_WORKERS", 1):
+        data = client.post("/transcript", json=_body(1), headers=HEADERS).json()
+        batch = client.post("/transcripts/batch", json={"items": [_body(2)]}, headers=HEADERS)
+    eta = datetime.fromisoformat(data["estimated_completion"])
+    assert 100 < (eta - datetime.now(UTC)).total_seconds() <= 120
+    assert "estimated_completion" in batch.json()["items"][0]
+
+
+def test_batch_rate_limits_per_author() -> None:
+    """Items of an author over their limit are rejected; other authors' items go through."""
+    items = [_body(1, author="alice"), _body(2, author="alice"), _body(3, author="bob")]
+    with patch.object(settings, "RATE_LIMIT_REQUESTS", 1):
+        response = client.post("/transcripts/batch", json={"items": items}, headers=HEADERS)
+    assert response.status_code == 202
+    results = response.json()["items"]
+    assert results[0]["error"] == results[1]["error"] == "Rate limit exceeded"
+    assert results[0]["retry_after"] >= 1
+    assert "task_id" in results[2]
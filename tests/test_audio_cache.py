@@ -0,0 +1,61 @@
+"""Tests for the on-disk audio cache: lookup, expiry and size-bounded eviction."""
+
+import os
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from app import audio_cache
+from app.config import settings
+
+
+@pytest.fixture
+def cache_dir(tmp_path: Path) -> Iterator[Path]:
+    with (
+        patch.object(settings, "AUDIO_CACHE_DIR", str(tmp_path)),
+        patch.object(settings, "AUDIO_CACHE_MAX_BYTES", 100),
+        patch.object(settings, "AUDIO_CACHE_MAX_AGE_SECONDS", 3600),
+    ):
+        yield tmp_path
+
+
+def _entry(cache_dir: Path, name: str, size: int, age: float = 0) -> Path:
+    path = cache_dir / name
+    path.write_bytes(b"x" * size)
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+    return path
+
+
+def test_lookup_ignores_partial_downloads_and_expired_files(cache_dir: Path) -> None:
+    """Only complete, fresh files are hits."""
+    _entry(cache_dir, "abc.bestaudio.webm.part", 10)
+    assert audio_cache.lookup("abc") is None
+    _entry(cache_dir, "old.bestaudio.m4a", 10, age=7200)
+    assert audio_cache.lookup("old") is None
+    assert not (cache_dir / "old.bestaudio.m4a").exists()
+    done = _entry(cache_dir, "abc.bestaudio.webm", 10)
+    assert audio_cache.lookup("abc") == done
+
+
+def test_evict_drops_least_recently_used_until_under_budget(cache_dir: Path) -> None:
+    """Oldest entries go first; the file just downloaded is kept even if it is large."""
+    oldest = _entry(cache_dir, "a.bestaudio.webm", 40, age=300)
+    older = _entry(cache_dir, "b.bestaudio.webm", 40, age=200)
+    recent = _entry(cache_dir, "c.bestaudio.webm", 40, age=100)
+    stale_part = _entry(cache_dir, "d.bestaudio.webm.part", 500, age=7200)
+    fresh_part = _entry(cache_dir, "e.bestaudio.webm.part", 500)
+    keep = _entry(cache_dir, "f.bestaudio.webm", 50, age=400)
+
+    audio_cache.evict(keep=keep)
+
+    assert not oldest.exists()
+    assert not older.exists()
+    assert recent.exists()
+    assert keep.exists()
+    # In-progress downloads do not count toward the budget; abandoned ones expire.
+    assert fresh_part.exists()
+    assert not stale_part.exists()
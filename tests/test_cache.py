@@ -0,0 +1,82 @@
+"""Tests for the transcript result cache (Redis tier + optional disk tier)."""
+
+from pathlib import Path
+from unittest.mock import patch
+
+from app import cache
+from app.cache import (
+    get_cached_transcript,
+    get_cached_transcripts,
+    store_transcript,
+    transcript_cache_key,
+)
+from app.config import settings
+
+
+def test_cache_key_uses_video_id_and_model() -> None:
+    """Different URL shapes for the same video share one key."""
+    watch = transcript_cache_key("https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=10")
+    short = transcript_cache_key("https://youtu.be/dQw4w9WgXcQ")
+    assert watch == short
+    assert watch.startswith("dQw4w9WgXcQ:")
+    assert settings.WHISPER_MODEL in watch
+
+
+def test_cache_key_none_for_playlist_url() -> None:
+    """Playlist URLs are not cacheable."""
+    assert transcript_cache_key("https://www.youtube.com/playlist?list=PL123") is None
+
+
+def test_store_then_get_round_trips() -> None:
+    """A stored transcript is returned on the next lookup."""
+    store_transcript("vid:base:auto", "manual", "WEBVTT")
+    assert get_cached_transcript("vid:base:auto") == {"source": "manual", "transcript": "WEBVTT"}
+    assert get_cached_transcript("other:base:auto") is None
+
+
+def test_store_evicts_least_recently_used() -> None:
+    """Past TRANSCRIPT_CACHE_MAX_ENTRIES, the least recently read entry is evicted."""
+    with patch.object(settings, "TRANSCRIPT_CACHE_MAX_ENTRIES", 2):
+        store_transcript("a", "manual", "A")
+        store_transcript("b", "manual", "B")
+        get_cached_transcript("a")
+        store_transcript("c", "manual", "C")
+    assert get_cached_transcript("a") is not None
+    assert get_cached_transcript("b") is None
+    assert get_cached_transcript("c") is not None
+
+
+def test_disk_tier_serves_hits_without_redis(tmp_path: Path, fake_redis) -> None:
+    """With TRANSCRIPT_CACHE_DIR set, hits are served from disk after Redis is cleared."""
+    with patch.object(settings, "TRANSCRIPT_CACHE_DIR", str(tmp_path)):
+        store_transcript("vid:base:auto", "whisper", "WEBVTT\n\nx")
+        fake_redis.flushall()
+        assert get_cached_transcript("vid:base:auto") == {
+            "source": "whisper",
+            "transcript": "WEBVTT\n\nx",
+        }
+    assert len(list(tmp_path.glob("*.json"))) == 1
+
+
+def test_batch_lookup_returns_only_hits() -> None:
+    """get_cached_transcripts maps each hit key to its entry and omits misses."""
+    store_transcript("a:base:int8", "manual", "WEBVTT a")
+    hits = get_cached_transcripts(["a:base:int8", "b:base:int8", "a:base:int8"])
+    assert hits == {"a:base:int8": {"source": "manual", "transcript": "WEBVTT a"}}
+
+
+def test_disk_tier_evicts_at_most_once_per_interval(tmp_path: Path) -> None:
+    """Disk writes skip the directory scan until the eviction interval has passed."""
+    with (
+        patch.object(settings, "TRANSCRIPT_CACHE_DIR", str(tmp_path)),
+        patch.object(settings, "TRANSCRIPT_CACHE_MAX_ENTRIES", 2),
+        patch("app.cache._disk_evicted_at", float("-inf")),
+        patch("app.cache._evict_disk", wraps=cache._evict_disk) as evict,
+    ):
+        for key in ("a", "b", "c", "c"):
+            store_transcript(key, "manual", key.upper())
+        assert evict.call_count == 1
+        assert len(list(tmp_path.glob("*.json"))) == 3
+        with patch("app.cache._disk_evicted_at", float("-inf")):
+            store_transcript("d", "manual", "D")
+    assert len(list(tmp_path.glob("*.json"))) == 2
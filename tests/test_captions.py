@@ -0,0 +1,92 @@
+"""Tests for caption parsing (rolling-caption dedupe, tag stripping) and rendering."""
+
+from app.captions import (
+    Cue,
+    format_payload,
+    parse_captions,
+    render_transcript,
+    to_srt,
+    to_text,
+    to_vtt,
+)
+
+# Shape of YouTube auto captions: each cue repeats the previous line, word timings are
+# inline tags, and a 10 ms cue repeats the finished line.
+ROLLING_VTT = """WEBVTT
+Kind: captions
+Language: en
+
+00:00:00.000 --> 00:00:02.350 align:start position:0%
+ 
+hello<00:00:00.520><c> world</c>
+
+00:00:02.350 --> 00:00:02.360 align:start position:0%
+hello world
+ 
+
+00:00:02.360 --> 00:00:05.000 align:start position:0%
+hello world
+this<00:00:02.800><c> is</c><00:00:03.100><c> new</c>
+
+00:00:05.000 --> 00:00:05.010 align:start position:0%
+this is new
+ 
+"""
+
+SRT = """1
+00:00:01,000 --> 00:00:02,500
+<i>First</i> line
+second line
+
+2
+00:01:02,000 --> 00:01:03,000
+Tom &amp; Jerry
+"""
+
+
+def test_rolling_auto_captions_are_deduped_and_untagged() -> None:
+    """Every spoken line appears once, without inline timing tags."""
+    cues = parse_captions(ROLLING_VTT)
+    assert cues == [Cue(0.0, 2.36, "hello world"), Cue(2.36, 5.01, "this is new")]
+
+
+def test_srt_is_parsed_with_tags_and_entities_removed() -> None:
+    """SRT comma timestamps and multi-line cues are supported."""
+    cues = parse_captions(SRT.splitlines(keepends=True))
+    assert cues == [
+        Cue(1.0, 2.5, "First line\nsecond line"),
+        Cue(62.0, 63.0, "Tom & Jerry"),
+    ]
+
+
+def test_renderers() -> None:
+    """The same cues render to VTT, SRT and plain text."""
+    cues = [Cue(1.0, 2.5, "First line\nsecond line"), Cue(3661.2, 3662.0, "later")]
+    assert to_vtt(cues) == (
+        "WEBVTT\n\n00:00:01.000 --> 00:00:02.500\nFirst line\nsecond line"
+        "\n\n01:01:01.200 --> 01:01:02.000\nlater"
+    )
+    assert to_srt(cues).startswith("1\n00:00:01,000 --> 00:00:02,500\nFirst line")
+    assert to_text(cues) == "First line second line\nlater"
+    assert parse_captions(to_vtt(cues)) == cues
+
+
+def test_render_transcript_json_segments() -> None:
+    """JSON output is a list of start/end/text segments."""
+    assert render_transcript(ROLLING_VTT, "json") == [
+        {"start": 0.0, "end": 2.36, "text": "hello world"},
+        {"start": 2.36, "end": 5.01, "text": "this is new"},
+    ]
+
+
+def test_format_payload_only_touches_successful_results() -> None:
+    """Failed payloads and requests without output_format are passed through."""
+    success = {"status": "success", "transcript": ROLLING_VTT}
+    assert format_payload(success, None) is success
+    failed = {"status": "failed", "error": "boom"}
+    assert format_payload(failed, "text") is failed
+    assert format_payload(success, "text") == {
+        "status": "success",
+        "transcript": "hello world\nthis is new",
+        "format": "text",
+    }
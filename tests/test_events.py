@@ -0,0 +1,145 @@
+"""Tests for per-task event streams and GET /transcript/{task_id}/stream (SSE)."""
+
+import asyncio
+import json
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import events
+from app.cache import store_transcript, transcript_cache_key
+from app.captions import Cue
+from app.events import RESULT_EVENT, publish_event, read_events
+from app.main import app
+from app.task_status import mark_queued
+from app.tasks import run_whisper_transcription
+
+client = TestClient(app)
+AUTH = {"X-API-Key": "test-secret-key"}
+
+
+@pytest.fixture(autouse=True)
+def _known_tasks() -> None:
+    """The stream endpoint only serves tasks that have a status."""
+    mark_queued(["task-1", "idle", "owner"])
+
+
+def _parse_sse(body: str) -> list[dict]:
+    """Split an SSE body into events ({"id", "event", "data"}), skipping comments."""
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = [line for line in block.splitlines() if not line.startswith(":")]
+        fields = dict(line.split(": ", 1) for line in lines)
+        if "event" in fields:
+            events.append({**fields, "data": json.loads(fields["data"])})
+    return events
+
+
+def test_stream_replays_events_and_ends_after_result() -> None:
+    """A new connection gets every event so far and the stream closes after "result"."""
+    publish_event("task-1", "partial", {"seq": 1, "transcript": "first"})
+    publish_event("task-1", RESULT_EVENT, {"status": "success", "transcript": "all"})
+    publish_event("task-1", "partial", {"seq": 99})  # never reached
+
+    response = client.get("/transcript/task-1/stream", headers=AUTH)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _parse_sse(response.text)
+    assert [e["event"] for e in events] == ["partial", "result"]
+    assert events[1]["data"]["transcript"] == "all"
+
+
+def test_stream_resumes_after_last_event_id() -> None:
+    """Last-Event-ID skips events the client already has."""
+    publish_event("task-1", "partial", {"seq": 1})
+    publish_event("task-1", "partial", {"seq": 2})
+    publish_event("task-1", RESULT_EVENT, {"status": "success"})
+    first_id = _parse_sse(client.get("/transcript/task-1/stream", headers=AUTH).text)[0]["id"]
+
+    response = client.get("/transcript/task-1/stream", headers={**AUTH, "Last-Event-ID": first_id})
+
+    assert [e["data"].get("seq") for e in _parse_sse(response.text)] == [2, None]
+
+
+def test_stream_sends_keep_alive_and_closes_at_max_duration() -> None:
+    """An idle stream sends comments and ends after TRANSCRIPT_STREAM_MAX_SECONDS."""
+    with (
+        patch("app.main.settings.TRANSCRIPT_STREAM_MAX_SECONDS", 0),
+        patch("app.main.settings.TRANSCRIPT_STREAM_KEEPALIVE_SECONDS", 0.01),
+    ):
+        response = client.get("/transcript/idle/stream", headers=AUTH)
+    assert response.text == ": keep-alive\n\n"
+
+
+def test_stream_unknown_task_is_404() -> None:
+    """A typo'd or expired task ID does not hold a connection open."""
+    assert client.get("/transcript/no-such-task/stream", headers=AUTH).status_code == 404
+
+
+async def test_open_streams_share_one_reader() -> None:
+    """Connections waiting for new events are served by one XREAD, each from its cursor."""
+    publish_event("task-1", "partial", {"seq": 1})
+    first = read_events("task-1", block_ms=5000)
+    second = read_events("task-2", block_ms=5000)
+    assert (await anext(first))[1] == "partial"
+    waiting = [asyncio.ensure_future(anext(stream)) for stream in (first, second)]
+    await asyncio.sleep(0.05)
+    assert set(events._hub.subscribers) == {"aqua:events:task-1", "aqua:events:task-2"}
+    with patch("app.events.get_async_redis", side_effect=AssertionError("new reader")):
+        publish_event("task-1", RESULT_EVENT, {"status": "success"})
+        publish_event("task-2", "partial", {"seq": 1})
+        (_, event_1, _), (_, event_2, _) = await asyncio.gather(*waiting)
+    assert (event_1, event_2) == (RESULT_EVENT, "partial")
+    await second.aclose()
+
+
+def test_stream_rejects_bad_last_event_id_and_missing_key() -> None:
+    """A malformed Last-Event-ID is a 400; the stream needs the API key."""
+    assert (
+        client.get(
+            "/transcript/task-1/stream", headers={**AUTH, "Last-Event-ID": "nope"}
+        ).status_code
+        == 400
+    )
+    assert client.get("/transcript/task-1/stream").status_code == 401
+
+
+def test_cached_submission_publishes_result_event() -> None:
+    """The API's cache-hit path also publishes the result for stream clients."""
+    video_url = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+    store_transcript(transcript_cache_key(video_url), "manual", "WEBVTT hit")
+    with patch("app.main.celery_app.send_task"):
+        task_id = client.post(
+            "/transcript",
+            json={"video_url": video_url, "webhook_url": "https://example.com/webhook"},
+            headers=AUTH,
+        ).json()["task_id"]
+
+    (event,) = _parse_sse(client.get(f"/transcript/{task_id}/stream", headers=AUTH).text)
+    assert event["event"] == "result"
+    assert event["data"]["cached"] is True
+
+
+def test_whisper_stage_publishes_partials_and_result() -> None:
+    """Partials reach the stream even without progressive webhooks; the result ends it."""
+
+    def transcribe(url: str, info: dict | None, on_partial, **kwargs: object) -> str:
+        on_partial([Cue(0.0, 1.0, "first")])
+        return "WEBVTT\n\n00:00:00.000 --> 00:00:01.000\nfirst"
+
+    with (
+        patch("app.tasks.transcribe_video", side_effect=transcribe),
+        patch("app.tasks.deliver_webhook.delay") as mock_send,
+    ):
+        run_whisper_transcription.run(
+            "owner", "https://www.youtube.com/watch?v=dQw4w9WgXcQ", "https://owner.example/hook"
+        )
+
+    assert [call[0][1]["status"] for call in mock_send.call_args_list] == ["success"]
+    events = _parse_sse(client.get("/transcript/owner/stream", headers=AUTH).text)
+    assert [(e["event"], e["data"]["status"]) for e in events] == [
+        ("partial", "partial"),
+        ("result", "success"),
+    ]
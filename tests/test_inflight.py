@@ -0,0 +1,74 @@
+"""Tests for single-flight coalescing of in-flight videos."""
+
+from app.config import settings
+from app.inflight import abandon, claim, claim_many, release
+
+
+def test_first_claim_owns_and_later_claims_subscribe() -> None:
+    """Only the first submission owns the work; the rest are subscribers."""
+    assert claim("vid", "task-1", "https://a.example/hook", "alice") is True
+    assert claim("vid", "task-2", "https://b.example/hook", "bob") is False
+    assert claim("vid", "task-3", "https://c.example/hook", "carol") is False
+
+    subscribers = release("vid", "task-1")
+    assert subscribers == [
+        {"task_id": "task-2", "webhook_url": "https://b.example/hook", "author": "bob"},
+        {"task_id": "task-3", "webhook_url": "https://c.example/hook", "author": "carol"},
+    ]
+    # Lock is free again and the subscriber list was drained.
+    assert claim("vid", "task-4", "https://d.example/hook", "dave") is True
+    assert release("vid", "task-4") == []
+
+
+def test_owner_can_reclaim_its_own_lock() -> None:
+    """A redelivered owner task reclaims the lock instead of subscribing to itself."""
+    assert claim("vid", "task-1", "https://a.example/hook", "alice") is True
+    assert claim("vid", "task-1", "https://a.example/hook", "alice") is True
+    assert release("vid", "task-1") == []
+
+
+def test_expired_lease_lets_new_owner_serve_stranded_subscribers(fake_redis) -> None:
+    """After the owner's lease runs out, the next claimant drains the waiting subscribers."""
+    claim("vid", "task-1", "https://a.example/hook", "alice")
+    claim("vid", "task-2", "https://b.example/hook", "bob")
+    fake_redis.delete("aqua:inflight:vid")  # lease expired: crashed owner
+
+    assert claim("vid", "task-3", "https://c.example/hook", "carol") is True
+    assert [s["task_id"] for s in release("vid", "task-3")] == ["task-2"]
+
+
+def test_claim_many_matches_sequential_claims() -> None:
+    """Pipelined claims run in order: duplicates and already-owned keys subscribe."""
+    assert claim("held", "other", "https://h.example", "x")
+    owned = claim_many(
+        [
+            ("vid", "t1", "https://a.example", "alice", None),
+            ("vid", "t2", "https://b.example", "bob", None),
+            ("held", "t3", "https://c.example", "carol", None),
+        ]
+    )
+    assert owned == [True, False, False]
+    assert [s["task_id"] for s in release("vid", "t1")] == ["t2"]
+    assert [s["task_id"] for s in release("held", "other")] == ["t3"]
+
+
+def test_subscribers_outlive_the_broker_redelivery_window(fake_redis) -> None:
+    """Waiters stay queued until a crashed owner's job could be redelivered and renew them."""
+    claim("vid", "task-1", "https://a.example/hook", "alice")
+    claim("vid", "task-2", "https://b.example/hook", "bob")
+
+    retention_ms = fake_redis.pttl("aqua:inflight:vid:subscribers")
+    window_ms = (
+        settings.CELERY_VISIBILITY_TIMEOUT_SECONDS + settings.INFLIGHT_LEASE_SECONDS
+    ) * 1000
+    assert retention_ms >= window_ms - 1000
+
+
+def test_abandoned_claim_leaves_subscribers_for_the_next_owner() -> None:
+    """An owner that never started frees the key but keeps its waiters queued."""
+    claim("vid", "task-1", "https://a.example/hook", "alice")
+    claim("vid", "task-2", "https://b.example/hook", "bob")
+    abandon("vid", "task-1")
+
+    assert claim("vid", "task-3", "https://c.example/hook", "carol") is True
+    assert [s["task_id"] for s in release("vid", "task-3")] == ["task-2"]
@@ -0,0 +1,147 @@
+"""Tests for job cancellation and time budgets."""
+
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.cache import get_cached_transcript, transcript_cache_key
+from app.inflight import claim
+from app.jobs import JobCancelled, JobTimedOut, job_scope, request_cancel, run_process
+from app.main import app
+from app.pipeline import _transcribe
+from app.task_status import get_status, mark_queued
+from app.tasks import run_transcript_pipeline, run_whisper_transcription
+
+client = TestClient(app)
+HEADERS = {"X-API-Key": "test-secret-key"}
+VIDEO_URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+
+def test_cancel_kills_running_child_process() -> None:
+    """A cancellation flag set mid-run kills the child and raises JobCancelled."""
+    threading.Timer(0.2, request_cancel, args=["task-k"]).start()
+    started = time.monotonic()
+    with pytest.raises(JobCancelled), job_scope("task-k", None):
+        run_process(["sleep", "30"], capture_output=True)
+    assert time.monotonic() - started < 5
+
+
+def test_time_budget_kills_child_process() -> None:
+    """Past its budget the job's child is killed and JobTimedOut raised."""
+    started = time.monotonic()
+    with pytest.raises(JobTimedOut, match="0.3 s"), job_scope("task-t", 0.3):
+        run_process(["sleep", "30"])
+    assert time.monotonic() - started < 5
+
+
+def test_stop_kills_grandchildren_holding_the_pipes() -> None:
+    """The whole process group is killed, so a forked child cannot keep communicate() waiting."""
+    started = time.monotonic()
+    with pytest.raises(JobTimedOut), job_scope("task-g", 0.3):
+        run_process(["sh", "-c", "sleep 30 & wait"], capture_output=True)
+    assert time.monotonic() - started < 5
+
+
+def test_run_process_returns_output_like_subprocess_run() -> None:
+    """Outside a job, or within budget, it behaves like subprocess.run."""
+    result = run_process(["echo", "hi"], capture_output=True, text=True)
+    assert (result.returncode, result.stdout) == (0, "hi\n")
+    with job_scope("task-ok", 30):
+        assert run_process(["true"]).returncode == 0
+
+
+def test_transcription_stops_between_segments() -> None:
+    """Segments are no longer consumed once the job is cancelled."""
+    consumed = []
+
+    def segments():
+        for n in range(100):
+            consumed.append(n)
+            if n == 2:
+                request_cancel("task-s")
+            yield type("Segment", (), {"start": float(n), "end": n + 1.0, "text": "x"})()
+
+    with (
+        patch("app.jobs._POLL_SECONDS", 0),
+        patch("app.pipeline.get_model") as mock_get_model,
+        pytest.raises(JobCancelled),
+        job_scope("task-s", None),
+    ):
+        mock_get_model.return_value.transcribe.return_value = (segments(), None)
+        _transcribe("audio.mp3", 100.0)
+    assert consumed == [0, 1, 2]
+
+
+def test_whisper_timeout_sends_timeout_webhook_and_releases_lock() -> None:
+    """A timed-out job is not cached; only the owner gets status timeout."""
+    key = transcript_cache_key(VIDEO_URL)
+    assert claim(key, "owner", "https://owner.example/hook", "alice")
+    assert not claim(key, "follower", "https://follower.example/hook", "bob")
+    with (
+        patch(
+            "app.tasks.transcribe_video", side_effect=JobTimedOut("Time budget of 60 s exceeded")
+        ),
+        patch("app.tasks.deliver_webhook.delay") as mock_send,
+        patch("app.tasks.run_transcript_pipeline.apply_async") as mock_resubmit,
+    ):
+        run_whisper_transcription.run("owner", VIDEO_URL, "https://owner.example/hook", "alice")
+
+    payloads = {c[0][1]["task_id"]: c[0][1] for c in mock_send.call_args_list}
+    assert payloads.keys() == {"owner"}
+    assert payloads["owner"]["status"] == "timeout"
+    assert mock_resubmit.call_args[0][0][0] == "follower"
+    assert payloads["owner"]["error"] == "Time budget of 60 s exceeded"
+    assert get_cached_transcript(key) is None
+    assert get_status("owner")["status"] == "timeout"
+    assert claim(key, "next", "https://next.example/hook", "carol")
+
+
+def test_delete_cancels_queued_task_before_any_work() -> None:
+    """DELETE flags the task; the worker then sends a cancelled webhook without probing."""
+    mark_queued(["task-q"])
+    response = client.delete("/transcript/task-q", headers=HEADERS)
+    assert response.status_code == 202
+    assert response.json() == {"task_id": "task-q", "status": "cancelling"}
+
+    with (
+        patch("app.tasks.find_subtitles") as mock_find,
+        patch("app.tasks.deliver_webhook.delay") as mock_send,
+    ):
+        run_transcript_pipeline.run("task-q", VIDEO_URL, "https://h", "alice")
+
+    mock_find.assert_not_called()
+    assert mock_send.call_args[0][1]["status"] == "cancelled"
+    assert client.get("/transcript/task-q", headers=HEADERS).json()["status"] == "cancelled"
+    assert client.delete("/transcript/task-q", headers=HEADERS).status_code == 409
+    assert client.delete("/transcript/unknown", headers=HEADERS).status_code == 404
+
+
+def test_cancelled_owner_hands_subscribers_a_job_of_their_own() -> None:
+    """Cancelling the owner does not cancel the requests that joined its job."""
+    key = transcript_cache_key(VIDEO_URL)
+    assert claim(key, "owner", "https://owner.example/hook", "alice")
+    assert not claim(key, "sub", "https://sub.example/hook", "bob", options={"priority": "bulk"})
+    assert not claim(key, "gone", "https://gone.example/hook", "carol")
+    request_cancel("owner")
+    request_cancel("gone")
+
+    with (
+        patch("app.tasks.find_subtitles", return_value=({}, ("manual", "WEBVTT"))),
+        patch("app.tasks.deliver_webhook.delay") as mock_send,
+        patch("app.tasks.run_transcript_pipeline.apply_async") as mock_resubmit,
+    ):
+        run_transcript_pipeline.run("owner", VIDEO_URL, "https://owner.example/hook", "alice")
+        statuses = {c[0][1]["task_id"]: c[0][1]["status"] for c in mock_send.call_args_list}
+        assert statuses == {"owner": "cancelled", "gone": "cancelled"}
+        args, kwargs = mock_resubmit.call_args
+        assert args[0] == ("sub", VIDEO_URL, "https://sub.example/hook", "bob")
+        assert args[1]["options"] == {"priority": "bulk"}
+        assert kwargs["priority"] == 6
+
+        mock_send.reset_mock()
+        run_transcript_pipeline.run(*args[0], **args[1])
+    (payload,) = [c[0][1] for c in mock_send.call_args_list]
+    assert (payload["task_id"], payload["status"]) == ("sub", "success")
@@ -0,0 +1,83 @@
+"""Tests for priority lanes, per-author fair share and queue metrics."""
+
+from unittest.mock import patch
+
+import fakeredis
+import redis
+from prometheus_client import REGISTRY
+
+from app.celery_app import _observe_queue_wait, _stamp_enqueued_at
+from app.config import settings
+from app.lanes import fair_lane, fair_lanes, lane_queue, queue_depth_registry
+
+
+def test_author_over_fair_share_is_demoted_one_lane() -> None:
+    """The burst keeps its lane; later jobs drop one lane, other authors are unaffected."""
+    with (
+        patch.object(settings, "FAIR_SHARE_BURST", 3),
+        patch.object(settings, "FAIR_SHARE_RATE_PER_MINUTE", 1),
+    ):
+        lanes = fair_lanes([("backfill", "normal")] * 5)
+        assert lanes == ["normal"] * 3 + ["bulk"] * 2
+        assert fair_lane("backfill", "bulk") == "overflow"
+        assert fair_lane("backfill", "overflow") == "overflow"
+        assert fair_lane("alice", "interactive") == "interactive"
+
+
+def test_bucket_refills_over_time() -> None:
+    """Tokens come back at the configured rate."""
+    with (
+        patch.object(settings, "FAIR_SHARE_BURST", 1),
+        patch.object(settings, "FAIR_SHARE_RATE_PER_MINUTE", 60),
+        patch("app.lanes.time") as mock_time,
+    ):
+        mock_time.time.side_effect = [1000.0, 1000.5, 1001.5]
+        assert fair_lane("bob", None) == "normal"
+        assert fair_lane("bob", None) == "bulk"
+        assert fair_lane("bob", None) == "normal"
+
+
+def test_fair_share_disabled_or_redis_down_keeps_requested_lane() -> None:
+    """A zero rate skips the buckets; a Redis error fails open."""
+    with patch.object(settings, "FAIR_SHARE_RATE_PER_MINUTE", 0):
+        assert fair_lanes([("x", "bulk"), ("x", None)]) == ["bulk", "normal"]
+    with patch("app.lanes.get_redis", side_effect=redis.ConnectionError("down")):
+        assert fair_lane("x", "interactive") == "interactive"
+
+
+def test_queue_depth_collector_reports_each_lane(fake_redis: fakeredis.FakeRedis) -> None:
+    """Depth is read from kombu's per-priority lists."""
+    assert lane_queue("subs", "interactive") == "subs"
+    fake_redis.rpush(lane_queue("subs", "bulk"), "m1", "m2")
+    fake_redis.rpush(lane_queue("whisper", "interactive"), "m3")
+
+    def depth(queue: str, lane: str) -> float | None:
+        return queue_depth_registry.get_sample_value(
+            "aqua_whisper_queue_depth", {"queue": queue, "lane": lane}
+        )
+
+    assert depth("subs", "bulk") == 2
+    assert depth("subs", "normal") == 0
+    assert depth("whisper", "interactive") == 1
+
+
+def test_queue_wait_is_observed_by_queue_and_lane() -> None:
+    """The publish signal stamps the time; prerun observes the wait under the lane."""
+    labels = {"queue": "whisper", "lane": "bulk"}
+    before = REGISTRY.get_sample_value("aqua_whisper_queue_wait_seconds_count", labels) or 0.0
+    headers: dict = {}
+    _stamp_enqueued_at(headers=headers)
+    task = type("Task", (), {})()
+    task.request = type(
+        "Request",
+        (),
+        {
+            "enqueued_at": headers["enqueued_at"] - 5,
+            "delivery_info": {"routing_key": "whisper", "priority": 6},
+        },
+    )()
+    _observe_queue_wait(task=task)
+    after = REGISTRY.get_sample_value("aqua_whisper_queue_wait_seconds_count", labels)
+    assert after == before + 1
+    total = REGISTRY.get_sample_value("aqua_whisper_queue_wait_seconds_sum", labels)
+    assert total >= 5
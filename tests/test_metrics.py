@@ -0,0 +1,70 @@
+"""Tests for stage metrics and the /metrics endpoint."""
+
+from unittest.mock import MagicMock, patch
+
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.celery_app import _start_metrics_exporter
+from app.main import app
+from app.pipeline import _transcribe
+from app.tasks import run_transcript_pipeline
+from app.webhooks import post_webhook
+
+
+def _stage_count(stage: str) -> float:
+    return REGISTRY.get_sample_value("aqua_whisper_stage_seconds_count", {"stage": stage}) or 0.0
+
+
+def test_transcribe_records_stage_latencies_and_real_time_factor() -> None:
+    """Inference and VTT rendering are timed separately; RTF is set per mode."""
+    segment = type("Segment", (), {"start": 0.0, "end": 1.0, "text": "hi"})()
+    before = {stage: _stage_count(stage) for stage in ("transcribe", "vtt_build")}
+    with patch("app.pipeline.get_model") as mock_get_model:
+        mock_get_model.return_value.transcribe.return_value = (iter([segment]), None)
+        _transcribe("audio.mp3", 60.0)
+
+    for stage, count in before.items():
+        assert _stage_count(stage) == count + 1
+    rtf = REGISTRY.get_sample_value("aqua_whisper_real_time_factor", {"mode": "sequential"})
+    assert rtf is not None and rtf >= 0
+
+
+def test_task_counts_transcripts_by_source() -> None:
+    """Fresh results increment the per-source counter."""
+    labels = {"source": "manual"}
+    before = REGISTRY.get_sample_value("aqua_whisper_transcripts_total", labels) or 0.0
+    with (
+        patch("app.tasks.find_subtitles", return_value=({}, ("manual", "WEBVTT"))),
+        patch("app.tasks.deliver_webhook.delay"),
+    ):
+        run_transcript_pipeline.run("task-m", "https://www.youtube.com/watch?v=x", "https://h")
+    assert REGISTRY.get_sample_value("aqua_whisper_transcripts_total", labels) == before + 1
+
+
+def test_webhook_post_is_timed() -> None:
+    """Each webhook POST is observed as the webhook stage."""
+    before = _stage_count("webhook")
+    client = MagicMock()
+    client.post.return_value.status_code = 200
+    with patch("app.webhooks.get_client", return_value=client):
+        post_webhook("https://example.com/hook", {"task_id": "t"})
+    assert _stage_count("webhook") == before + 1
+
+
+def test_metrics_endpoint_exposes_prometheus_text() -> None:
+    """GET /metrics needs no API key and serves the stage histogram."""
+    response = TestClient(app).get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "aqua_whisper_stage_seconds" in response.text
+
+
+def test_worker_exporter_needs_multiproc_dir_with_prefork_pool(monkeypatch) -> None:
+    """A prefork worker only starts its exporter when PROMETHEUS_MULTIPROC_DIR is set."""
+    monkeypatch.delenv("PROMETHEUS_MULTIPROC_DIR", raising=False)
+    with patch("app.celery_app.start_http_server") as start:
+        _start_metrics_exporter(sender=MagicMock(pool_cls="prefork"))
+        start.assert_not_called()
+        _start_metrics_exporter(sender=MagicMock(pool_cls="threads"))
+        start.assert_called_once()
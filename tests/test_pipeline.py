@@ -1,10 +1,26 @@
 """Tests for transcript pipeline (get_transcript). Mock subprocess/yt-dlp."""
 
+import json
+import time
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
+import numpy as np
+import pytest
+from prometheus_client import REGISTRY
 
-from app.pipeline import get_transcript
+from app.config import settings
+from app.pipeline import (
+    NoSubtitlesError,
+    _transcribe,
+    get_transcript,
+    iter_collection_videos,
+    select_subtitle_tracks,
+    transcribe_video,
+)
+from app.video_policy import VideoRejectedError
+
+_VTT_TRACK = [{"ext": "vtt", "url": "https://example.com/subs.vtt"}]
 
 
 def _make_segment(start: float, end: float, text: str) -> object:
@@ -12,20 +28,39 @@ def _make_segment(start: float, end: float, text: str) -> object:
     return type("Segment", (), {"start": start, "end": end, "text": text})()
 
 
+def _probe_result(
+    subtitles: dict | None = None, automatic_captions: dict | None = None
+) -> MagicMock:
+    """Fake `yt-dlp --dump-single-json` result for a video with the given tracks."""
+    info = {
+        "id": "abc",
+        "duration": 120,
+        "subtitles": subtitles or {},
+        "automatic_captions": automatic_captions or {},
+    }
+    return MagicMock(returncode=0, stdout=json.dumps(info), stderr="")
+
+
+def _write_subs(cmd: list, body: str) -> None:
+    """Simulate yt-dlp writing a .vtt next to the --output base."""
+    out_base = cmd[cmd.index("--output") + 1]
+    Path(out_base + ".en.vtt").write_text(body)
+
+
 def test_manual_subtitle_returns_manual_and_vtt_content(tmp_path: Path) -> None:
     """When yt-dlp (mocked) writes manual .vtt, get_transcript returns ('manual', vtt_body)."""
     vtt_body = "WEBVTT\n\n00:00:00.000 --> 00:00:01.000\nmanual line"
 
     def run_effect(cmd: list, **kwargs: object) -> MagicMock:
-        if "--write-sub" in cmd and "--write-auto-sub" not in cmd:
-            idx = cmd.index("--output")
-            out_base = cmd[idx + 1]
-            Path(out_base + ".vtt").write_text(vtt_body)
+        if "--dump-single-json" in cmd:
+            return _probe_result(subtitles={"en": _VTT_TRACK})
+        if "--write-sub" in cmd:
+            _write_subs(cmd, vtt_body)
         return MagicMock(returncode=0)
 
     with (
         patch("app.pipeline.mkdtemp", return_value=str(tmp_path)),
-        patch("app.pipeline.subprocess.run", side_effect=run_effect),
+        patch("app.pipeline.run_process", side_effect=run_effect),
     ):
         source, content = get_transcript("https://www.youtube.com/watch?v=abc")
     assert source == "manual"
@@ -33,27 +68,28 @@ def test_manual_subtitle_returns_manual_and_vtt_content(tmp_path: Path) -> None:
 
 
 def test_auto_subtitle_when_no_manual_returns_auto_and_vtt_content(tmp_path: Path) -> None:
-    """When only auto .vtt exists (no manual), get_transcript returns ('auto', vtt_body)."""
+    """When only auto captions are probed, only the auto track is fetched."""
     vtt_body = "WEBVTT\n\n00:00:00.000 --> 00:00:02.000\nauto line"
-
-    call_count = 0
+    run_calls: list[list] = []
 
     def run_effect(cmd: list, **kwargs: object) -> MagicMock:
-        nonlocal call_count
-        call_count += 1
+        run_calls.append(cmd)
+        if "--dump-single-json" in cmd:
+            return _probe_result(automatic_captions={"en": _VTT_TRACK})
         if "--write-auto-sub" in cmd:
-            idx = cmd.index("--output")
-            out_base = cmd[idx + 1]
-            Path(out_base + ".vtt").write_text(vtt_body)
+            _write_subs(cmd, vtt_body)
         return MagicMock(returncode=0)
 
     with (
         patch("app.pipeline.mkdtemp", return_value=str(tmp_path)),
-        patch("app.pipeline.subprocess.run", side_effect=run_effect),
+        patch("app.pipeline.run_process", side_effect=run_effect),
     ):
         source, content = get_transcript("https://www.youtube.com/watch?v=xyz")
     assert source == "auto"
     assert content == vtt_body
+    assert len(run_calls) == 2
+    assert not any("--write-sub" in c for c in run_calls)
+    assert all("--load-info-json" in c for c in run_calls[1:])
 
 
 def test_whisper_fallback_when_no_manual_or_auto_returns_whisper_and_vtt(tmp_path: Path) -> None:
@@ -64,9 +100,8 @@ def test_whisper_fallback_when_no_manual_or_auto_returns_whisper_and_vtt(tmp_pat
 
     def run_effect(cmd: list, **kwargs: object) -> MagicMock:
         run_calls.append(cmd)
-        # Manual/auto: no .vtt
-        if "--write-sub" in cmd or "--write-auto-sub" in cmd:
-            return MagicMock(returncode=0)
+        if "--dump-single-json" in cmd:
+            return _probe_result()
         # yt-dlp -x: create fake .mp3 in output dir
         if "-x" in cmd and "--audio-format" in cmd:
             out_idx = cmd.index("--output")
@@ -80,18 +115,20 @@ def test_whisper_fallback_when_no_manual_or_auto_returns_whisper_and_vtt(tmp_pat
     mock_segments = [_make_segment(0.0, 2.5, "whisper fallback line")]
     with (
         patch("app.pipeline.mkdtemp", return_value=str(work_dir)),
-        patch("app.pipeline.subprocess.run", side_effect=run_effect),
-        patch("app.pipeline.WhisperModel") as mock_model_cls,
+        patch("app.pipeline.run_process", side_effect=run_effect),
+        patch("app.pipeline.get_model") as mock_get_model,
+        patch.object(settings, "WHISPER_AUDIO_MODE", "file"),
     ):
-        mock_model_cls.return_value.transcribe.return_value = (mock_segments, None)
+        mock_get_model.return_value.transcribe.return_value = (mock_segments, None)
         source, content = get_transcript("https://www.youtube.com/watch?v=abc")
 
     assert source == "whisper"
     assert "WEBVTT" in content
     assert "whisper fallback line" in content
-    # Should have called yt-dlp -x for audio download
+    # One probe, no subtitle downloads, one audio download.
+    assert len(run_calls) == 2
     ytdlp_x_calls = [c for c in run_calls if "-x" in c and "mp3" in c]
-    assert len(ytdlp_x_calls) >= 1
+    assert len(ytdlp_x_calls) == 1
     # Cleanup: temp dir removed in try/finally
     assert not work_dir.exists()
 
@@ -102,8 +139,8 @@ def test_whisper_fallback_cleans_up_temp_dir(tmp_path: Path) -> None:
     work_dir.mkdir()
 
     def run_effect(cmd: list, **kwargs: object) -> MagicMock:
-        if "--write-sub" in cmd or "--write-auto-sub" in cmd:
-            return MagicMock(returncode=0)
+        if "--dump-single-json" in cmd:
+            return _probe_result()
         if "-x" in cmd and "--audio-format" in cmd:
             out_idx = cmd.index("--output")
             out_tpl = cmd[out_idx + 1]
@@ -116,10 +153,310 @@ def test_whisper_fallback_cleans_up_temp_dir(tmp_path: Path) -> None:
     mock_segments = [_make_segment(0.0, 1.0, "cleanup test")]
     with (
         patch("app.pipeline.mkdtemp", return_value=str(work_dir)),
-        patch("app.pipeline.subprocess.run", side_effect=run_effect),
-        patch("app.pipeline.WhisperModel") as mock_model_cls,
+        patch("app.pipeline.run_process", side_effect=run_effect),
+        patch("app.pipeline.get_model") as mock_get_model,
+        patch.object(settings, "WHISPER_AUDIO_MODE", "file"),
     ):
-        mock_model_cls.return_value.transcribe.return_value = (mock_segments, None)
+        mock_get_model.return_value.transcribe.return_value = (mock_segments, None)
         get_transcript("https://www.youtube.com/watch?v=xyz")
 
     assert not work_dir.exists(), "Temp dir should be removed after get_transcript"
+
+
+def test_whisper_stream_mode_pipes_native_audio_into_model(tmp_path: Path) -> None:
+    """Stream mode decodes yt-dlp's stdout with ffmpeg and feeds PCM to the model, no mp3."""
+    pcm = np.linspace(-0.5, 0.5, 16000, dtype=np.float32)
+    popen_calls: list[list] = []
+
+    def popen_effect(cmd: list, **kwargs: object) -> MagicMock:
+        popen_calls.append(cmd)
+        proc = MagicMock(returncode=0)
+        if cmd[0] == "ffmpeg":
+            proc.communicate.return_value = (pcm.tobytes(), b"")
+        return proc
+
+    def run_effect(cmd: list, **kwargs: object) -> MagicMock:
+        return _probe_result()
+
+    mock_segments = [_make_segment(0.0, 1.0, "streamed line")]
+    with (
+        patch("app.pipeline.mkdtemp", return_value=str(tmp_path)),
+        patch("app.pipeline.run_process", side_effect=run_effect) as mock_run,
+        patch("app.pipeline.subprocess.Popen", side_effect=popen_effect),
+        patch("app.pipeline.get_model") as mock_get_model,
+        patch.object(settings, "WHISPER_AUDIO_MODE", "stream"),
+    ):
+        mock_get_model.return_value.transcribe.return_value = (mock_segments, None)
+        source, content = get_transcript("https://www.youtube.com/watch?v=abc")
+
+    assert source == "whisper"
+    assert "streamed line" in content
+    assert mock_run.call_count == 1  # probe only
+    downloader_cmd, decoder_cmd = popen_calls
+    assert "-x" not in downloader_cmd and "mp3" not in downloader_cmd
+    assert downloader_cmd[-2:] == ["--output", "-"]
+    assert decoder_cmd[decoder_cmd.index("-ar") + 1] == "16000"
+    audio = mock_get_model.return_value.transcribe.call_args[0][0]
+    assert audio.dtype == np.float32
+    np.testing.assert_array_equal(audio, pcm)
+
+
+def test_transcribe_video_reuses_fresh_probe_and_reprobes_stale_one(tmp_path: Path) -> None:
+    """The whisper stage skips the probe when handed recent info, and re-probes old info."""
+    run_calls: list[list] = []
+
+    def run_effect(cmd: list, **kwargs: object) -> MagicMock:
+        run_calls.append(cmd)
+        if "--dump-single-json" in cmd:
+            return _probe_result()
+        if "-x" in cmd:
+            (Path(cmd[cmd.index("--output") + 1]).parent / "audio_abc.mp3").write_bytes(b"x")
+        return MagicMock(returncode=0)
+
+    info = {"id": "abc", "duration": 120, "epoch": time.time()}
+    with (
+        patch("app.pipeline.mkdtemp", return_value=str(tmp_path / "w")),
+        patch("app.pipeline.run_process", side_effect=run_effect),
+        patch("app.pipeline.get_model") as mock_get_model,
+        patch.object(settings, "WHISPER_AUDIO_MODE", "file"),
+    ):
+        mock_get_model.return_value.transcribe.return_value = ([_make_segment(0, 1, "hi")], None)
+        (tmp_path / "w").mkdir()
+        transcribe_video("https://www.youtube.com/watch?v=abc", info)
+        assert not any("--dump-single-json" in c for c in run_calls)
+        (tmp_path / "w").mkdir()
+        transcribe_video("https://www.youtube.com/watch?v=abc", {**info, "epoch": 0})
+        assert sum("--dump-single-json" in c for c in run_calls) == 1
+
+
+def test_audio_cache_downloads_once_and_reuses_audio(tmp_path: Path) -> None:
+    """With AUDIO_CACHE_DIR, a second transcription of the video skips the download."""
+    downloads: list[list] = []
+
+    def run_effect(cmd: list, **kwargs: object) -> MagicMock:
+        if "--continue" in cmd:
+            downloads.append(cmd)
+            template = cmd[cmd.index("--output") + 1]
+            Path(template.replace("%(ext)s", "webm")).write_bytes(b"opus")
+        return MagicMock(returncode=0, stdout=b"", stderr=b"")
+
+    def lookups(result: str) -> float:
+        return (
+            REGISTRY.get_sample_value("aqua_whisper_audio_cache_lookups_total", {"result": result})
+            or 0.0
+        )
+
+    before = {result: lookups(result) for result in ("hit", "miss")}
+    cache_dir = tmp_path / "audio"
+    info = {"id": "abc", "duration": 120, "epoch": time.time()}
+    with (
+        patch("app.pipeline.run_process", side_effect=run_effect),
+        patch("app.pipeline.get_model") as mock_get_model,
+        patch.object(settings, "WHISPER_AUDIO_MODE", "file"),
+        patch.object(settings, "AUDIO_CACHE_DIR", str(cache_dir)),
+    ):
+        mock_get_model.return_value.transcribe.return_value = ([_make_segment(0, 1, "hi")], None)
+        transcribe_video("https://www.youtube.com/watch?v=abc", info)
+        transcribe_video("https://www.youtube.com/watch?v=abc", info)
+
+    assert len(downloads) == 1
+    audio = mock_get_model.return_value.transcribe.call_args[0][0]
+    assert audio == str(cache_dir / "abc.bestaudio.webm")
+    # One miss (first job) and one hit (second job): the check after the download is not counted.
+    assert {result: lookups(result) - before[result] for result in before} == {
+        "hit": 1,
+        "miss": 1,
+    }
+
+
+def test_long_audio_uses_batched_pipeline_with_offset_timestamps() -> None:
+    """Audio past WHISPER_LONG_AUDIO_SECONDS is chunked and batched; timestamps stay absolute."""
+    audio = np.zeros(16000 * 120, dtype=np.float32)
+    batched_segments = [
+        _make_segment(0.0, 29.5, "first chunk"),
+        _make_segment(3725.25, 3730.0, "late chunk"),
+    ]
+    with (
+        patch("app.pipeline.get_model") as mock_get_model,
+        patch("app.pipeline.get_batched_pipeline") as mock_get_batched,
+        patch.object(settings, "WHISPER_LONG_AUDIO_SECONDS", 60),
+        patch.object(settings, "WHISPER_BATCH_SIZE", 4),
+        patch.object(settings, "WHISPER_CHUNK_LENGTH", 20),
+    ):
+        mock_get_batched.return_value.transcribe.return_value = (batched_segments, None)
+        vtt = _transcribe(audio, 120.0)
+
+    mock_get_model.return_value.transcribe.assert_not_called()
+    kwargs = mock_get_batched.return_value.transcribe.call_args[1]
+    assert (kwargs["batch_size"], kwargs["chunk_length"]) == (4, 20)
+    # VAD does the chunking here, so it is never switched off.
+    assert "vad_filter" not in kwargs
+    assert kwargs["vad_parameters"]["min_silence_duration_ms"] == 2000
+    assert "01:02:05.250 --> 01:02:10.000\nlate chunk" in vtt
+
+
+def test_short_audio_uses_sequential_model() -> None:
+    """Audio under the threshold keeps the single sequential transcribe call."""
+    with (
+        patch("app.pipeline.get_model") as mock_get_model,
+        patch("app.pipeline.get_batched_pipeline") as mock_get_batched,
+        patch.object(settings, "WHISPER_LONG_AUDIO_SECONDS", 1800),
+    ):
+        mock_get_model.return_value.transcribe.return_value = ([_make_segment(0, 1, "hi")], None)
+        vtt = _transcribe("audio.mp3", 300.0)
+
+    mock_get_batched.assert_not_called()
+    assert vtt == "WEBVTT\n\n00:00:00.000 --> 00:00:01.000\nhi"
+
+
+def test_decode_settings_and_request_overrides_reach_transcribe() -> None:
+    """WHISPER_* settings are the defaults; a request's overrides win."""
+    with (
+        patch("app.pipeline.get_model") as mock_get_model,
+        patch.object(settings, "WHISPER_LONG_AUDIO_SECONDS", 0),
+        patch.object(settings, "WHISPER_BEAM_SIZE", 3),
+        patch.object(settings, "WHISPER_LANGUAGE", "en"),
+        patch.object(settings, "WHISPER_VAD_FILTER", False),
+    ):
+        mock_get_model.return_value.transcribe.return_value = ([], None)
+        _transcribe("audio.mp3", 60.0)
+        defaults = mock_get_model.return_value.transcribe.call_args[1]
+        _transcribe(
+            "audio.mp3", 60.0, decode={"beam_size": 1, "vad_filter": True, "vad_speech_pad_ms": 0}
+        )
+        overridden = mock_get_model.return_value.transcribe.call_args[1]
+
+    assert defaults["beam_size"] == 3
+    assert defaults["language"] == "en"
+    assert "vad_filter" not in defaults
+    assert overridden["beam_size"] == 1
+    assert overridden["vad_filter"] is True
+    assert overridden["vad_parameters"]["speech_pad_ms"] == 0
+
+
+def test_transcribe_flushes_partial_batches_while_decoding() -> None:
+    """on_partial gets each batch as soon as enough segments or audio are decoded."""
+    segments = [_make_segment(i * 10, i * 10 + 10, f"s{i}") for i in range(7)]
+    batches: list[list[str]] = []
+    with (
+        patch("app.pipeline.get_model") as mock_get_model,
+        patch.object(settings, "WHISPER_LONG_AUDIO_SECONDS", 0),
+        patch.object(settings, "PARTIAL_FLUSH_SEGMENTS", 3),
+        patch.object(settings, "PARTIAL_FLUSH_AUDIO_SECONDS", 25),
+    ):
+        mock_get_model.return_value.transcribe.return_value = (iter(segments), None)
+        vtt = _transcribe(
+            "audio.mp3", 70.0, on_partial=lambda cues: batches.append([c.text for c in cues])
+        )
+
+    # 30s of audio flushes s0-s2; the next batch reaches 3 segments; s6 only goes out in full.
+    assert batches == [["s0", "s1", "s2"], ["s3", "s4", "s5"]]
+    assert vtt.count("-->") == 7
+
+
+def test_probe_rejected_raises_no_subtitles(tmp_path: Path) -> None:
+    """When the probe prints nothing (video unavailable), no further yt-dlp calls run."""
+    run_calls: list[list] = []
+
+    def run_effect(cmd: list, **kwargs: object) -> MagicMock:
+        run_calls.append(cmd)
+        return MagicMock(returncode=0, stdout="", stderr="")
+
+    with (
+        patch("app.pipeline.mkdtemp", return_value=str(tmp_path)),
+        patch("app.pipeline.run_process", side_effect=run_effect),
+        pytest.raises(NoSubtitlesError),
+    ):
+        get_transcript("https://www.youtube.com/watch?v=short")
+    assert len(run_calls) == 1
+
+
+def test_short_video_rejected_after_probe_without_downloads(tmp_path: Path) -> None:
+    """A video under MIN_VIDEO_SECONDS fails with a precise error after the probe alone."""
+    run_calls: list[list] = []
+    probe = _probe_result(subtitles={"en": _VTT_TRACK})
+    probe.stdout = probe.stdout.replace('"duration": 120', '"duration": 45')
+
+    def run_effect(cmd: list, **kwargs: object) -> MagicMock:
+        run_calls.append(cmd)
+        return probe
+
+    labels = {"reason": "too_short"}
+    before = REGISTRY.get_sample_value("aqua_whisper_video_rejections_total", labels) or 0.0
+    with (
+        patch("app.pipeline.mkdtemp", return_value=str(tmp_path)),
+        patch("app.pipeline.run_process", side_effect=run_effect),
+        pytest.raises(VideoRejectedError, match="45 s long, shorter than the minimum of 60 s"),
+    ):
+        get_transcript("https://www.youtube.com/watch?v=short")
+    assert len(run_calls) == 1
+    assert "--match-filter" not in run_calls[0]
+    after = REGISTRY.get_sample_value("aqua_whisper_video_rejections_total", labels)
+    assert after == before + 1
+
+
+def test_select_subtitle_tracks_prefers_english_and_skips_live_chat() -> None:
+    """Track selection mirrors yt-dlp's default language choice."""
+    info = {
+        "subtitles": {"live_chat": _VTT_TRACK, "de": _VTT_TRACK, "en": _VTT_TRACK},
+        "automatic_captions": {"fr": _VTT_TRACK},
+    }
+    assert select_subtitle_tracks(info) == [("manual", "en"), ("auto", "fr")]
+    assert select_subtitle_tracks({"subtitles": {"live_chat": _VTT_TRACK}}) == []
+
+
+def test_iter_collection_videos_streams_ids_and_expands_channel_tabs() -> None:
+    """Flat listing lines are yielded as they arrive; channel tabs are listed one level down."""
+    listings = {
+        "https://www.youtube.com/@chan": [
+            {"_type": "url", "ie_key": "YoutubeTab", "url": "https://www.youtube.com/@chan/videos"},
+        ],
+        "https://www.youtube.com/@chan/videos": [
+            {"_type": "url", "ie_key": "Youtube", "id": "aaaaaaaaaaa"},
+            {"_type": "url", "ie_key": "Youtube", "id": "bbbbbbbbbbb"},
+        ],
+    }
+    commands: list[list] = []
+
+    def popen_effect(cmd: list, **kwargs: object) -> MagicMock:
+        commands.append(cmd)
+        proc = MagicMock(returncode=0)
+        proc.stdout = iter(json.dumps(entry) + "\n" for entry in listings[cmd[-1]])
+        return proc
+
+    with patch("app.pipeline.subprocess.Popen", side_effect=popen_effect):
+        assert list(iter_collection_videos("https://www.youtube.com/@chan")) == [
+            "aaaaaaaaaaa",
+            "bbbbbbbbbbb",
+        ]
+    assert all("--flat-playlist" in cmd and "--lazy-playlist" in cmd for cmd in commands)
+
+
+def test_iter_collection_videos_limit_spans_all_channel_tabs() -> None:
+    """COLLECTION_MAX_VIDEOS bounds the whole channel, not each tab; the listers are stopped."""
+    tab = {"_type": "url", "ie_key": "YoutubeTab"}
+    listings = {
+        "https://www.youtube.com/@chan": [
+            {**tab, "url": "https://www.youtube.com/@chan/videos"},
+            {**tab, "url": "https://www.youtube.com/@chan/shorts"},
+        ],
+        "https://www.youtube.com/@chan/videos": [{"id": "aaaaaaaaaaa"}, {"id": "bbbbbbbbbbb"}],
+        "https://www.youtube.com/@chan/shorts": [{"id": "ccccccccccc"}, {"id": "ddddddddddd"}],
+    }
+    procs: list[MagicMock] = []
+
+    def popen_effect(cmd: list, **kwargs: object) -> MagicMock:
+        proc = MagicMock(returncode=0)
+        proc.poll.return_value = None
+        proc.stdout = iter(json.dumps(entry) + "\n" for entry in listings[cmd[-1]])
+        procs.append(proc)
+        return proc
+
+    with (
+        patch.object(settings, "COLLECTION_MAX_VIDEOS", 3),
+        patch("app.pipeline.subprocess.Popen", side_effect=popen_effect),
+    ):
+        videos = list(iter_collection_videos("https://www.youtube.com/@chan"))
+    assert videos == ["aaaaaaaaaaa", "bbbbbbbbbbb", "ccccccccccc"]
+    assert len(procs) == 3
+    assert all(proc.kill.called for proc in procs)
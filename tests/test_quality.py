@@ -0,0 +1,74 @@
+"""Tests for quality tiers and the "auto" tier policy."""
+
+from collections.abc import Iterator
+from unittest.mock import patch
+
+import fakeredis
+import pytest
+from pydantic import ValidationError
+
+from app.cache import transcript_cache_key
+from app.config import settings
+from app.quality import pick_auto_tier, resolve_tier, select_tier
+from app.schemas import TranscriptRequest
+
+TIERS = {"draft": "tiny:int8", "standard": "base", "high": "small:int8"}
+VIDEO_URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+
+@pytest.fixture(autouse=True)
+def _tiers() -> Iterator[None]:
+    with (
+        patch.object(settings, "WHISPER_QUALITY_TIERS", TIERS),
+        patch.object(settings, "WHISPER_AUTO_LONG_AUDIO_SECONDS", 3600),
+        patch.object(settings, "WHISPER_AUTO_QUEUE_STEP", 10),
+    ):
+        yield
+
+
+def test_resolve_tier_defaults_compute_type_and_model() -> None:
+    """A tier without compute type uses WHISPER_COMPUTE_TYPE; None is WHISPER_MODEL."""
+    assert resolve_tier("draft") == ("tiny", "int8")
+    assert resolve_tier("standard") == ("base", settings.WHISPER_COMPUTE_TYPE)
+    assert resolve_tier(None) == (settings.WHISPER_MODEL, settings.WHISPER_COMPUTE_TYPE)
+
+
+@pytest.mark.parametrize(
+    ("duration", "queue_depth", "tier"),
+    [
+        (120, 0, "high"),
+        (4 * 3600, 0, "standard"),
+        (120, 12, "standard"),
+        (4 * 3600, 12, "draft"),
+        (None, 500, "draft"),
+    ],
+)
+def test_auto_policy_steps_down_for_long_audio_and_backlog(
+    duration: float | None, queue_depth: int, tier: str
+) -> None:
+    """Auto starts at the highest tier; long audio and each queue step drop one tier."""
+    assert pick_auto_tier(duration, queue_depth) == tier
+
+
+def test_select_tier_reads_whisper_queue_depth(fake_redis: fakeredis.FakeRedis) -> None:
+    """Auto looks at the broker's whisper lists (all lanes); fixed tiers pass through."""
+    fake_redis.rpush("whisper", *["job"] * 4)
+    fake_redis.rpush("whisper:6", *["job"] * 6)
+    assert select_tier("auto", 60) == "standard"
+    assert select_tier("draft", 60) == "draft"
+    assert select_tier(None, 60) is None
+
+
+def test_request_rejects_unknown_quality() -> None:
+    """quality must be a configured tier or "auto"."""
+    body = {"video_url": VIDEO_URL, "webhook_url": "https://example.com/hook"}
+    assert TranscriptRequest(**body, quality="auto").quality == "auto"
+    with pytest.raises(ValidationError):
+        TranscriptRequest(**body, quality="ultra")
+
+
+def test_cache_key_separates_tiers() -> None:
+    """Each tier, and auto, has its own cache (and coalescing) key."""
+    keys = {transcript_cache_key(VIDEO_URL, q) for q in (None, "draft", "high", "auto")}
+    assert len(keys) == 4
+    assert transcript_cache_key(VIDEO_URL, "draft") == "dQw4w9WgXcQ:tiny:int8"
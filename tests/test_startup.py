@@ -0,0 +1,19 @@
+"""Import-time regression tests: the API process must not load the transcription stack."""
+
+import os
+import subprocess
+import sys
+
+_HEAVY_MODULES = ("faster_whisper", "ctranslate2", "av", "app.tasks", "app.pipeline")
+
+
+def test_importing_api_does_not_load_transcription_stack() -> None:
+    """`import app.main` leaves faster-whisper and the worker-only modules unloaded."""
+    code = (
+        f"import sys, app.main; print(','.join(m for m in {_HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    env = {"API_KEY": "test-secret-key", "REDIS_URL": "redis://localhost:6379/0", **os.environ}
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True
+    )
+    assert result.stdout.strip() == ""
@@ -0,0 +1,104 @@
+"""Tests for the task status store and GET /transcript/{task_id}."""
+
+from unittest.mock import patch
+
+import fakeredis
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.pipeline import _transcribe
+from app.task_status import get_status
+from app.tasks import run_transcript_pipeline, run_whisper_transcription
+
+client = TestClient(app)
+HEADERS = {"X-API-Key": "test-secret-key"}
+VIDEO_URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+
+def test_status_follows_task_from_queued_to_done() -> None:
+    """The API records queued; the worker's final payload is readable afterwards."""
+    with patch("app.main.celery_app.send_task") as mock_send_task:
+        task_id = client.post(
+            "/transcript",
+            json={"video_url": VIDEO_URL, "webhook_url": "https://h", "output_format": "text"},
+            headers=HEADERS,
+        ).json()["task_id"]
+    queued = client.get(f"/transcript/{task_id}", headers=HEADERS).json()
+    assert queued["status"] == "queued"
+    assert "result" not in queued
+
+    kwargs = mock_send_task.call_args[1]
+    vtt = "WEBVTT\n\n00:00:00.000 --> 00:00:01.000\nhello\n"
+    with (
+        patch("app.tasks.find_subtitles", return_value=({}, ("manual", vtt))),
+        patch("app.tasks.deliver_webhook.delay"),
+    ):
+        run_transcript_pipeline.run(*kwargs["args"], **kwargs["kwargs"])
+
+    done = client.get(f"/transcript/{task_id}", headers=HEADERS).json()
+    assert done["status"] == "done"
+    assert done["progress"] == 1
+    assert done["result"]["transcript"] == "hello"
+    assert done["result"]["format"] == "text"
+
+
+def test_result_is_stored_compressed(fake_redis: fakeredis.FakeRedis) -> None:
+    """The payload is zstd-compressed in the hash, which expires with the status TTL."""
+    transcript = "WEBVTT\n\n" + "00:00:00.000 --> 00:00:01.000\nsame words again\n\n" * 500
+    with (
+        patch("app.tasks.find_subtitles", return_value=({}, ("auto", transcript))),
+        patch("app.tasks.deliver_webhook.delay"),
+    ):
+        run_transcript_pipeline.run("task-z", VIDEO_URL, "https://h")
+
+    raw = fake_redis.hget("aqua:status:task-z", "result")
+    assert raw.startswith(b"\x28\xb5\x2f\xfd")
+    assert len(raw) < len(transcript) / 10
+    assert 0 < fake_redis.ttl("aqua:status:task-z") <= settings.TASK_STATUS_TTL_SECONDS
+    assert get_status("task-z")["result"]["transcript"] == transcript
+
+
+def test_whisper_stage_reports_progress_and_failure() -> None:
+    """Download and transcription progress are recorded; a failure ends as failed."""
+    seen = []
+
+    def transcribe(*_args: object, on_progress, **_kwargs: object) -> str:
+        on_progress("downloading", None)
+        on_progress("transcribing", 0.5)
+        seen.append(get_status("task-w"))
+        raise RuntimeError("decoder crashed")
+
+    with (
+        patch("app.tasks.transcribe_video", side_effect=transcribe),
+        patch("app.tasks.deliver_webhook.delay"),
+    ):
+        run_whisper_transcription.run("task-w", VIDEO_URL, "https://h")
+
+    assert seen[0]["status"] == "transcribing"
+    assert seen[0]["progress"] == 0.5
+    failed = client.get("/transcript/task-w", headers=HEADERS).json()
+    assert failed["status"] == "failed"
+    assert failed["result"]["error"] == "decoder crashed"
+
+
+def test_transcribe_reports_fraction_of_audio_done() -> None:
+    """Progress is reported at the start and at each partial flush point."""
+    segments = [
+        type("Segment", (), {"start": float(n), "end": float(n + 1), "text": "x"})()
+        for n in range(4)
+    ]
+    progress = []
+    with (
+        patch("app.pipeline.get_model") as mock_get_model,
+        patch.object(settings, "PARTIAL_FLUSH_SEGMENTS", 2),
+    ):
+        mock_get_model.return_value.transcribe.return_value = (iter(segments), None)
+        _transcribe("audio.mp3", 8.0, on_progress=lambda *update: progress.append(update))
+    assert progress == [("transcribing", 0.0), ("transcribing", 0.25), ("transcribing", 0.5)]
+
+
+def test_unknown_task_returns_404_and_needs_api_key() -> None:
+    """Unknown or expired tasks are 404; the endpoint is authenticated."""
+    assert client.get("/transcript/nope", headers=HEADERS).status_code == 404
+    assert client.get("/transcript/nope").status_code == 401
@@ -1,36 +1,36 @@
-"""Tests for Celery task: run_transcript_pipeline and webhook POST."""
+"""Tests for Celery tasks: run_transcript_pipeline, run_whisper_transcription, deliver_webhook."""
 
-from unittest.mock import MagicMock, patch
+from unittest.mock import patch
 
+from prometheus_client import REGISTRY
 
+from app.cache import get_cached_transcript, store_transcript, transcript_cache_key
+from app.captions import Cue
+from app.config import settings
+from app.inflight import claim, release
 from app.pipeline import NoSubtitlesError
-from app.tasks import run_transcript_pipeline
+from app.tasks import expand_collection, run_transcript_pipeline, run_whisper_transcription
+from app.video_policy import check_video_policy
 
 
-def test_task_posts_success_payload_when_get_transcript_returns() -> None:
-    """When get_transcript returns (source, transcript), task POSTs webhook with status success."""
+def test_task_posts_success_payload_when_subtitles_found() -> None:
+    """When find_subtitles returns a track, task POSTs webhook with status success."""
     task_id = "task-uuid-123"
     video_url = "https://www.youtube.com/watch?v=abc"
     webhook_url = "https://example.com/webhook"
     source = "manual"
     transcript = "WEBVTT\n\n00:00:00.000 --> 00:00:01.000\nline one"
 
-    mock_post = MagicMock()
-    mock_client = MagicMock()
-    mock_client.post = mock_post
-
     with (
-        patch("app.tasks.get_transcript", return_value=(source, transcript)),
-        patch("app.tasks.httpx.Client") as mock_client_cls,
+        patch("app.tasks.find_subtitles", return_value=({}, (source, transcript))),
+        patch("app.tasks.deliver_webhook.delay") as mock_post,
     ):
-        mock_client_cls.return_value.__enter__.return_value = mock_client
-        mock_client_cls.return_value.__exit__.return_value = None
         run_transcript_pipeline.run(task_id, video_url, webhook_url, "unknown")
 
     mock_post.assert_called_once()
     call_kwargs = mock_post.call_args
     assert call_kwargs[0][0] == webhook_url
-    assert call_kwargs[1]["json"] == {
+    assert call_kwargs[0][1] == {
         "task_id": task_id,
         "status": "success",
         "source": source,
@@ -39,29 +39,23 @@ def test_task_posts_success_payload_when_get_transcript_returns() -> None:
     }
 
 
-def test_task_posts_failed_payload_when_get_transcript_raises() -> None:
-    """When get_transcript raises, task POSTs webhook with status failed and error message."""
+def test_task_posts_failed_payload_when_find_subtitles_raises() -> None:
+    """When find_subtitles raises, task POSTs webhook with status failed and error message."""
     task_id = "task-uuid-456"
     video_url = "https://www.youtube.com/watch?v=xyz"
     webhook_url = "https://example.com/callback"
     error_message = "No manual or auto subtitles available for this video"
 
-    mock_post = MagicMock()
-    mock_client = MagicMock()
-    mock_client.post = mock_post
-
     with (
-        patch("app.tasks.get_transcript", side_effect=NoSubtitlesError(error_message)),
-        patch("app.tasks.httpx.Client") as mock_client_cls,
+        patch("app.tasks.find_subtitles", side_effect=NoSubtitlesError(error_message)),
+        patch("app.tasks.deliver_webhook.delay") as mock_post,
     ):
-        mock_client_cls.return_value.__enter__.return_value = mock_client
-        mock_client_cls.return_value.__exit__.return_value = None
         run_transcript_pipeline.run(task_id, video_url, webhook_url, "unknown")
 
     mock_post.assert_called_once()
     call_kwargs = mock_post.call_args
     assert call_kwargs[0][0] == webhook_url
-    assert call_kwargs[1]["json"] == {
+    assert call_kwargs[0][1] == {
         "task_id": task_id,
         "status": "failed",
         "error": error_message,
@@ -70,26 +64,399 @@ def test_task_posts_failed_payload_when_get_transcript_raises() -> None:
 
 
 def test_task_posts_failed_payload_on_any_exception() -> None:
-    """When get_transcript raises any Exception, task POSTs webhook with status failed."""
+    """When find_subtitles raises any Exception, task POSTs webhook with status failed."""
     task_id = "task-uuid-789"
     video_url = "https://www.youtube.com/watch?v=err"
     webhook_url = "https://example.com/hook"
     error_message = "Unexpected runtime error"
 
-    mock_post = MagicMock()
-    mock_client = MagicMock()
-    mock_client.post = mock_post
-
     with (
-        patch("app.tasks.get_transcript", side_effect=RuntimeError(error_message)),
-        patch("app.tasks.httpx.Client") as mock_client_cls,
+        patch("app.tasks.find_subtitles", side_effect=RuntimeError(error_message)),
+        patch("app.tasks.deliver_webhook.delay") as mock_post,
     ):
-        mock_client_cls.return_value.__enter__.return_value = mock_client
-        mock_client_cls.return_value.__exit__.return_value = None
         run_transcript_pipeline.run(task_id, video_url, webhook_url, "unknown")
 
     mock_post.assert_called_once()
     call_kwargs = mock_post.call_args
-    assert call_kwargs[1]["json"]["status"] == "failed"
-    assert call_kwargs[1]["json"]["error"] == error_message
-    assert call_kwargs[1]["json"]["author"] == "unknown"
+    assert call_kwargs[0][1]["status"] == "failed"
+    assert call_kwargs[0][1]["error"] == error_message
+    assert call_kwargs[0][1]["author"] == "unknown"
+
+
+def test_task_cache_hit_skips_pipeline_and_marks_payload_cached() -> None:
+    """A cached transcript is delivered without running the pipeline."""
+    video_url = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+    store_transcript(transcript_cache_key(video_url), "auto", "WEBVTT cached")
+
+    with (
+        patch("app.tasks.find_subtitles") as mock_find_subtitles,
+        patch("app.tasks.deliver_webhook.delay") as mock_send,
+    ):
+        run_transcript_pipeline.run("task-cached", video_url, "https://example.com/hook", "bob")
+
+    mock_find_subtitles.assert_not_called()
+    payload = mock_send.call_args[0][1]
+    assert payload["cached"] is True
+    assert payload["source"] == "auto"
+    assert payload["transcript"] == "WEBVTT cached"
+    assert payload["task_id"] == "task-cached"
+
+
+def test_task_cache_hit_leaves_another_owners_subscribers_alone() -> None:
+    """A job served from cache never claimed the video, so it must not drain the waiters."""
+    video_url = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+    key = transcript_cache_key(video_url)
+    store_transcript(key, "auto", "WEBVTT cached")
+    claim(key, "owner", "https://a.example/hook", "alice")
+    claim(key, "waiter", "https://b.example/hook", "bob")
+
+    with patch("app.tasks.deliver_webhook.delay") as mock_send:
+        run_transcript_pipeline.run("task-cached", video_url, "https://c.example/hook", "carol")
+
+    assert [call.args[0] for call in mock_send.call_args_list] == ["https://c.example/hook"]
+    assert [s["task_id"] for s in release(key, "owner")] == ["waiter"]
+
+
+def test_task_success_stores_result_in_cache() -> None:
+    """A fresh result is written to the cache for later submissions."""
+    video_url = "https://youtu.be/dQw4w9WgXcQ"
+    with (
+        patch("app.tasks.find_subtitles", return_value=({}, ("manual", "WEBVTT fresh"))),
+        patch("app.tasks.deliver_webhook.delay"),
+    ):
+        run_transcript_pipeline.run("task-fresh", video_url, "https://example.com/hook")
+
+    assert get_cached_transcript(transcript_cache_key(video_url)) == {
+        "source": "manual",
+        "transcript": "WEBVTT fresh",
+    }
+
+
+def test_task_delivers_result_to_coalesced_subscribers() -> None:
+    """Subscribers attached while the job ran each get a webhook with their own task_id."""
+    video_url = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+    key = transcript_cache_key(video_url)
+    assert claim(key, "owner", "https://owner.example/hook", "alice")
+    assert not claim(key, "follower", "https://follower.example/hook", "bob")
+
+    with (
+        patch("app.tasks.find_subtitles", return_value=({}, ("manual", "WEBVTT shared"))),
+        patch("app.tasks.deliver_webhook.delay") as mock_send,
+    ):
+        run_transcript_pipeline.run("owner", video_url, "https://owner.example/hook", "alice")
+
+    delivered = {call[0][0]: call[0][1] for call in mock_send.call_args_list}
+    assert delivered["https://owner.example/hook"]["task_id"] == "owner"
+    follower = delivered["https://follower.example/hook"]
+    assert follower["task_id"] == "follower"
+    assert follower["author"] == "bob"
+    assert follower["transcript"] == "WEBVTT shared"
+
+
+def test_task_joins_in_flight_job_instead_of_running() -> None:
+    """A task whose video is owned by another job subscribes and returns without work."""
+    video_url = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+    key = transcript_cache_key(video_url)
+    assert claim(key, "other-owner", "https://owner.example/hook", "alice")
+
+    with (
+        patch("app.tasks.find_subtitles") as mock_find_subtitles,
+        patch("app.tasks.deliver_webhook.delay") as mock_send,
+    ):
+        run_transcript_pipeline.run("late", video_url, "https://late.example/hook", "bob")
+
+    mock_find_subtitles.assert_not_called()
+    mock_send.assert_not_called()
+    assert [s["task_id"] for s in release(key, "other-owner")] == ["late"]
+
+
+def test_task_without_subtitles_escalates_to_whisper_queue() -> None:
+    """No subtitles: the lease is extended and the pruned probe is handed to the whisper stage."""
+    video_url = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+    info = {"id": "dQw4w9WgXcQ", "duration": 120, "epoch": 1, "subtitles": {}, "formats": []}
+
+    with (
+        patch("app.tasks.find_subtitles", return_value=(info, None)),
+        patch("app.tasks.run_whisper_transcription.apply_async") as mock_escalate,
+        patch("app.tasks.renew") as mock_renew,
+        patch("app.tasks.deliver_webhook.delay") as mock_send,
+    ):
+        run_transcript_pipeline.run(
+            "task-esc",
+            video_url,
+            "https://example.com/hook",
+            "bob",
+            options={"priority": "interactive"},
+        )
+
+    mock_send.assert_not_called()
+    mock_renew.assert_called_once()
+    args, kwargs = mock_escalate.call_args[0]
+    assert args[:4] == ("task-esc", video_url, "https://example.com/hook", "bob")
+    assert "subtitles" not in args[4]
+    assert args[4]["id"] == "dQw4w9WgXcQ"
+    assert kwargs["options"]["priority"] == "interactive"
+    # The whisper stage runs on what is left of the job's time budget.
+    assert 0 < kwargs["options"]["timeout_seconds"] <= settings.JOB_TIMEOUT_SECONDS
+    assert mock_escalate.call_args[1]["priority"] == 0
+
+
+def test_whisper_stage_delivers_to_owner_and_subscribers_and_caches() -> None:
+    """The whisper stage finishes the job the subtitle stage escalated."""
+    video_url = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+    key = transcript_cache_key(video_url)
+    assert claim(key, "owner", "https://owner.example/hook", "alice")
+    assert not claim(key, "follower", "https://follower.example/hook", "bob")
+
+    with (
+        patch("app.tasks.transcribe_video", return_value="WEBVTT whisper") as mock_transcribe,
+        patch("app.tasks.deliver_webhook.delay") as mock_send,
+    ):
+        run_whisper_transcription.run(
+            "owner", video_url, "https://owner.example/hook", "alice", {"id": "dQw4w9WgXcQ"}
+        )
+
+    assert mock_transcribe.call_args[0] == (video_url, {"id": "dQw4w9WgXcQ"})
+    delivered = {call[0][0]: call[0][1] for call in mock_send.call_args_list}
+    assert delivered["https://owner.example/hook"]["source"] == "whisper"
+    assert delivered["https://follower.example/hook"]["task_id"] == "follower"
+    assert get_cached_transcript(key) == {
+        "source": "whisper",
+        "transcript": "WEBVTT whisper",
+        "video": {"id": "dQw4w9WgXcQ"},
+    }
+
+
+def test_expand_collection_fans_out_skips_repeats_and_reports_aggregate() -> None:
+    """Each distinct video gets a child job; the last child to finish sends the aggregate."""
+    listed = ["dQw4w9WgXcQ", "9bZkp7q19f0", "dQw4w9WgXcQ"]
+    with (
+        patch("app.tasks.iter_collection_videos", return_value=iter(listed)),
+        patch("app.tasks.run_transcript_pipeline.apply_async") as mock_child,
+        patch("app.tasks.deliver_webhook.delay") as mock_send,
+    ):
+        expand_collection.run(
+            "parent",
+            "https://www.youtube.com/@chan",
+            "https://h",
+            "alice",
+            options={"priority": "bulk"},
+        )
+
+    assert mock_child.call_count == 2
+    assert all(c[0][1]["parent_task_id"] == "parent" for c in mock_child.call_args_list)
+    assert all(c[1]["priority"] == 6 for c in mock_child.call_args_list)
+    mock_send.assert_not_called()
+
+    children = [c[0][0] for c in mock_child.call_args_list]
+    with (
+        patch("app.tasks.find_subtitles", return_value=({}, ("auto", "WEBVTT"))),
+        patch("app.tasks.deliver_webhook.delay") as mock_send,
+    ):
+        for child in children:
+            run_transcript_pipeline.run(*child, parent_task_id="parent")
+
+    payloads = [c[0][1] for c in mock_send.call_args_list]
+    assert [p["parent_task_id"] for p in payloads[:-1] if "source" in p] == ["parent", "parent"]
+    assert payloads[-1] == {
+        "task_id": "parent",
+        "status": "completed",
+        "videos": 2,
+        "succeeded": 2,
+        "failed": 0,
+        "author": "alice",
+    }
+
+
+def test_expand_collection_charges_each_video_and_pauses_when_refused() -> None:
+    """Videos pass the rate limit one by one; a refusal re-enqueues the rest for later."""
+    listed = ["dQw4w9WgXcQ", "9bZkp7q19f0", "jNQXAC9IVRw"]
+    with (
+        patch.object(settings, "RATE_LIMIT_REQUESTS", 2),
+        patch("app.tasks.iter_collection_videos", side_effect=lambda url: iter(listed)),
+        patch("app.tasks.run_transcript_pipeline.apply_async") as mock_child,
+        patch("app.tasks.expand_collection.apply_async") as mock_resume,
+        patch("app.tasks.deliver_webhook.delay") as mock_send,
+    ):
+        expand_collection.run("parent", "https://www.youtube.com/@chan", "https://h", "alice")
+        assert mock_child.call_count == 2
+        assert mock_resume.call_args[0][0][0] == "parent"
+        assert mock_resume.call_args[1]["countdown"] >= 1
+        mock_send.assert_not_called()
+
+        # Once the window has room again, the resumed expansion enqueues only the rest.
+        with patch.object(settings, "RATE_LIMIT_REQUESTS", 3):
+            expand_collection.run("parent", "https://www.youtube.com/@chan", "https://h", "alice")
+    assert mock_child.call_count == 3
+    assert mock_child.call_args[0][0][1].endswith("jNQXAC9IVRw")
+    assert mock_resume.call_count == 1
+
+
+def test_expand_collection_listing_failure_sends_failed_webhook() -> None:
+    """A collection that cannot be listed at all fails like a single video would."""
+    with (
+        patch("app.tasks.iter_collection_videos", side_effect=RuntimeError("listing failed")),
+        patch("app.tasks.deliver_webhook.delay") as mock_send,
+    ):
+        expand_collection.run("parent", "https://www.youtube.com/@gone", "https://h", "alice")
+    assert mock_send.call_args[0][1]["status"] == "failed"
+    assert mock_send.call_args[0][1]["error"] == "listing failed"
+
+
+def test_subscriber_gets_its_own_output_format() -> None:
+    """Owner and coalesced subscriber each receive the transcript in the format they asked for."""
+    video_url = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+    key = transcript_cache_key(video_url)
+    vtt = "WEBVTT\n\n00:00:00.000 --> 00:00:01.000\n<c>line</c> one"
+    assert claim(key, "owner", "https://owner.example/hook", "alice")
+    assert not claim(
+        key, "follower", "https://follower.example/hook", "bob", options={"output_format": "srt"}
+    )
+
+    with (
+        patch("app.tasks.find_subtitles", return_value=({}, ("auto", vtt))),
+        patch("app.tasks.deliver_webhook.delay") as mock_send,
+    ):
+        run_transcript_pipeline.run(
+            "owner",
+            video_url,
+            "https://owner.example/hook",
+            "alice",
+            options={"output_format": "text"},
+        )
+
+    delivered = {call[0][0]: call[0][1] for call in mock_send.call_args_list}
+    assert delivered["https://owner.example/hook"]["transcript"] == "line one"
+    assert delivered["https://owner.example/hook"]["format"] == "text"
+    follower = delivered["https://follower.example/hook"]
+    assert follower["transcript"] == "1\n00:00:00,000 --> 00:00:01,000\nline one"
+    # The cache keeps the source VTT so any format can be served later.
+    assert get_cached_transcript(key)["transcript"] == vtt
+
+
+def test_progressive_whisper_job_sends_numbered_partials_then_final() -> None:
+    """Partials go out while transcribing; the final webhook follows with the next seq."""
+    video_url = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+    def transcribe(url: str, info: dict | None, on_partial, **kwargs: object) -> str:
+        on_partial([Cue(0.0, 1.0, "first")])
+        on_partial([Cue(1.0, 2.0, "second")])
+        return "WEBVTT\n\n00:00:00.000 --> 00:00:01.000\nfirst"
+
+    with (
+        patch("app.tasks.transcribe_video", side_effect=transcribe),
+        patch("app.tasks.deliver_webhook.delay") as mock_send,
+    ):
+        run_whisper_transcription.run(
+            "owner",
+            video_url,
+            "https://owner.example/hook",
+            "alice",
+            options={"progressive": True, "output_format": "text"},
+        )
+
+    payloads = [call[0][1] for call in mock_send.call_args_list]
+    assert [(p["status"], p["seq"]) for p in payloads] == [
+        ("partial", 1),
+        ("partial", 2),
+        ("success", 3),
+    ]
+    assert payloads[0]["transcript"] == "first"
+    assert payloads[1]["format"] == "text"
+
+
+def test_whisper_stage_uses_requested_tier_and_reports_it() -> None:
+    """The tier's model is passed to the pipeline and echoed in the payload."""
+    video_url = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+    with (
+        patch.object(settings, "WHISPER_QUALITY_TIERS", {"draft": "tiny:int8", "high": "small"}),
+        patch("app.tasks.transcribe_video", return_value="WEBVTT") as mock_transcribe,
+        patch("app.tasks.deliver_webhook.delay") as mock_send,
+    ):
+        run_whisper_transcription.run(
+            "owner",
+            video_url,
+            "https://owner.example/hook",
+            info={"duration": 5 * 3600},
+            options={"quality": "auto"},
+        )
+        cached_auto = get_cached_transcript(transcript_cache_key(video_url, "auto"))
+
+    assert mock_transcribe.call_args[1]["model"] == ("tiny", "int8")
+    assert mock_send.call_args[0][1]["quality"] == "draft"
+    assert cached_auto is not None
+
+
+def _probed(info: dict):
+    """find_subtitles stand-in that applies the policy to info and finds manual subtitles."""
+
+    def find(video_url: str, policy: dict | None = None) -> tuple[dict, tuple[str, str]]:
+        check_video_policy(info, policy)
+        return info, ("manual", "WEBVTT")
+
+    return find
+
+
+def test_each_subscriber_is_checked_against_its_own_duration_policy() -> None:
+    """The owner's limits do not fail subscribers, and theirs do not loosen for them."""
+    video_url = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+    key = transcript_cache_key(video_url)
+    info = {"id": "dQw4w9WgXcQ", "duration": 3600}
+    assert claim(key, "owner", "https://owner.example/hook", "alice")
+    assert not claim(key, "open", "https://open.example/hook", "bob")
+    assert not claim(
+        key, "strict", "https://strict.example/hook", "carol", options={"max_duration_seconds": 60}
+    )
+
+    with (
+        patch("app.tasks.find_subtitles", side_effect=_probed(info)),
+        patch("app.tasks.deliver_webhook.delay") as mock_send,
+        patch("app.tasks.run_transcript_pipeline.apply_async") as mock_resubmit,
+    ):
+        run_transcript_pipeline.run(
+            "owner",
+            video_url,
+            "https://owner.example/hook",
+            "alice",
+            options={"max_duration_seconds": 300},
+        )
+        payloads = {c[0][1]["task_id"]: c[0][1] for c in mock_send.call_args_list}
+        assert payloads.keys() == {"owner", "strict"}
+        assert payloads["owner"]["rejected"] == payloads["strict"]["rejected"] == "too_long"
+        assert "maximum of 60 s" in payloads["strict"]["error"]
+        # The request without a limit gets a job of its own, which succeeds.
+        args = mock_resubmit.call_args[0]
+        assert args[0][0] == "open"
+        mock_send.reset_mock()
+        run_transcript_pipeline.run(*args[0], **args[1])
+    assert mock_send.call_args[0][1]["status"] == "success"
+
+    # A cached result carries the video's length: a stricter request is still refused.
+    assert get_cached_transcript(key)["video"] == info
+    with patch("app.tasks.deliver_webhook.delay") as mock_send:
+        run_transcript_pipeline.run(
+            "late", video_url, "https://h", "dave", options={"max_duration_seconds": 300}
+        )
+    assert mock_send.call_args[0][1]["rejected"] == "too_long"
+
+
+def test_subscriber_rejections_count_once_per_reason() -> None:
+    """Refusing a shared result to several subscribers counts the video once, not per request."""
+    video_url = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+    key = transcript_cache_key(video_url)
+    assert claim(key, "owner", "https://owner.example/hook", "alice")
+    for task_id in ("strict-1", "strict-2"):
+        claim(key, task_id, "https://h", "bob", options={"max_duration_seconds": 60})
+    labels = {"reason": "too_long"}
+    before = REGISTRY.get_sample_value("aqua_whisper_video_rejections_total", labels) or 0.0
+
+    with (
+        patch("app.tasks.find_subtitles", side_effect=_probed({"duration": 3600})),
+        patch("app.tasks.deliver_webhook.delay") as mock_send,
+    ):
+        run_transcript_pipeline.run("owner", video_url, "https://owner.example/hook", "alice")
+
+    rejected = [c[0][1] for c in mock_send.call_args_list if c[0][1].get("rejected")]
+    assert [p["task_id"] for p in rejected] == ["strict-1", "strict-2"]
+    after = REGISTRY.get_sample_value("aqua_whisper_video_rejections_total", labels)
+    assert after == before + 1
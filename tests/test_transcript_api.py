@@ -3,12 +3,16 @@
 import os
 from unittest.mock import patch
 
+import pytest
 from fastapi.testclient import TestClient
 
 # Set env before importing app so pydantic-settings picks them up.
 os.environ.setdefault("API_KEY", "test-secret-key")
 os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
 
+from app.cache import store_transcript, transcript_cache_key
+from app.config import settings
+from app.inflight import claim, release
 from app.main import app
 
 client = TestClient(app)
@@ -21,8 +25,8 @@ VALID_BODY = {
 
 def test_transcript_valid_body_and_youtube_and_api_key_returns_202_with_task_id() -> None:
     """Valid body + valid YouTube URL + valid API key → 202 and JSON with task_id."""
-    with patch("app.main.run_transcript_pipeline.apply_async") as mock_apply:
-        mock_apply.return_value = None
+    with patch("app.main.celery_app.send_task") as mock_send_task:
+        mock_send_task.return_value = None
         response = client.post(
             "/transcript",
             json=VALID_BODY,
@@ -33,9 +37,9 @@ def test_transcript_valid_body_and_youtube_and_api_key_returns_202_with_task_id(
     assert "task_id" in data
     assert isinstance(data["task_id"], str)
     assert len(data["task_id"]) > 0
-    mock_apply.assert_called_once()
-    call_kwargs = mock_apply.call_args[1]
-    args = call_kwargs["args"]
+    mock_send_task.assert_called_once()
+    assert mock_send_task.call_args[0] == ("app.tasks.run_transcript_pipeline",)
+    args = mock_send_task.call_args[1]["args"]
     assert args == [
         data["task_id"],
         VALID_BODY["video_url"],
@@ -82,29 +86,29 @@ def test_transcript_non_youtube_url_returns_400() -> None:
 
 def test_transcript_author_defaults_to_unknown() -> None:
     """When author is omitted, it defaults to 'unknown' and is passed to the task."""
-    with patch("app.main.run_transcript_pipeline.apply_async") as mock_apply:
-        mock_apply.return_value = None
+    with patch("app.main.celery_app.send_task") as mock_send_task:
+        mock_send_task.return_value = None
         response = client.post(
             "/transcript",
             json=VALID_BODY,
             headers={"X-API-Key": "test-secret-key"},
         )
     assert response.status_code == 202
-    args = mock_apply.call_args[1]["args"]
+    args = mock_send_task.call_args[1]["args"]
     assert args[3] == "unknown"
 
 
 def test_transcript_author_in_body_passed_to_task() -> None:
     """When author is provided in body, it is passed to the task."""
-    with patch("app.main.run_transcript_pipeline.apply_async") as mock_apply:
-        mock_apply.return_value = None
+    with patch("app.main.celery_app.send_task") as mock_send_task:
+        mock_send_task.return_value = None
         response = client.post(
             "/transcript",
             json={**VALID_BODY, "author": "alice"},
             headers={"X-API-Key": "test-secret-key"},
         )
     assert response.status_code == 202
-    args = mock_apply.call_args[1]["args"]
+    args = mock_send_task.call_args[1]["args"]
     assert args[3] == "alice"
 
 
@@ -116,3 +120,247 @@ def test_transcript_invalid_api_key_returns_401() -> None:
         headers={"X-API-Key": "wrong-key"},
     )
     assert response.status_code == 401
+
+
+def test_transcript_cache_hit_skips_enqueue_and_sends_webhook() -> None:
+    """A cached video is answered from the API without enqueueing a task."""
+    store_transcript(
+        transcript_cache_key("https://www.youtube.com/watch?v=dQw4w9WgXcQ"), "manual", "WEBVTT hit"
+    )
+    with patch("app.main.celery_app.send_task") as mock_send_task:
+        response = client.post(
+            "/transcript",
+            json={**VALID_BODY, "video_url": "https://youtu.be/dQw4w9WgXcQ"},
+            headers={"X-API-Key": "test-secret-key"},
+        )
+    assert response.status_code == 202
+    data = response.json()
+    assert data["cached"] is True
+    mock_send_task.assert_called_once()
+    assert mock_send_task.call_args[0] == ("app.tasks.deliver_webhook",)
+    webhook_url, payload, content_encoding = mock_send_task.call_args[1]["args"]
+    assert content_encoding is None
+    assert webhook_url == VALID_BODY["webhook_url"]
+    assert payload == {
+        "task_id": data["task_id"],
+        "status": "success",
+        "source": "manual",
+        "transcript": "WEBVTT hit",
+        "author": "unknown",
+        "cached": True,
+    }
+
+
+def test_transcript_cache_hit_outside_request_duration_policy_is_rejected() -> None:
+    """A cached transcript of a long video is not sent to a request that caps the length."""
+    store_transcript(
+        transcript_cache_key("https://www.youtube.com/watch?v=dQw4w9WgXcQ"),
+        "manual",
+        "WEBVTT hit",
+        video={"id": "dQw4w9WgXcQ", "duration": 3600},
+    )
+    with patch("app.main.celery_app.send_task") as mock_send_task:
+        response = client.post(
+            "/transcript",
+            json={
+                **VALID_BODY,
+                "video_url": "https://youtu.be/dQw4w9WgXcQ",
+                "max_duration_seconds": 600,
+            },
+            headers={"X-API-Key": "test-secret-key"},
+        )
+    assert response.status_code == 202
+    _, payload, _ = mock_send_task.call_args[1]["args"]
+    assert payload["status"] == "failed"
+    assert payload["rejected"] == "too_long"
+    assert "transcript" not in payload
+
+
+def test_transcript_duplicate_in_flight_video_is_coalesced() -> None:
+    """A second submission for a video already in flight subscribes instead of enqueueing."""
+    body = {**VALID_BODY, "video_url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ"}
+    with patch("app.main.celery_app.send_task") as mock_send_task:
+        first = client.post("/transcript", json=body, headers={"X-API-Key": "test-secret-key"})
+        second = client.post(
+            "/transcript",
+            json={**body, "author": "bob"},
+            headers={"X-API-Key": "test-secret-key"},
+        )
+    assert first.status_code == 202
+    assert "coalesced" not in first.json()
+    assert second.status_code == 202
+    assert second.json()["coalesced"] is True
+    mock_send_task.assert_called_once()
+
+
+def test_transcript_enqueue_failure_keeps_subscribers_for_the_next_submission() -> None:
+    """A failed enqueue frees the video; the next submission owns it and inherits the waiters."""
+    body = {**VALID_BODY, "video_url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ"}
+    key = transcript_cache_key(body["video_url"])
+
+    def broker_down(*args, **kwargs):
+        claim(key, "waiter", "https://b.example/hook", "bob")  # subscribed meanwhile
+        raise ConnectionError("broker unavailable")
+
+    with (
+        patch("app.main.celery_app.send_task", side_effect=broker_down),
+        pytest.raises(ConnectionError),
+    ):
+        client.post("/transcript", json=body, headers={"X-API-Key": "test-secret-key"})
+    with patch("app.main.celery_app.send_task") as mock_send_task:
+        retry = client.post("/transcript", json=body, headers={"X-API-Key": "test-secret-key"})
+    assert "coalesced" not in retry.json()
+    mock_send_task.assert_called_once()
+    assert [s["task_id"] for s in release(key, retry.json()["task_id"])] == ["waiter"]
+
+
+def test_transcripts_batch_returns_results_in_order_with_per_item_errors() -> None:
+    """Valid items are enqueued under one batch id; invalid URLs get an error in place."""
+    store_transcript(
+        transcript_cache_key("https://www.youtube.com/watch?v=dQw4w9WgXcQ"), "auto", "WEBVTT"
+    )
+    items = [
+        VALID_BODY,
+        {"video_url": "https://vimeo.com/1", "webhook_url": "https://example.com/a"},
+        {"video_url": "https://youtu.be/dQw4w9WgXcQ", "webhook_url": "https://example.com/b"},
+        {**VALID_BODY, "video_url": "https://youtu.be/9bZkp7q19f0", "author": "alice"},
+        {**VALID_BODY, "video_url": "https://www.youtube.com/watch?v=9bZkp7q19f0"},
+    ]
+    with patch("app.main.celery_app.send_task") as mock_send_task:
+        response = client.post(
+            "/transcripts/batch",
+            json={"items": items},
+            headers={"X-API-Key": "test-secret-key"},
+        )
+    assert response.status_code == 202
+    data = response.json()
+    results = data["items"]
+    assert len(results) == 5
+    assert set(results[0]) == {"task_id", "estimated_completion"}
+    assert results[1] == {"error": "video_url must be a YouTube URL"}
+    assert results[2]["cached"] is True
+    assert set(results[3]) == {"task_id", "estimated_completion"}
+    # Duplicate of item 3 within the same batch joins its job.
+    assert results[4]["coalesced"] is True
+
+    sent = [(c[0][0], c[1]) for c in mock_send_task.call_args_list]
+    pipeline_calls = [kw for name, kw in sent if name == "app.tasks.run_transcript_pipeline"]
+    assert [kw["args"][0] for kw in pipeline_calls] == [
+        results[0]["task_id"],
+        results[3]["task_id"],
+    ]
+    assert all(kw["group_id"] == data["batch_id"] for kw in pipeline_calls)
+    assert pipeline_calls[1]["args"][3] == "alice"
+    webhook_calls = [kw for name, kw in sent if name == "app.tasks.deliver_webhook"]
+    assert webhook_calls[0]["args"][1]["task_id"] == results[2]["task_id"]
+
+
+def test_transcripts_batch_rejects_empty_and_unauthenticated_requests() -> None:
+    """An empty list fails validation; the batch endpoint needs the API key like /transcript."""
+    empty = client.post(
+        "/transcripts/batch", json={"items": []}, headers={"X-API-Key": "test-secret-key"}
+    )
+    assert empty.status_code == 400
+    unauthorized = client.post("/transcripts/batch", json={"items": [VALID_BODY]})
+    assert unauthorized.status_code == 401
+
+
+def test_transcript_playlist_url_is_expanded() -> None:
+    """A playlist URL enqueues the expansion task instead of a single-video job."""
+    with patch("app.main.celery_app.send_task") as mock_send_task:
+        response = client.post(
+            "/transcript",
+            json={**VALID_BODY, "video_url": "https://www.youtube.com/playlist?list=PL123"},
+            headers={"X-API-Key": "test-secret-key"},
+        )
+    assert response.status_code == 202
+    data = response.json()
+    assert data["collection"] is True
+    assert mock_send_task.call_args[0] == ("app.tasks.expand_collection",)
+    assert mock_send_task.call_args[1]["args"][0] == data["task_id"]
+
+
+def test_large_cached_transcript_is_offloaded_and_served_in_ranges() -> None:
+    """Over WEBHOOK_INLINE_MAX_BYTES the webhook gets a URL; the API serves byte ranges."""
+    transcript = "WEBVTT\n\n" + "x" * 200
+    store_transcript(
+        transcript_cache_key("https://www.youtube.com/watch?v=dQw4w9WgXcQ"), "manual", transcript
+    )
+    with (
+        patch("app.main.celery_app.send_task") as mock_send_task,
+        patch.multiple(
+            "app.webhooks.settings",
+            WEBHOOK_INLINE_MAX_BYTES=100,
+            PUBLIC_BASE_URL="https://aqua.example.com/",
+        ),
+    ):
+        response = client.post(
+            "/transcript",
+            json={**VALID_BODY, "video_url": "https://youtu.be/dQw4w9WgXcQ"},
+            headers={"X-API-Key": "test-secret-key"},
+        )
+    task_id = response.json()["task_id"]
+    _, payload, _ = mock_send_task.call_args[1]["args"]
+    assert "transcript" not in payload
+    assert payload["transcript_url"] == (f"https://aqua.example.com/transcript/{task_id}/content")
+    assert payload["transcript_bytes"] == len(transcript)
+    assert payload["transcript_content_type"].startswith("text/vtt")
+
+    url = f"/transcript/{task_id}/content"
+    auth = {"X-API-Key": "test-secret-key"}
+    full = client.get(url, headers=auth)
+    assert full.status_code == 200
+    assert full.text == transcript
+    assert full.headers["content-type"].startswith("text/vtt")
+    assert full.headers["accept-ranges"] == "bytes"
+
+    part = client.get(url, headers={**auth, "Range": "bytes=0-5"})
+    assert part.status_code == 206
+    assert part.content == b"WEBVTT"
+    assert part.headers["content-range"] == f"bytes 0-5/{len(transcript)}"
+    assert client.get(url, headers={**auth, "Range": "bytes=-3"}).content == b"xxx"
+    assert client.get(url, headers={**auth, "Range": "bytes=999-"}).status_code == 416
+    assert client.get(url).status_code == 401
+    assert client.get("/transcript/missing/content", headers=auth).status_code == 404
+
+
+def test_transcript_whisper_overrides_are_validated_and_forwarded() -> None:
+    """Decoding overrides travel in the task options; out-of-range values are a 400."""
+    headers = {"X-API-Key": "test-secret-key"}
+    with patch("app.main.celery_app.send_task") as mock_send_task:
+        response = client.post(
+            "/transcript",
+            json={**VALID_BODY, "whisper": {"beam_size": 1, "language": "en"}},
+            headers=headers,
+        )
+        rejected = client.post(
+            "/transcript", json={**VALID_BODY, "whisper": {"beam_size": 50}}, headers=headers
+        )
+    assert response.status_code == 202
+    options = mock_send_task.call_args[1]["kwargs"]["options"]
+    assert options == {"whisper": {"beam_size": 1, "language": "en"}}
+    assert rejected.status_code == 400
+
+
+def test_transcript_priority_sets_celery_priority_and_fair_share_demotes() -> None:
+    """The lane maps to a Celery priority; an author past their burst drops a lane."""
+    with (
+        patch("app.main.celery_app.send_task") as mock_send_task,
+        patch.object(settings, "FAIR_SHARE_BURST", 1),
+    ):
+        for n in range(2):
+            client.post(
+                "/transcript",
+                json={
+                    **VALID_BODY,
+                    "video_url": f"https://www.youtube.com/watch?v=prio{n}",
+                    "author": "backfill",
+                    "priority": "interactive",
+                },
+                headers={"X-API-Key": "test-secret-key"},
+            )
+    first, second = mock_send_task.call_args_list
+    assert first[1]["priority"] == 0
+    assert first[1]["kwargs"]["options"] == {"priority": "interactive"}
+    assert second[1]["priority"] == 3
+    assert second[1]["kwargs"]["options"] == {}
@@ -0,0 +1,45 @@
+"""Tests for the duration and live-stream policy."""
+
+from unittest.mock import patch
+
+import pytest
+
+from app.config import settings
+from app.video_policy import VideoRejectedError, check_video_policy, policy_info
+
+
+def test_video_policy_limits_live_streams_and_request_overrides() -> None:
+    """Settings give the defaults; requests may lower the max and change min and live policy."""
+    with (
+        patch.object(settings, "MIN_VIDEO_SECONDS", 60),
+        patch.object(settings, "MAX_VIDEO_SECONDS", 3600),
+        patch.object(settings, "LIVE_VIDEO_POLICY", "recordings"),
+    ):
+        check_video_policy({"duration": 600})
+        check_video_policy({"duration": 30}, {"min_duration_seconds": 0})
+        check_video_policy({"live_status": "was_live", "duration": 600})
+        check_video_policy({})
+        with pytest.raises(VideoRejectedError) as too_long:
+            check_video_policy({"duration": 7200}, {"max_duration_seconds": 10_000})
+        assert too_long.value.reason == "too_long"
+        with pytest.raises(VideoRejectedError, match="maximum of 300 s"):
+            check_video_policy({"duration": 600}, {"max_duration_seconds": 300})
+        with pytest.raises(VideoRejectedError) as live:
+            check_video_policy({"is_live": True, "live_status": "is_live"})
+        assert live.value.reason == "live"
+        with pytest.raises(VideoRejectedError, match="Recordings of live streams"):
+            check_video_policy(
+                {"live_status": "was_live", "duration": 600}, {"live_policy": "reject"}
+            )
+
+
+def test_policy_info_keeps_only_the_fields_the_policy_reads() -> None:
+    """The slice carried to subscribers and the cache is small but checks the same."""
+    info = {"id": "abc", "duration": 600, "live_status": "not_live", "formats": [{}] * 50}
+    assert policy_info(info) == {"id": "abc", "duration": 600, "live_status": "not_live"}
+    with (
+        patch.object(settings, "MAX_VIDEO_SECONDS", 300),
+        pytest.raises(VideoRejectedError) as rejected,
+    ):
+        check_video_policy(info)
+    assert rejected.value.video == policy_info(info)
@@ -0,0 +1,106 @@
+"""Tests for webhook delivery: pooled client, retry policy, dead-letter list."""
+
+import gzip
+import json
+from collections.abc import Iterator
+from unittest.mock import patch
+
+import httpx
+import pytest
+import zstandard
+
+from app.tasks import deliver_webhook
+from app.webhooks import dead_letter, is_retryable, pop_dead_letters, retry_delay
+
+WEBHOOK_URL = "https://example.com/webhook"
+PAYLOAD = {"task_id": "task-1", "status": "success", "transcript": "WEBVTT"}
+
+
+class FakeReceiver:
+    """Webhook receiver answering with queued status codes (200 once empty)."""
+
+    def __init__(self) -> None:
+        self.statuses: list[int] = []
+        self.requests: list[httpx.Request] = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        return httpx.Response(self.statuses.pop(0) if self.statuses else 200)
+
+
+@pytest.fixture
+def receiver() -> Iterator[FakeReceiver]:
+    fake = FakeReceiver()
+    client = httpx.Client(transport=httpx.MockTransport(fake.handle))
+    with patch("app.webhooks.get_client", return_value=client):
+        yield fake
+
+
+def test_deliver_webhook_posts_json(receiver: FakeReceiver) -> None:
+    """A 2xx delivery posts the payload once and dead-letters nothing."""
+    deliver_webhook.apply(args=[WEBHOOK_URL, PAYLOAD])
+    (request,) = receiver.requests
+    assert str(request.url) == WEBHOOK_URL
+    assert request.read() == httpx.Request("POST", WEBHOOK_URL, json=PAYLOAD).read()
+    assert pop_dead_letters(10) == []
+
+
+@pytest.mark.parametrize(
+    ("encoding", "decompress"),
+    [("gzip", gzip.decompress), ("zstd", zstandard.ZstdDecompressor().decompress)],
+)
+def test_deliver_webhook_compresses_body(receiver: FakeReceiver, encoding, decompress) -> None:
+    """A requested Content-Encoding compresses the JSON body and labels it."""
+    deliver_webhook.apply(args=[WEBHOOK_URL, PAYLOAD, encoding])
+    (request,) = receiver.requests
+    assert request.headers["Content-Encoding"] == encoding
+    assert request.headers["Content-Type"] == "application/json"
+    assert json.loads(decompress(request.read())) == PAYLOAD
+
+
+def test_deliver_webhook_retries_server_errors_then_succeeds(receiver: FakeReceiver) -> None:
+    """5xx responses are retried until the receiver accepts."""
+    receiver.statuses.extend([503, 502])
+    deliver_webhook.apply(args=[WEBHOOK_URL, PAYLOAD])
+    assert len(receiver.requests) == 3
+    assert pop_dead_letters(10) == []
+
+
+def test_deliver_webhook_dead_letters_after_max_retries(receiver: FakeReceiver) -> None:
+    """When every attempt fails, the payload lands in the dead-letter list."""
+    receiver.statuses.extend([500] * 20)
+    deliver_webhook.apply(args=[WEBHOOK_URL, PAYLOAD])
+    assert len(receiver.requests) == deliver_webhook.max_retries + 1
+    (entry,) = pop_dead_letters(10)
+    assert entry["webhook_url"] == WEBHOOK_URL
+    assert entry["payload"] == PAYLOAD
+    assert "500" in entry["error"]
+
+
+def test_deliver_webhook_does_not_retry_client_errors(receiver: FakeReceiver) -> None:
+    """A 4xx rejection is dead-lettered immediately."""
+    receiver.statuses.append(404)
+    deliver_webhook.apply(args=[WEBHOOK_URL, PAYLOAD])
+    assert len(receiver.requests) == 1
+    assert len(pop_dead_letters(10)) == 1
+
+
+def test_retry_policy_and_backoff() -> None:
+    """Throttling and transport errors retry; backoff doubles up to the cap."""
+    request = httpx.Request("POST", WEBHOOK_URL)
+    assert is_retryable(httpx.ConnectTimeout("timeout", request=request))
+    for status, expected in [(429, True), (503, True), (400, False), (410, False)]:
+        error = httpx.HTTPStatusError(
+            "err", request=request, response=httpx.Response(status, request=request)
+        )
+        assert is_retryable(error) is expected
+    assert retry_delay(1) == 2 * retry_delay(0)
+    assert retry_delay(100) == retry_delay(101)
+
+
+def test_pop_dead_letters_returns_oldest_first() -> None:
+    """Replay order matches failure order."""
+    dead_letter(WEBHOOK_URL, {"task_id": "first"}, "boom")
+    dead_letter(WEBHOOK_URL, {"task_id": "second"}, "boom")
+    assert [e["payload"]["task_id"] for e in pop_dead_letters(1)] == ["first"]
+    assert [e["payload"]["task_id"] for e in pop_dead_letters(5)] == ["second"]
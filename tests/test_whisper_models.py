@@ -0,0 +1,100 @@
+"""Tests for the process-resident Whisper model registry."""
+
+from collections.abc import Iterator
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from app import whisper_models
+from app.config import settings
+from app.whisper_models import clear_models, get_batched_pipeline, get_model
+
+
+@pytest.fixture(autouse=True)
+def _empty_registry() -> Iterator[None]:
+    clear_models()
+    yield
+    clear_models()
+
+
+def test_get_model_loads_once_per_combination() -> None:
+    """Repeated lookups for the same model reuse the loaded instance."""
+    with patch("faster_whisper.WhisperModel") as mock_model_cls:
+        first = get_model("base", "int8", "cpu")
+        second = get_model("base", "int8", "cpu")
+    assert first is second
+    mock_model_cls.assert_called_once_with("base", device="cpu", compute_type="int8")
+
+
+def test_get_model_different_compute_type_loads_separately() -> None:
+    """A different compute_type is a separate registry entry."""
+    with patch("faster_whisper.WhisperModel") as mock_model_cls:
+        get_model("base", "int8", "cpu")
+        get_model("base", "float32", "cpu")
+    assert mock_model_cls.call_count == 2
+
+
+def test_get_model_local_dir_uses_local_files_only(tmp_path: Path) -> None:
+    """A directory containing model.bin is loaded from disk without downloading."""
+    (tmp_path / "model.bin").write_bytes(b"")
+    with patch("faster_whisper.WhisperModel") as mock_model_cls:
+        get_model(str(tmp_path), "int8", "cpu")
+    mock_model_cls.assert_called_once_with(
+        str(tmp_path), device="cpu", compute_type="int8", local_files_only=True
+    )
+
+
+def test_get_model_records_hits_and_misses() -> None:
+    """Cache hits and misses are counted in the registry metrics."""
+    hits = whisper_models.MODEL_CACHE_LOOKUPS.labels(result="hit")
+    misses = whisper_models.MODEL_CACHE_LOOKUPS.labels(result="miss")
+    hits_before, misses_before = hits._value.get(), misses._value.get()
+    with patch("faster_whisper.WhisperModel"):
+        get_model("tiny", "int8", "cpu")
+        get_model("tiny", "int8", "cpu")
+        get_model("tiny", "int8", "cpu")
+    assert misses._value.get() - misses_before == 1
+    assert hits._value.get() - hits_before == 2
+
+
+def test_get_batched_pipeline_wraps_registry_model() -> None:
+    """The batched pipeline reuses the already-loaded model and is itself reused."""
+    with (
+        patch("faster_whisper.WhisperModel") as mock_model_cls,
+        patch("faster_whisper.BatchedInferencePipeline") as mock_batched_cls,
+    ):
+        first = get_batched_pipeline("base", "int8", "cpu")
+        second = get_batched_pipeline("base", "int8", "cpu")
+    assert first is second
+    mock_model_cls.assert_called_once()
+    mock_batched_cls.assert_called_once_with(mock_model_cls.return_value)
+
+
+def test_registry_evicts_least_recently_used_model() -> None:
+    """Past WHISPER_MAX_LOADED_MODELS the model unused the longest is dropped and reloaded."""
+    with (
+        patch("faster_whisper.WhisperModel") as mock_model_cls,
+        patch.object(settings, "WHISPER_MAX_LOADED_MODELS", 2),
+    ):
+        get_model("tiny", "int8", "cpu")
+        get_model("base", "int8", "cpu")
+        get_model("tiny", "int8", "cpu")  # tiny is now the most recently used
+        get_model("small", "int8", "cpu")  # evicts base
+        get_model("tiny", "int8", "cpu")
+        get_model("base", "int8", "cpu")
+    loaded = [c[0][0] for c in mock_model_cls.call_args_list]
+    assert loaded == ["tiny", "base", "small", "base"]
+
+
+def test_get_model_passes_cpu_threads_and_num_workers() -> None:
+    """WHISPER_CPU_THREADS / WHISPER_NUM_WORKERS reach the model constructor when set."""
+    with (
+        patch("faster_whisper.WhisperModel") as mock_model_cls,
+        patch.object(settings, "WHISPER_CPU_THREADS", 16),
+        patch.object(settings, "WHISPER_NUM_WORKERS", 2),
+    ):
+        get_model("base", "int8", "cpu")
+    mock_model_cls.assert_called_once_with(
+        "base", device="cpu", compute_type="int8", cpu_threads=16, num_workers=2
+    )
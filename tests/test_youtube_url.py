@@ -1,6 +1,6 @@
 """Tests for YouTube URL validation."""
 
-from app.youtube import is_youtube_url
+from app.youtube import extract_video_id, is_collection_url, is_youtube_url
 
 
 def test_valid_youtube_watch_url_returns_true() -> None:
@@ -26,3 +26,27 @@ def test_not_a_url_returns_false() -> None:
 def test_empty_string_returns_false() -> None:
     """Empty string returns False."""
     assert is_youtube_url("") is False
+
+
+def test_extract_video_id_from_watch_short_and_shorts_urls() -> None:
+    """Single-video URL shapes all resolve to the same 11-character ID."""
+    assert extract_video_id("https://www.youtube.com/watch?v=dQw4w9WgXcQ") == "dQw4w9WgXcQ"
+    assert extract_video_id("https://youtu.be/dQw4w9WgXcQ?t=42") == "dQw4w9WgXcQ"
+    assert extract_video_id("https://youtube.com/shorts/dQw4w9WgXcQ") == "dQw4w9WgXcQ"
+
+
+def test_extract_video_id_returns_none_for_playlist_and_channel() -> None:
+    """URLs without a single video have no ID."""
+    assert extract_video_id("https://www.youtube.com/playlist?list=PL123") is None
+    assert extract_video_id("https://www.youtube.com/@somechannel") is None
+    assert extract_video_id("https://vimeo.com/123456789") is None
+
+
+def test_is_collection_url_for_playlists_and_channels() -> None:
+    """Playlist and channel pages are collections; anything naming one video is not."""
+    assert is_collection_url("https://www.youtube.com/playlist?list=PL123")
+    assert is_collection_url("https://www.youtube.com/@somechannel/videos")
+    assert is_collection_url("https://youtube.com/channel/UC1234567890")
+    assert not is_collection_url("https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PL123")
+    assert not is_collection_url("https://www.youtube.com/playlist")
+    assert not is_collection_url("https://youtu.be/dQw4w9WgXcQ")